@@ -0,0 +1,252 @@
+"""Admission control: per-client rate limits, upload size limits and per-route concurrency.
+
+Routes are grouped (image, audio, chat). Each group lets `concurrency` requests run at
+once and up to `queue_depth` more wait, in arrival order, for at most `max_wait`
+seconds. Anything beyond that is rejected at once instead of piling up behind a busy
+model or the single Ollama instance. Clients are also rate limited with a token bucket.
+The state lives in one process; serve.py splits the limits over its workers (see split()).
+"""
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+
+import telemetry
+
+
+class Rejected(Exception):
+    """The request was not admitted; `status` is 413, 429 or 503"""
+
+    def __init__(self, status, message, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class _ThreadWaiter:
+    """A queued request; the limiter either grants it a slot or the request gives up"""
+
+    def __init__(self):
+        self.state = 'waiting'
+        self.event = threading.Event()
+
+    def signal(self):
+        self.event.set()
+
+
+class _AsyncWaiter:
+    def __init__(self):
+        self.state = 'waiting'
+        self.loop = asyncio.get_running_loop()
+        self.future = self.loop.create_future()
+
+    def signal(self):
+        # release() may run on another thread (executors) or on the loop itself
+        self.loop.call_soon_threadsafe(lambda: self.future.done() or self.future.set_result(None))
+
+
+class Slot:
+    """A granted place in a route group; release() is safe to call more than once"""
+
+    def __init__(self, limiter):
+        self._limiter = limiter
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._limiter._release()
+
+
+class RouteLimiter:
+    def __init__(self, name, concurrency, queue_depth, max_wait):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_depth = queue_depth
+        self.max_wait = max_wait
+        self.active = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+        self._stats = {'admitted': 0, 'queued': 0, 'rejected_queue_full': 0, 'rejected_timeout': 0,
+                       'rejected_disconnected': 0}
+
+    def _enter(self, make_waiter):
+        """None when a slot was free, else the queued waiter; raises Rejected when the queue is full"""
+        with self._lock:
+            if self.active < self.concurrency and not self._waiters:
+                self.active += 1
+                self._stats['admitted'] += 1
+                self._update_gauges()
+                return None
+            if len(self._waiters) >= self.queue_depth:
+                self._stats['rejected_queue_full'] += 1
+                telemetry.ADMISSION_REJECTED.labels(self.name, 'queue_full').inc()
+                raise Rejected(503, f'Server busy: {self.name} queue is full', retry_after=1)
+            waiter = make_waiter()
+            self._waiters.append(waiter)
+            self._stats['queued'] += 1
+            self._update_gauges()
+            return waiter
+
+    def _give_up(self, waiter, started, reason='timeout'):
+        """Leave the queue; False when the slot was granted in the meantime"""
+        with self._lock:
+            if waiter.state != 'waiting':
+                return False
+            waiter.state = 'cancelled'
+            self._waiters.remove(waiter)
+            self._stats[f'rejected_{reason}'] += 1
+            self._update_gauges()
+        telemetry.ADMISSION_REJECTED.labels(self.name, reason).inc()
+        telemetry.ADMISSION_WAIT_SECONDS.labels(self.name).observe(time.perf_counter() - started)
+        return True
+
+    def _admitted(self, started):
+        telemetry.ADMISSION_WAIT_SECONDS.labels(self.name).observe(time.perf_counter() - started)
+        return Slot(self)
+
+    def acquire(self):
+        """Slot for a worker thread, waiting up to max_wait; raises Rejected"""
+        started = time.perf_counter()
+        waiter = self._enter(_ThreadWaiter)
+        if waiter is not None and not waiter.event.wait(self.max_wait) and self._give_up(waiter, started):
+            raise Rejected(503, f'Server busy: timed out waiting for {self.name} capacity', retry_after=1)
+        return self._admitted(started)
+
+    async def acquire_async(self):
+        """Slot for a coroutine; waiting does not block the event loop"""
+        started = time.perf_counter()
+        waiter = self._enter(_AsyncWaiter)
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), self.max_wait)
+            except asyncio.TimeoutError:
+                if self._give_up(waiter, started):
+                    raise Rejected(503, f'Server busy: timed out waiting for {self.name} capacity', retry_after=1)
+            except asyncio.CancelledError:
+                # The client went away while queued; a slot granted meanwhile goes to the next waiter
+                if not self._give_up(waiter, started, 'disconnected'):
+                    self._release()
+                raise
+        return self._admitted(started)
+
+    def _release(self):
+        with self._lock:
+            # Hand the slot straight to the oldest waiter, so a newcomer cannot jump the queue
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if waiter.state == 'waiting':
+                    waiter.state = 'granted'
+                    self._stats['admitted'] += 1
+                    waiter.signal()
+                    break
+            else:
+                self.active -= 1
+            self._update_gauges()
+
+    def _update_gauges(self):
+        telemetry.ADMISSION_ACTIVE.labels(self.name).set(self.active)
+        telemetry.ADMISSION_QUEUED.labels(self.name).set(len(self._waiters))
+
+    def metrics(self):
+        with self._lock:
+            return {
+                **self._stats,
+                'active': self.active,
+                'waiting': len(self._waiters),
+                'concurrency': self.concurrency,
+                'queue_depth': self.queue_depth,
+                'max_wait': self.max_wait,
+            }
+
+
+class ClientRateLimiter:
+    """Token bucket per client: `rate` requests per second with bursts of up to `burst`"""
+
+    def __init__(self, rate, burst, max_clients=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def check(self, client):
+        """Raises Rejected(429) when the client has no token left"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            allowed = tokens >= 1.0
+            if allowed:
+                tokens -= 1.0
+            self._buckets[client] = (tokens, now)
+            # Least recently seen clients are forgotten first (they come back with a full bucket)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+            if not allowed:
+                self.rejected += 1
+        if not allowed:
+            raise Rejected(429, 'Too many requests', retry_after=max(1, int((1.0 - tokens) / self.rate + 0.999)))
+
+
+class AdmissionController:
+    """Route groups plus the client rate limiter, built from config"""
+
+    def __init__(self, groups, rate_limiter=None):
+        self.groups = groups
+        self.rate_limiter = rate_limiter
+
+    def check(self, group, client, content_length, rate_limited=True):
+        """Rate limit and declared upload size, before the body is read; returns the group's limiter"""
+        if rate_limited and self.rate_limiter is not None:
+            try:
+                self.rate_limiter.check(client)
+            except Rejected:
+                telemetry.ADMISSION_REJECTED.labels(group, 'rate_limit').inc()
+                raise
+        limiter, max_bytes = self.groups[group]
+        if content_length is not None and content_length > max_bytes:
+            telemetry.ADMISSION_REJECTED.labels(group, 'too_large').inc()
+            raise Rejected(413, f'Upload too large (limit {max_bytes} bytes)')
+        return limiter
+
+    def max_bytes(self, group):
+        return self.groups[group][1]
+
+    def split(self, processes):
+        """Give this process its share of the configured limits when `processes` serve the same port.
+
+        Each group keeps at least one slot, so with more processes than slots the total is higher.
+        """
+        for limiter, _ in self.groups.values():
+            limiter.concurrency = max(1, math.ceil(limiter.concurrency / processes))
+            limiter.queue_depth = math.ceil(limiter.queue_depth / processes)
+        if self.rate_limiter is not None:
+            # Requests of one client are spread over the processes, so each sees about 1/processes of them
+            self.rate_limiter.rate /= processes
+            self.rate_limiter.burst = max(1, math.ceil(self.rate_limiter.burst / processes))
+
+    def metrics(self):
+        return {
+            'groups': {name: {**limiter.metrics(), 'max_bytes': max_bytes}
+                       for name, (limiter, max_bytes) in self.groups.items()},
+            'rate_limit': None if self.rate_limiter is None else {
+                'rate': self.rate_limiter.rate,
+                'burst': self.rate_limiter.burst,
+                'rejected': self.rate_limiter.rejected,
+            },
+        }
+
+
+def create_admission_controller(settings):
+    groups = {
+        name: (RouteLimiter(name, concurrency, queue_depth, max_wait), max_bytes)
+        for name, (concurrency, queue_depth, max_wait, max_bytes) in settings.ADMISSION_GROUPS.items()
+    }
+    rate_limiter = None
+    if settings.RATE_LIMIT_PER_SECOND > 0:
+        rate_limiter = ClientRateLimiter(settings.RATE_LIMIT_PER_SECOND, settings.RATE_LIMIT_BURST,
+                                         settings.RATE_LIMIT_MAX_CLIENTS)
+    return AdmissionController(groups, rate_limiter)
@@ -0,0 +1,713 @@
+"""asyncio serving mode with the same routes and JSON shapes as main.py.
+
+Ollama is awaited over a pooled aiohttp session; blocking network clients (Google
+speech, googletrans) run on a bounded I/O executor and CPU-bound stages (image
+decode/detection, audio decoding, spelling/grammar) on a bounded CPU executor,
+so open connections do not each pin a thread.
+
+    cd backend && hypercorn asgi_app:app --bind localhost:5000
+"""
+import asyncio
+import functools
+import json
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from quart import Quart, request, websocket, jsonify, Response, g
+from werkzeug.exceptions import RequestEntityTooLarge
+from quart_cors import cors
+import speech_recognition as sr
+
+import config
+import services
+from inference_scheduler import QueueFullError
+from audio_ingest import AudioDecodeError
+from components import SubsystemDisabled
+from conversation import SessionBusy
+from admission import Rejected, create_admission_controller
+import telemetry
+from llm_client import AsyncOllamaClient, LLMError, sse_event
+
+app = cors(Quart(__name__))
+
+cpu_executor = ThreadPoolExecutor(max_workers=config.ASGI_CPU_WORKERS, thread_name_prefix='cpu')
+io_executor = ThreadPoolExecutor(max_workers=config.ASGI_IO_WORKERS, thread_name_prefix='io')
+
+# Concurrency, queueing, rate and upload limits per route group (see admission.py)
+admission = create_admission_controller(config) if config.ADMISSION_ENABLED else None
+if admission is not None:
+    # Refused while the body is read; the per-group limit is checked against Content-Length
+    app.config['MAX_CONTENT_LENGTH'] = max(limits[3] for limits in config.ADMISSION_GROUPS.values())
+
+llm_client = AsyncOllamaClient(
+    base_url=config.OLLAMA_URL,
+    model=config.OLLAMA_MODEL,
+    connect_timeout=config.OLLAMA_CONNECT_TIMEOUT,
+    read_timeout=config.OLLAMA_READ_TIMEOUT,
+    retries=config.OLLAMA_RETRIES,
+    pool_size=config.OLLAMA_POOL_SIZE,
+)
+
+
+async def run_cpu(fn, *args):
+    # bind() carries the request trace into the executor thread
+    return await asyncio.get_running_loop().run_in_executor(cpu_executor, telemetry.bind(fn, *args))
+
+
+async def run_io(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(io_executor, telemetry.bind(fn, *args))
+
+
+async def component(name):
+    """A registry engine; a first load (TensorFlow, detectors) runs on the I/O executor, not the event loop"""
+    if services.registry.loaded(name):
+        return services.registry.get(name)
+    return await run_io(services.registry.get, name)
+
+
+@app.after_serving
+async def shutdown():
+    await llm_client.close()
+    cpu_executor.shutdown(wait=False)
+    io_executor.shutdown(wait=False)
+
+
+def requires(*subsystems):
+    """503 when this process was started without a subsystem the route needs (see SUBSYSTEMS)"""
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(*args, **kwargs):
+            missing = services.registry.missing(subsystems)
+            if missing:
+                return jsonify({'error': f"Not served by this process: {', '.join(missing)}"}), 503
+            return await view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def client_address(connection=request):
+    return connection.access_route[0] if config.RATE_LIMIT_TRUST_PROXY else connection.remote_addr
+
+
+def rejected_response(e):
+    response = jsonify({'error': str(e)})
+    response.status_code = e.status
+    if e.retry_after:
+        response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+
+def admit(group, rate_limited=True):
+    """Rate limit, upload size and a concurrency slot of the route group before the view runs"""
+    def decorator(view):
+        if admission is None:
+            return view
+
+        @functools.wraps(view)
+        async def wrapper(*args, **kwargs):
+            try:
+                limiter = admission.check(group, client_address(), request.content_length, rate_limited)
+                slot = await limiter.acquire_async()
+            except Rejected as e:
+                return rejected_response(e)
+            g.admission_slot = slot
+            try:
+                return await view(*args, **kwargs)
+            finally:
+                # Unless a streamed reply took the slot over (see sse_response)
+                if g.pop('admission_slot', None) is slot:
+                    slot.release()
+        return wrapper
+    return decorator
+
+
+class ClosingStream:
+    """SSE events that run their close callbacks once, when the stream ends or is dropped"""
+
+    def __init__(self, events, callbacks):
+        self.events = events
+        self.callbacks = callbacks
+
+    def _close(self):
+        callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self.events.__anext__()
+        except BaseException:
+            self._close()
+            raise
+
+    async def aclose(self):
+        self._close()
+        await self.events.aclose()
+
+    def __del__(self):
+        # A stream that was never iterated (client gone before the body) is only collected
+        self._close()
+
+
+@app.before_request
+async def start_trace():
+    # The URL rule, not the path, so session ids do not become label values
+    telemetry.begin_request(request.url_rule.rule if request.url_rule else 'unmatched', request.method)
+
+
+@app.after_request
+async def finish_trace(response):
+    # Streamed replies end their trace when the last event is sent (see sse_response)
+    if not g.pop('trace_streamed', False):
+        telemetry.end_request(response.status_code)
+    return response
+
+
+@app.errorhandler(SubsystemDisabled)
+async def subsystem_disabled(e):
+    return jsonify({'error': str(e)}), 503
+
+
+@app.errorhandler(RequestEntityTooLarge)
+async def upload_too_large(e):
+    return jsonify({'error': 'Upload too large'}), 413
+
+
+@app.route('/')
+async def home():
+    return 'Backend is working perfectly...'
+
+
+@app.route('/ready', methods=['GET'])
+async def ready():
+    """Which engines are loaded; 503 until every enabled one is"""
+    status = services.registry.status()
+    return jsonify(status), 200 if status['ready'] else 503
+
+
+@app.route('/predict_emotion', methods=['POST'])
+@requires('emotion')
+@admit('image')
+async def predict_emotion():
+    files = await request.files
+    if 'image' not in files:
+        return jsonify({'error': 'No image file provided'}), 400
+
+    file = files['image']
+    if file.filename == '':
+        return jsonify({'error': 'No selected file'}), 400
+
+    try:
+        face_results = await analyze_frame(file.read())
+        predictions_list = [face['label'] for face in face_results]
+
+        if not predictions_list:
+            return jsonify({'error': 'No face detected in image'}), 200
+
+        return jsonify({'predictions': predictions_list, 'faces': face_results})
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 503
+    except (TimeoutError, FutureTimeoutError, asyncio.TimeoutError):
+        # Results that do not come back in EMOTION_RESULT_TIMEOUT mean the model is overloaded
+        return jsonify({'error': 'Emotion inference timed out; try again shortly'}), 503, {'Retry-After': '1'}
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/emotion_stream', methods=['POST'])
+@requires('emotion')
+async def open_emotion_stream():
+    session_id = (await component('stream_sessions')).create()
+    if session_id is None:
+        return jsonify({'error': 'Too many open stream sessions'}), 503
+    return jsonify({'session_id': session_id})
+
+
+@app.route('/emotion_stream/<session_id>/frame', methods=['POST'])
+@requires('emotion')
+# A webcam sends 15-30 frames a second; open sessions are capped by EMOTION_STREAM_MAX_SESSIONS instead
+@admit('image', rate_limited=False)
+async def emotion_stream_frame(session_id):
+    session = (await component('stream_sessions')).get(session_id)
+    if session is None:
+        return jsonify({'error': 'Unknown or expired session'}), 404
+
+    # Frames can come as a multipart 'image' field or as the raw request body
+    file = (await request.files).get('image')
+    img_bytes = file.read() if file is not None else await request.get_data()
+    if not img_bytes:
+        return jsonify({'error': 'No frame provided'}), 400
+
+    try:
+        gray = await run_cpu(services.decode_frame, img_bytes)
+        if gray is None:
+            return jsonify({'error': 'Could not decode frame'}), 400
+        result = await run_cpu(session.process, gray)
+        result['predictions'] = [face['label'] for face in result['faces']]
+        return jsonify(result)
+
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 503
+    except (TimeoutError, FutureTimeoutError, asyncio.TimeoutError):
+        # Results that do not come back in EMOTION_RESULT_TIMEOUT mean the model is overloaded
+        return jsonify({'error': 'Emotion inference timed out; try again shortly'}), 503, {'Retry-After': '1'}
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/emotion_stream/<session_id>', methods=['DELETE'])
+@requires('emotion')
+async def close_emotion_stream(session_id):
+    if not (await component('stream_sessions')).close(session_id):
+        return jsonify({'error': 'Unknown or expired session'}), 404
+    return jsonify({'closed': session_id})
+
+
+@app.websocket('/emotion_stream/ws')
+async def emotion_stream_socket():
+    """Webcam emotion tracking over one connection: JPEG frames in as binary messages, one JSON result each.
+
+    Uses the same tracking session as POST /emotion_stream; it is closed with the socket.
+    A frame that cannot be admitted gets {"type": "error", "status": 503} and is skipped.
+    """
+    if services.registry.missing(('emotion',)):
+        await websocket.close(1008, 'Not served by this process: emotion')
+        return
+    slot = None
+    if admission is not None:
+        try:
+            slot = await admission.check('stream', client_address(websocket), None).acquire_async()
+        except Rejected as e:
+            await websocket.close(1013 if e.status == 503 else 1008, str(e))
+            return
+    stream_sessions = await component('stream_sessions')
+    session_id = stream_sessions.create()
+    try:
+        if session_id is None:
+            await websocket.close(1013, 'Too many open stream sessions')
+            return
+        session = stream_sessions.get(session_id)
+        while True:
+            message = await websocket.receive()
+            if isinstance(message, str):
+                if message.strip().lower() == 'end':
+                    break
+                continue
+            await websocket.send(json.dumps(await _emotion_frame(session, message)))
+    finally:
+        if session_id is not None:
+            stream_sessions.close(session_id)
+        if slot is not None:
+            slot.release()
+
+
+async def _emotion_frame(session, img_bytes):
+    """One frame of a websocket session, admitted like POST /emotion_stream/<id>/frame"""
+    frame_slot = None
+    try:
+        if admission is not None:
+            limiter = admission.check('image', None, len(img_bytes), rate_limited=False)
+            frame_slot = await limiter.acquire_async()
+        gray = await run_cpu(services.decode_frame, img_bytes)
+        if gray is None:
+            return {'type': 'error', 'status': 400, 'error': 'Could not decode frame'}
+        result = await run_cpu(session.process, gray)
+        result['predictions'] = [face['label'] for face in result['faces']]
+        return {'type': 'result', **result}
+    except Rejected as e:
+        return {'type': 'error', 'status': e.status, 'error': str(e)}
+    except (QueueFullError, TimeoutError, FutureTimeoutError, asyncio.TimeoutError) as e:
+        return {'type': 'error', 'status': 503, 'error': str(e) or 'Emotion inference timed out'}
+    except Exception as e:
+        return {'type': 'error', 'status': 500, 'error': str(e)}
+    finally:
+        if frame_slot is not None:
+            frame_slot.release()
+
+
+@app.route('/metrics', methods=['GET'])
+async def prometheus_metrics():
+    """Stage and request latency histograms in the Prometheus text format"""
+    body, content_type = telemetry.render()
+    return Response(body, content_type=content_type)
+
+
+def component_metrics(name):
+    """metrics() of a loaded engine; reporting never loads one"""
+    if not services.registry.loaded(name):
+        return jsonify({'loaded': False})
+    component = services.registry.get(name)
+    if component is None:
+        return jsonify({'enabled': False})
+    return jsonify(component.metrics())
+
+
+@app.route('/metrics/inference', methods=['GET'])
+async def inference_metrics():
+    return component_metrics('emotion_scheduler')
+
+
+@app.route('/metrics/cache', methods=['GET'])
+async def cache_metrics():
+    return component_metrics('response_cache')
+
+
+@app.route('/metrics/translation', methods=['GET'])
+async def translation_metrics():
+    return component_metrics('translation_service')
+
+
+@app.route('/metrics/correction', methods=['GET'])
+async def correction_metrics():
+    return component_metrics('text_corrector')
+
+
+@app.route('/metrics/admission', methods=['GET'])
+async def admission_metrics():
+    if admission is None:
+        return jsonify({'enabled': False})
+    return jsonify(admission.metrics())
+
+
+@app.route('/translate', methods=['POST'])
+@requires('speech', 'text')
+@admit('audio')
+async def transcribe():
+    files = await request.files
+    if 'audio' not in files:
+        return jsonify({'error': 'No audio file provided'}), 400
+
+    try:
+        audio_data = await run_cpu(services.transcode_audio, files['audio'].read(), files['audio'].mimetype)
+        original_text, confidence = await run_io(services.recognize_speech_scored, audio_data)
+        print(f"[Original] {original_text}")
+
+        translated_text = await run_io(services.translate_to_english, original_text)
+        print(f"[English] {translated_text}")
+
+        final_text = await run_cpu(services.correct_transcript, original_text, translated_text, confidence)
+        return jsonify({"english_text": final_text})
+
+    except sr.UnknownValueError:
+        return jsonify({"error": "Could not understand audio"}), 400
+    except AudioDecodeError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print("[ERROR] Exception in /translate route:")
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+
+@app.websocket('/speech_stream')
+async def speech_stream():
+    """Incremental transcription of 16-bit mono PCM sent as binary messages while the user speaks.
+
+    Query string: ?sample_rate=16000. Send the text message "end" to flush the last
+    utterance. Replies are JSON messages of type partial, final, pause and stopped.
+    """
+    missing = services.registry.missing(('speech', 'text'))
+    if missing:
+        error = f"Not served by this process: {', '.join(missing)}"
+        await websocket.send(json.dumps({'type': 'error', 'error': error}))
+        return
+    try:
+        sample_rate = int(websocket.args.get('sample_rate', 16000))
+    except ValueError:
+        sample_rate = 0
+    if not 8000 <= sample_rate <= 48000:
+        await websocket.close(1008, 'sample_rate must be an integer from 8000 to 48000')
+        return
+
+    slot = None
+    if admission is not None:
+        try:
+            limiter = admission.check('stream', client_address(websocket), None)
+            slot = await limiter.acquire_async()
+        except Rejected as e:
+            # 1013: try again later
+            await websocket.close(1013 if e.status == 503 else 1008, str(e))
+            return
+    try:
+        await _speech_stream(sample_rate)
+    finally:
+        if slot is not None:
+            slot.release()
+
+
+async def _speech_stream(sample_rate):
+    max_message = admission.max_bytes('stream') if admission is not None else None
+    segmenter = services.create_speech_segmenter(sample_rate)
+    finals = asyncio.Queue()
+    segment_index = 0
+    partial_task = None
+    connected = True
+
+    async def send(message):
+        # Results of a connection the client already dropped are discarded
+        if connected:
+            await websocket.send(json.dumps(message))
+
+    async def send_partial(index, pcm):
+        try:
+            text = await run_io(services.recognize_pcm, pcm, sample_rate)
+            await send({'type': 'partial', 'segment': index, 'text': text})
+        except sr.UnknownValueError:
+            pass
+        except Exception as e:
+            print(f"[speech_stream] partial failed: {e}")
+
+    async def finalize_segments():
+        # One consumer keeps final transcripts in speaking order
+        while True:
+            item = await finals.get()
+            if item is None:
+                return
+            index, pcm = item
+            try:
+                original_text = await run_io(services.recognize_pcm, pcm, sample_rate)
+                translated_text = await run_io(services.translate_to_english, original_text)
+                english_text = await run_cpu(services.correct_text, translated_text)
+                await send({'type': 'final', 'segment': index, 'text': original_text,
+                            'english_text': english_text})
+            except sr.UnknownValueError:
+                await send({'type': 'final', 'segment': index, 'text': '', 'english_text': ''})
+            except Exception as e:
+                print(f"[speech_stream] final failed: {e}")
+                await send({'type': 'error', 'segment': index, 'error': str(e)})
+
+    finalizer = asyncio.create_task(finalize_segments())
+    try:
+        while not segmenter.stopped:
+            message = await websocket.receive()
+            if isinstance(message, str):
+                if message.strip().lower() == 'end':
+                    events = segmenter.flush()
+                    segmenter.stopped = True
+                else:
+                    continue
+            elif max_message is not None and len(message) > max_message:
+                await websocket.close(1009, f'Messages are limited to {max_message} bytes')
+                connected = False
+                break
+            else:
+                events = segmenter.feed(message)
+
+            for kind, payload in events:
+                if kind == 'partial':
+                    # Skip a partial if the previous one is still being recognized
+                    if partial_task is None or partial_task.done():
+                        partial_task = asyncio.create_task(send_partial(segment_index, payload))
+                elif kind == 'final':
+                    await finals.put((segment_index, payload))
+                    segment_index += 1
+                elif kind in ('pause', 'stop'):
+                    await send({'type': kind, 'count': payload})
+    except BaseException:
+        # Quart cancels the handler when the client disconnects
+        connected = False
+        raise
+    finally:
+        if partial_task is not None:
+            partial_task.cancel()
+        if connected:
+            await finals.put(None)
+            await finalizer
+        else:
+            # Nobody is left to read the remaining transcripts
+            finalizer.cancel()
+    await send({'type': 'stopped', 'segments': segment_index})
+
+
+@app.route('/chatbot', methods=['POST'])
+@requires('chat')
+@admit('chat')
+async def chat_with_bot():
+    try:
+        data = await request.get_json()
+        user_message = data.get('message', '')
+        if not user_message.strip():
+            return jsonify({"error": "Empty message provided"}), 400
+
+        wants_stream = data.get('stream') or 'text/event-stream' in request.headers.get('Accept', '')
+        return await chat_response(data.get('session_id'), user_message, wants_stream)
+
+    except SessionBusy as e:
+        return jsonify({"error": str(e)}), 409
+    except LLMError as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+
+async def analyze_frame(img_bytes):
+    faces, face_batch = await run_cpu(services.prepare_frame, img_bytes)
+    scheduler = await component('emotion_scheduler')
+    # The scheduler resolves a concurrent Future, which the event loop can await directly
+    with telemetry.stage('emotion_inference'):
+        probabilities = await asyncio.wait_for(
+            asyncio.wrap_future(scheduler.submit(face_batch)),
+            timeout=config.EMOTION_RESULT_TIMEOUT,
+        )
+    return services.describe_faces(faces, probabilities)
+
+
+async def transcribe_to_english(audio_bytes, content_type=''):
+    audio_data = await run_cpu(services.transcode_audio, audio_bytes, content_type)
+    original_text, confidence = await run_io(services.recognize_speech_scored, audio_data)
+    translated_text = await run_io(services.translate_to_english, original_text)
+    return await run_cpu(services.correct_transcript, original_text, translated_text, confidence)
+
+
+async def _no_result():
+    return None
+
+
+@app.route('/companion', methods=['POST'])
+@requires('chat')
+@admit('chat')
+async def companion():
+    """One round-trip per turn: optional frame, audio and text in, one (streamed) reply out"""
+    files = await request.files
+    form = await request.form
+    image = files.get('image')
+    audio = files.get('audio')
+    message = form.get('message', '').strip()
+    if image is None and audio is None and not message:
+        return jsonify({"error": "Provide an image, audio or message"}), 400
+    if audio is not None and services.registry.missing(('speech', 'text')):
+        return jsonify({"error": "Audio is not served by this process"}), 503
+    if not services.registry.enabled('emotion'):
+        # The frame only adds context to the reply
+        image = None
+
+    try:
+        # Face inference and speech transcription run concurrently
+        face_results, english_text = await asyncio.gather(
+            analyze_frame(image.read()) if image is not None else _no_result(),
+            transcribe_to_english(audio.read(), audio.mimetype) if audio is not None else _no_result(),
+            return_exceptions=True,
+        )
+        if isinstance(face_results, (ValueError, QueueFullError, asyncio.TimeoutError)):
+            # The reply does not depend on the emotion, so answer without it
+            print(f"[companion] emotion skipped: {face_results!r}")
+            face_results = None
+        if isinstance(english_text, sr.UnknownValueError):
+            english_text = None
+        if isinstance(english_text, AudioDecodeError):
+            return jsonify({"error": str(english_text)}), 400
+        for result in (face_results, english_text):
+            if isinstance(result, BaseException):
+                raise result
+
+        user_message = message or english_text
+        if not user_message:
+            return jsonify({"error": "Could not understand audio"}), 400
+
+        face_results = face_results or []
+        emotion = services.dominant_emotion(face_results)
+        extra = {"emotion": emotion, "faces": face_results, "english_text": english_text}
+        wants_stream = (form.get('stream', '').lower() in ('1', 'true')
+                        or 'text/event-stream' in request.headers.get('Accept', ''))
+        return await chat_response(form.get('session_id'), user_message, wants_stream, emotion, extra)
+
+    except SessionBusy as e:
+        return jsonify({"error": str(e)}), 409
+    except LLMError as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+
+async def chat_response(session_id, user_message, wants_stream, emotion=None, extra=None):
+    """Reply to one chat turn as JSON or Server-Sent Events; extra fields are sent along"""
+    extra = extra or {}
+    # Recent turns + rolling summary, or Ollama's cached context from the last reply
+    conversation, prompt, options, release = await run_io(services.start_chat_turn, session_id, user_message,
+                                                          emotion)
+    try:
+        cached_reply, cache_probe = await run_io(services.lookup_cached_reply, conversation, user_message, emotion)
+        if cached_reply is not None:
+            await run_io(services.finish_chat_turn, conversation, user_message, cached_reply, None)
+            release()
+            if wants_stream:
+                return sse_response(cached_stream(conversation, cached_reply, extra))
+            return jsonify({**extra, "response": cached_reply, "session_id": conversation.session_id,
+                            "cached": True})
+
+        # Stream tokens as Server-Sent Events when the client asks for it; the session is held until it closes
+        if wants_stream:
+            return sse_response(stream_reply(conversation, user_message, prompt, options, cache_probe, extra),
+                                on_close=release)
+
+        with telemetry.stage('llm_total'):
+            result = await llm_client.generate(prompt, **options)
+        bot_response = result["response"].strip()
+        await run_io(services.finish_chat_turn, conversation, user_message, bot_response, result.get("context"))
+    except BaseException:
+        release()
+        raise
+    release()
+    services.store_cached_reply(cache_probe, bot_response)
+    return jsonify({**extra, "response": bot_response, "session_id": conversation.session_id})
+
+
+def sse_response(events, on_close=None):
+    callbacks = [on_close] if on_close is not None else []
+    slot = g.pop('admission_slot', None)
+    if slot is not None:
+        # The chat slot is held until the last token is sent, not just until the view returns
+        callbacks.append(slot.release)
+    trace = telemetry.current_trace()
+    if trace is not None:
+        # Timed to the last event, so the LLM stages land in the request's trace
+        g.trace_streamed = True
+        callbacks.append(functools.partial(telemetry.end_request, 200, trace))
+    if callbacks:
+        events = ClosingStream(events, callbacks)
+    return Response(events, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+async def cached_stream(conversation, reply, extra):
+    if extra:
+        yield sse_event(extra, event="context")
+    yield sse_event({"token": reply})
+    yield sse_event({"response": reply, "session_id": conversation.session_id, "cached": True}, event="done")
+
+
+async def stream_reply(conversation, user_message, prompt, options, cache_probe, extra):
+    if extra:
+        yield sse_event(extra, event="context")
+    tokens = []
+    context = None
+    started = time.perf_counter()
+    try:
+        async for chunk in llm_client.stream(prompt, **options):
+            token = chunk.get("response", "")
+            if token:
+                if not tokens:
+                    telemetry.record_stage('llm_first_token', time.perf_counter() - started)
+                tokens.append(token)
+                yield sse_event({"token": token})
+            if chunk.get("done"):
+                context = chunk.get("context")
+        telemetry.record_stage('llm_total', time.perf_counter() - started)
+        bot_response = "".join(tokens).strip()
+        await run_io(services.finish_chat_turn, conversation, user_message, bot_response, context)
+        services.store_cached_reply(cache_probe, bot_response)
+        yield sse_event({"response": bot_response, "session_id": conversation.session_id}, event="done")
+    except LLMError as e:
+        yield sse_event({"error": str(e)}, event="error")
+
+
+if __name__ == '__main__':
+    app.run(host="localhost", port=5000)
@@ -0,0 +1,144 @@
+import json
+import math
+import time
+
+import numpy as np
+import speech_recognition as sr
+
+SAMPLE_RATE = 16000
+
+
+def _pcm16(audio_data):
+    """16 kHz mono 16-bit PCM bytes from an sr.AudioData"""
+    return audio_data.get_raw_data(convert_rate=SAMPLE_RATE, convert_width=2)
+
+
+class GoogleASR:
+    """Google Web Speech API through speech_recognition (remote call)"""
+
+    name = 'google'
+
+    def __init__(self, recognizer=None):
+        self.recognizer = recognizer or sr.Recognizer()
+
+    def transcribe(self, audio_data):
+        return self.transcribe_scored(audio_data)[0]
+
+    def transcribe_scored(self, audio_data):
+        """(text, confidence); confidence is None when Google does not report one"""
+        result = self.recognizer.recognize_google(audio_data, show_all=True)
+        if not result or not result.get('alternative'):
+            raise sr.UnknownValueError()
+        best = result['alternative'][0]
+        return best['transcript'], best.get('confidence')
+
+
+class VoskASR:
+    """Offline Kaldi recognizer; the model directory is loaded once per process"""
+
+    name = 'vosk'
+
+    def __init__(self, model_path):
+        from vosk import Model, SetLogLevel
+        SetLogLevel(-1)
+        self.model = Model(model_path)
+
+    def transcribe(self, audio_data):
+        return self.transcribe_scored(audio_data)[0]
+
+    def transcribe_scored(self, audio_data):
+        """(text, mean word confidence)"""
+        from vosk import KaldiRecognizer
+        recognizer = KaldiRecognizer(self.model, SAMPLE_RATE)
+        recognizer.SetWords(True)
+        recognizer.AcceptWaveform(_pcm16(audio_data))
+        result = json.loads(recognizer.FinalResult())
+        text = result.get('text', '').strip()
+        if not text:
+            raise sr.UnknownValueError()
+        words = result.get('result') or []
+        confidence = sum(word['conf'] for word in words) / len(words) if words else None
+        return text, confidence
+
+
+class WhisperASR:
+    """faster-whisper (CTranslate2) on CPU, int8 by default"""
+
+    name = 'whisper'
+
+    def __init__(self, model_path, compute_type='int8', cpu_threads=0, language=None):
+        from faster_whisper import WhisperModel
+        self.model = WhisperModel(model_path, device='cpu', compute_type=compute_type, cpu_threads=cpu_threads)
+        self.language = language
+
+    def transcribe(self, audio_data):
+        return self.transcribe_scored(audio_data)[0]
+
+    def transcribe_scored(self, audio_data):
+        """(text, exp of the mean segment log-probability)"""
+        samples = np.frombuffer(_pcm16(audio_data), dtype=np.int16).astype(np.float32) / 32768.0
+        segments, _ = self.model.transcribe(samples, language=self.language, beam_size=1,
+                                            vad_filter=True)
+        segments = list(segments)
+        text = ' '.join(segment.text.strip() for segment in segments).strip()
+        if not text:
+            raise sr.UnknownValueError()
+        confidence = math.exp(sum(segment.avg_logprob for segment in segments) / len(segments))
+        return text, confidence
+
+
+class FallbackASR:
+    """Use the local engine and fall back to another one when it errors out"""
+
+    def __init__(self, primary, fallback):
+        self.primary = primary
+        self.fallback = fallback
+        self.name = f'{primary.name}+{fallback.name}'
+
+    def transcribe(self, audio_data):
+        return self.transcribe_scored(audio_data)[0]
+
+    def transcribe_scored(self, audio_data):
+        try:
+            return self.primary.transcribe_scored(audio_data)
+        except sr.UnknownValueError:
+            raise
+        except Exception as e:
+            print(f"[ASR] {self.primary.name} failed ({e}); falling back to {self.fallback.name}")
+            return self.fallback.transcribe_scored(audio_data)
+
+
+class StubASR:
+    """Offline engine for load tests: a fixed transcript after an optional delay"""
+
+    name = 'stub'
+
+    def __init__(self, text=None, latency=0.0):
+        self.text = text or 'i feel a little anxious about tomorrow'
+        self.latency = latency
+
+    def transcribe(self, audio_data):
+        return self.transcribe_scored(audio_data)[0]
+
+    def transcribe_scored(self, audio_data):
+        if self.latency:
+            time.sleep(self.latency)
+        # No confidence, so the transcript still goes through spelling/grammar correction
+        return self.text, None
+
+
+def create_asr_engine(name, model_path=None, compute_type='int8', cpu_threads=0, language=None,
+                      fallback='google', recognizer=None, stub_text=None, stub_latency=0.0):
+    if name == GoogleASR.name:
+        return GoogleASR(recognizer)
+    if name == StubASR.name:
+        return StubASR(stub_text, stub_latency)
+    if name == VoskASR.name:
+        engine = VoskASR(model_path)
+    elif name == WhisperASR.name:
+        engine = WhisperASR(model_path, compute_type=compute_type, cpu_threads=cpu_threads, language=language)
+    else:
+        raise ValueError(f"Unknown ASR engine '{name}' (expected google, vosk, whisper or stub)")
+    if fallback == GoogleASR.name:
+        return FallbackASR(engine, GoogleASR(recognizer))
+    return engine
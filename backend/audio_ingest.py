@@ -0,0 +1,216 @@
+"""Turn uploaded audio into 16 kHz mono 16-bit PCM for the recognizer without spawning ffmpeg.
+
+WAV and raw PCM are parsed in-process as NumPy views over the upload; FLAC/OGG/MP3
+go through libsndfile (soundfile) when installed. Anything else (WebM/Opus, AAC...)
+is decoded by PyAV in a persistent worker process, and only if PyAV is missing does
+it fall back to pydub, which runs ffmpeg once per call.
+"""
+import functools
+import io
+import multiprocessing
+import struct
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+TARGET_RATE = 16000
+
+_decode_pool = None
+
+
+class AudioDecodeError(ValueError):
+    """The upload could not be decoded by any available decoder"""
+
+
+# scipy and soundfile are optional and only imported once audio actually arrives
+@functools.lru_cache(maxsize=None)
+def _resample_poly():
+    try:
+        from scipy.signal import resample_poly
+        return resample_poly
+    except ImportError:
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def _soundfile():
+    try:
+        import soundfile
+        return soundfile
+    except ImportError:
+        return None
+
+
+def sniff_container(data):
+    """Best-effort container detection from magic bytes"""
+    head = bytes(data[:12])
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+        return 'wav'
+    if head[:4] == b'fLaC':
+        return 'flac'
+    if head[:4] == b'OggS':
+        return 'ogg'
+    if head[:3] == b'ID3' or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        return 'mp3'
+    if head[:4] == b'\x1a\x45\xdf\xa3':
+        return 'webm'
+    if head[4:8] == b'ftyp':
+        return 'mp4'
+    return 'unknown'
+
+
+def parse_wav(data):
+    """Return (samples, sample_rate) where samples is a (frames, channels) view into data"""
+    view = memoryview(data)
+    offset = 12
+    fmt = None
+    while offset + 8 <= len(view):
+        chunk_id = bytes(view[offset:offset + 4])
+        chunk_size = struct.unpack_from('<I', view, offset + 4)[0]
+        body = offset + 8
+        if chunk_id == b'fmt ':
+            fmt = list(struct.unpack_from('<HHIIHH', view, body))
+            if fmt[0] == 0xFFFE and chunk_size >= 40:
+                # WAVE_FORMAT_EXTENSIBLE: the real format code leads the sub-format GUID
+                fmt[0] = struct.unpack_from('<H', view, body + 24)[0]
+        elif chunk_id == b'data':
+            if fmt is None:
+                break
+            audio_format, channels, sample_rate, _, _, bits = fmt
+            # Streaming writers may leave the size unset; use what was actually uploaded
+            end = min(body + chunk_size, len(view)) if chunk_size else len(view)
+            dtype = _wav_dtype(audio_format, bits)
+            usable = (end - body) - (end - body) % (dtype.itemsize * channels)
+            samples = np.frombuffer(view[body:body + usable], dtype=dtype)
+            return samples.reshape(-1, channels), sample_rate
+        offset = body + chunk_size + (chunk_size & 1)
+    raise AudioDecodeError('Malformed WAV file')
+
+
+def _wav_dtype(audio_format, bits):
+    if audio_format == 1 and bits == 16:
+        return np.dtype('<i2')
+    if audio_format == 1 and bits == 32:
+        return np.dtype('<i4')
+    if audio_format == 1 and bits == 8:
+        return np.dtype('u1')
+    if audio_format == 3 and bits == 32:
+        return np.dtype('<f4')
+    raise AudioDecodeError(f'Unsupported WAV sample format {audio_format}/{bits}-bit')
+
+
+def to_mono_16k(samples, sample_rate):
+    """(frames, channels) samples of any dtype -> contiguous int16 mono at 16 kHz"""
+    if samples.dtype == np.int16 and samples.shape[1] == 1 and sample_rate == TARGET_RATE:
+        return samples.reshape(-1)
+
+    if samples.dtype == np.uint8:
+        audio = (samples.astype(np.float32) - 128.0) * 256.0
+    elif samples.dtype == np.int32:
+        audio = samples.astype(np.float32) / 65536.0
+    elif samples.dtype.kind == 'f':
+        audio = samples.astype(np.float32) * 32767.0
+    else:
+        audio = samples.astype(np.float32)
+    audio = audio.mean(axis=1) if audio.shape[1] > 1 else audio[:, 0]
+    audio = resample(audio, sample_rate, TARGET_RATE)
+    return np.clip(audio, -32768, 32767).astype(np.int16)
+
+
+def resample(audio, source_rate, target_rate):
+    """Polyphase resampling with scipy when available, otherwise linear interpolation"""
+    if source_rate == target_rate or len(audio) == 0:
+        return audio
+    resample_poly = _resample_poly()
+    if resample_poly is not None:
+        divisor = np.gcd(int(source_rate), int(target_rate))
+        return resample_poly(audio, target_rate // divisor, source_rate // divisor).astype(np.float32)
+    duration = len(audio) / float(source_rate)
+    positions = np.arange(int(duration * target_rate), dtype=np.float64) * (source_rate / float(target_rate))
+    return np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+
+
+def _decode_with_av(data):
+    """Runs inside the decode worker process"""
+    import av
+    with av.open(io.BytesIO(data)) as container:
+        resampler = av.AudioResampler(format='s16', layout='mono', rate=TARGET_RATE)
+        chunks = []
+        for frame in container.decode(audio=0):
+            for resampled in resampler.resample(frame):
+                chunks.append(resampled.to_ndarray().reshape(-1))
+        for resampled in resampler.resample(None):
+            chunks.append(resampled.to_ndarray().reshape(-1))
+    return np.concatenate(chunks).astype(np.int16) if chunks else np.empty(0, dtype=np.int16)
+
+
+def _decode_with_pydub(data):
+    from pydub import AudioSegment
+    segment = AudioSegment.from_file(io.BytesIO(data)).set_channels(1).set_frame_rate(TARGET_RATE)
+    return np.frombuffer(segment.set_sample_width(2).raw_data, dtype=np.int16)
+
+
+def _av_available():
+    try:
+        import av  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _ping():
+    return True
+
+
+def start_decode_pool(workers=1):
+    """Start the long-lived PyAV decode worker(s); a no-op when PyAV is not installed"""
+    global _decode_pool
+    if _decode_pool is None and workers > 0 and _av_available():
+        # spawn, not fork: the parent already holds model runtimes and their threads
+        _decode_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        # Start the worker now rather than on the first exotic upload
+        _decode_pool.submit(_ping).result()
+    return _decode_pool
+
+
+def ingest_audio(data, content_type='', sample_rate=None):
+    """Upload bytes -> int16 mono 16 kHz NumPy array (a view over the upload when no conversion is needed)"""
+    content_type = (content_type or '').lower()
+    if content_type.startswith(('audio/pcm', 'audio/l16', 'audio/raw')):
+        # Raw little-endian 16-bit mono; the rate comes from the caller or the mimetype
+        rate = sample_rate or _rate_from_mimetype(content_type) or TARGET_RATE
+        usable = len(data) - len(data) % 2
+        samples = np.frombuffer(memoryview(data)[:usable], dtype='<i2').reshape(-1, 1)
+        return to_mono_16k(samples, rate)
+
+    container = sniff_container(data)
+    if container == 'wav':
+        try:
+            return to_mono_16k(*parse_wav(data))
+        except AudioDecodeError:
+            pass
+    soundfile = _soundfile()
+    if container in ('flac', 'ogg', 'mp3', 'wav') and soundfile is not None:
+        try:
+            samples, rate = soundfile.read(io.BytesIO(data), dtype='int16', always_2d=True)
+            return to_mono_16k(samples, rate)
+        except Exception:
+            pass
+
+    # Exotic codecs: persistent PyAV worker, or ffmpeg through pydub as a last resort
+    try:
+        if _decode_pool is not None:
+            return _decode_pool.submit(_decode_with_av, bytes(data)).result()
+        if _av_available():
+            return _decode_with_av(bytes(data))
+        return _decode_with_pydub(bytes(data))
+    except Exception as e:
+        raise AudioDecodeError(f'Could not decode {container} audio: {e}') from e
+
+
+def _rate_from_mimetype(content_type):
+    for part in content_type.split(';')[1:]:
+        key, _, value = part.strip().partition('=')
+        if key == 'rate' and value.isdigit():
+            return int(value)
+    return None
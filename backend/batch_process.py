@@ -0,0 +1,187 @@
+"""Offline batch processing of recorded audio and images with the backend pipelines.
+
+Walks the given folders, runs audio through the /translate pipeline (decode, recognize,
+translate, correct) and images through the /predict_emotion pipeline, and appends one
+JSON line per file to --output. Files are spread over a pool of worker processes; the
+faces of a whole chunk of images go through the emotion model as one batch. Files
+already in the output are skipped, so an interrupted run continues where it stopped.
+
+Example:
+    python batch_process.py diary/audio diary/photos --output labels.jsonl --workers 4
+"""
+import argparse
+import json
+import mimetypes
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import get_context
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+AUDIO_EXTENSIONS = ('.wav', '.flac', '.ogg', '.opus', '.mp3', '.webm', '.m4a')
+
+
+def find_files(folders, types):
+    """(kind, absolute path) for every image/audio file under the folders, in a stable order"""
+    files = []
+    for folder in folders:
+        for root, dirs, names in os.walk(folder):
+            dirs.sort()
+            for name in sorted(names):
+                extension = os.path.splitext(name)[1].lower()
+                kind = 'image' if extension in IMAGE_EXTENSIONS else 'audio' if extension in AUDIO_EXTENSIONS else None
+                if kind in types:
+                    files.append((kind, os.path.abspath(os.path.join(root, name))))
+    return files
+
+
+def load_done(output, retry_errors):
+    """Paths already written to the output; a line cut off by an interruption is ignored"""
+    done = set()
+    if not os.path.exists(output):
+        return done
+    with open(output) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if not (retry_errors and 'error' in record):
+                done.add(record['path'])
+    return done
+
+
+def process_images(paths):
+    """Emotion results for a chunk of images; all of their faces are inferred in one model call"""
+    import numpy as np
+    import services
+
+    results, pending, batches = [], [], []
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                faces, face_batch = services.prepare_frame(f.read())
+        except Exception as e:
+            results.append({'path': path, 'type': 'image', 'error': f'{type(e).__name__}: {e}'})
+            continue
+        pending.append((path, faces, len(face_batch)))
+        batches.append(face_batch)
+
+    face_count = sum(count for _, _, count in pending)
+    try:
+        probabilities = services.emotion_backend.predict(np.concatenate(batches)) if face_count else []
+    except Exception as e:
+        return results + [{'path': path, 'type': 'image', 'error': f'{type(e).__name__}: {e}'}
+                          for path, _, _ in pending]
+    offset = 0
+    for path, faces, count in pending:
+        face_results = services.describe_faces(faces, probabilities[offset:offset + count])
+        offset += count
+        results.append({'path': path, 'type': 'image', 'emotion': services.dominant_emotion(face_results),
+                        'faces': face_results})
+    return results
+
+
+def process_audio(paths):
+    """Transcripts for a chunk of audio files, through the same stages as /translate.
+
+    The chunk's transcripts are translated together, so the provider gets them in list batches.
+    """
+    import speech_recognition as sr
+    import services
+
+    results, recognized = [], []
+    for path in paths:
+        record = {'path': path, 'type': 'audio'}
+        try:
+            with open(path, 'rb') as f:
+                audio_data = services.transcode_audio(f.read(), mimetypes.guess_type(path)[0] or '')
+            original_text, confidence = services.recognize_speech_scored(audio_data)
+            record.update({'text': original_text, 'confidence': confidence})
+            recognized.append(record)
+        except sr.UnknownValueError:
+            record['error'] = 'Could not understand audio'
+        except Exception as e:
+            record['error'] = f'{type(e).__name__}: {e}'
+        results.append(record)
+
+    try:
+        english_texts = services.translate_all_to_english([record['text'] for record in recognized])
+    except Exception as e:
+        for record in recognized:
+            record['error'] = f'{type(e).__name__}: {e}'
+        return results
+    for record, english_text in zip(recognized, english_texts):
+        try:
+            record['english_text'] = services.correct_transcript(record['text'], english_text, record['confidence'])
+        except Exception as e:
+            record['error'] = f'{type(e).__name__}: {e}'
+    return results
+
+
+def chunks(files, kind, size):
+    paths = [path for file_kind, path in files if file_kind == kind]
+    return [(kind, paths[i:i + size]) for i in range(0, len(paths), size)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Label folders of audio and images with the backend pipelines')
+    parser.add_argument('folders', nargs='+')
+    parser.add_argument('--output', required=True, help='JSONL file; appended to, and read back to resume')
+    parser.add_argument('--types', default='image,audio', help='image, audio or both')
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument('--image-batch', type=int, default=64, help='Images per task (one model call)')
+    parser.add_argument('--audio-batch', type=int, default=4, help='Audio files per task')
+    parser.add_argument('--retry-errors', action='store_true', help='Process files that failed last time again')
+    args = parser.parse_args()
+
+    types = {name.strip() for name in args.types.split(',')}
+    files = find_files(args.folders, types)
+    done = load_done(args.output, args.retry_errors)
+    todo = [(kind, path) for kind, path in files if path not in done]
+    print(f"[batch] {len(files)} files found, {len(files) - len(todo)} already done, {len(todo)} to process")
+    if not todo:
+        return
+
+    # Workers load only the engines they need, on first use
+    subsystems = []
+    if any(kind == 'image' for kind, _ in todo):
+        subsystems.append('emotion')
+    if any(kind == 'audio' for kind, _ in todo):
+        subsystems.extend(['speech', 'text'])
+    os.environ['SUBSYSTEMS'] = ','.join(subsystems)
+    os.environ['STARTUP_MODE'] = 'lazy'
+
+    tasks = chunks(todo, 'image', args.image_batch) + chunks(todo, 'audio', args.audio_batch)
+    handlers = {'image': process_images, 'audio': process_audio}
+    processed = errors = 0
+    started = time.perf_counter()
+    # Spawned, not forked: TensorFlow does not survive fork()
+    with ProcessPoolExecutor(args.workers, mp_context=get_context('spawn')) as pool, \
+            open(args.output, 'a') as output:
+        in_flight = set()
+        try:
+            while tasks or in_flight:
+                # A bounded number of tasks in flight keeps memory flat on large corpora
+                while tasks and len(in_flight) < 2 * args.workers:
+                    kind, paths = tasks.pop(0)
+                    in_flight.add(pool.submit(handlers[kind], paths))
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    for record in future.result():
+                        output.write(json.dumps(record) + '\n')
+                        processed += 1
+                        errors += 'error' in record
+                    output.flush()
+                rate = processed / (time.perf_counter() - started)
+                print(f"[batch] {processed}/{len(todo)} files ({errors} errors, {rate:.1f} files/s)")
+        except KeyboardInterrupt:
+            print("[batch] interrupted; run the same command again to resume")
+            for future in in_flight:
+                future.cancel()
+            sys.exit(130)
+
+
+if __name__ == '__main__':
+    main()
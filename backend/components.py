@@ -0,0 +1,122 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class SubsystemDisabled(RuntimeError):
+    """The component belongs to a subsystem this process was not started with"""
+
+
+class Component:
+    """An engine built on first use; concurrent callers wait for the one load in progress"""
+
+    def __init__(self, name, subsystem, loader):
+        self.name = name
+        self.subsystem = subsystem
+        self.loader = loader
+        self.value = None
+        self.loaded = False
+        self.error = None
+        self.load_seconds = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self.loaded:
+            return self.value
+        with self._lock:
+            if not self.loaded:
+                started = time.perf_counter()
+                try:
+                    self.value = self.loader()
+                except Exception as e:
+                    # Not cached: the next caller tries again
+                    self.error = f'{type(e).__name__}: {e}'
+                    raise
+                self.load_seconds = time.perf_counter() - started
+                self.error = None
+                self.loaded = True
+        return self.value
+
+
+class ComponentRegistry:
+    """Named, lazily loaded engines grouped into subsystems (emotion, speech, text, chat).
+
+    Only components of the enabled subsystems can be loaded; asking for another one
+    raises SubsystemDisabled. warmup() loads every enabled component up front, in
+    the calling thread or a background one.
+    """
+
+    def __init__(self, subsystems):
+        self.subsystems = set(subsystems)
+        self._components = OrderedDict()
+        self.warmup_seconds = None
+
+    def register(self, name, subsystem):
+        def decorator(loader):
+            self._components[name] = Component(name, subsystem, loader)
+            return loader
+        return decorator
+
+    def __contains__(self, name):
+        return name in self._components
+
+    def enabled(self, subsystem):
+        return subsystem in self.subsystems
+
+    def missing(self, subsystems):
+        return [subsystem for subsystem in subsystems if subsystem not in self.subsystems]
+
+    def loaded(self, name):
+        """True once the component has loaded; never starts the load"""
+        component = self._components[name]
+        return component.subsystem in self.subsystems and component.loaded
+
+    def get(self, name):
+        component = self._components[name]
+        if component.subsystem not in self.subsystems:
+            raise SubsystemDisabled(f"'{name}' needs the {component.subsystem} subsystem, "
+                                    f"which is not enabled in this process")
+        return component.get()
+
+    def preload(self, names):
+        """Load the named components now (those of disabled subsystems are skipped)"""
+        for name in names:
+            if name in self._components and self._components[name].subsystem in self.subsystems:
+                self._components[name].get()
+
+    def warmup(self, background=False):
+        def run():
+            started = time.perf_counter()
+            for component in self._components.values():
+                if component.subsystem in self.subsystems:
+                    try:
+                        component.get()
+                    except Exception as e:
+                        print(f"[startup] {component.name} failed to load: {e}")
+            self.warmup_seconds = time.perf_counter() - started
+            print(f"[startup] warm-up finished in {self.warmup_seconds:.2f}s")
+
+        if not background:
+            run()
+            return None
+        thread = threading.Thread(target=run, name='warmup', daemon=True)
+        thread.start()
+        return thread
+
+    def status(self):
+        components = {}
+        for component in self._components.values():
+            if component.subsystem not in self.subsystems:
+                continue
+            components[component.name] = {
+                'subsystem': component.subsystem,
+                'loaded': component.loaded,
+                'load_seconds': component.load_seconds,
+                'error': component.error,
+            }
+        return {
+            'ready': all(entry['loaded'] for entry in components.values()),
+            'subsystems': sorted(self.subsystems),
+            'warmup_seconds': self.warmup_seconds,
+            'components': components,
+        }
@@ -0,0 +1,187 @@
+import os
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, '') else default
+
+
+def _env_float(name, default):
+    value = os.environ.get(name)
+    return float(value) if value not in (None, '') else default
+
+
+def _env_str(name, default):
+    value = os.environ.get(name)
+    return value if value not in (None, '') else default
+
+
+def _env_int_list(name, default):
+    value = os.environ.get(name)
+    if value in (None, ''):
+        return default
+    return tuple(int(v) for v in value.split(',') if v.strip())
+
+
+# Emotion inference engine: keras, tflite or onnx (see convert_model.py)
+EMOTION_BACKEND = _env_str('EMOTION_BACKEND', 'keras')
+EMOTION_MODEL_PATH = _env_str('EMOTION_MODEL_PATH', '../emotion_detection/emotion_model.h5')
+EMOTION_INFERENCE_THREADS = _env_int('EMOTION_INFERENCE_THREADS', 0) or None
+EMOTION_WARMUP_BATCH_SIZES = _env_int_list('EMOTION_WARMUP_BATCH_SIZES', (1, 4, 32))
+
+# Face detector: haar, yunet (cv2.FaceDetectorYN .onnx) or ssd (res10 caffemodel + deploy.prototxt)
+FACE_DETECTOR = _env_str('FACE_DETECTOR', 'haar')
+FACE_HAAR_CASCADE = _env_str('FACE_HAAR_CASCADE', None)
+FACE_SCALE_FACTOR = _env_float('FACE_SCALE_FACTOR', 1.3)
+FACE_MIN_NEIGHBORS = _env_int('FACE_MIN_NEIGHBORS', 5)
+FACE_MIN_SIZE = _env_int('FACE_MIN_SIZE', 30)
+FACE_DNN_MODEL = _env_str('FACE_DNN_MODEL', None)
+FACE_DNN_CONFIG = _env_str('FACE_DNN_CONFIG', None)
+FACE_SCORE_THRESHOLD = _env_float('FACE_SCORE_THRESHOLD', 0.6)
+FACE_NMS_THRESHOLD = _env_float('FACE_NMS_THRESHOLD', 0.3)
+
+# Longest image side the face detector works on (0 = full resolution)
+EMOTION_DETECT_MAX_SIDE = _env_int('EMOTION_DETECT_MAX_SIDE', 640)
+
+# Emotion inference scheduler (cross-request micro-batching)
+EMOTION_BATCH_SIZE = _env_int('EMOTION_BATCH_SIZE', 32)
+EMOTION_BATCH_WAIT_MS = _env_float('EMOTION_BATCH_WAIT_MS', 5.0)
+EMOTION_QUEUE_DEPTH = _env_int('EMOTION_QUEUE_DEPTH', 256)
+EMOTION_RESULT_TIMEOUT = _env_float('EMOTION_RESULT_TIMEOUT', 10.0)
+
+# Webcam emotion stream sessions
+EMOTION_STREAM_DETECT_EVERY = _env_int('EMOTION_STREAM_DETECT_EVERY', 5)
+EMOTION_STREAM_ROI_THRESHOLD = _env_float('EMOTION_STREAM_ROI_THRESHOLD', 4.0)
+EMOTION_STREAM_SMOOTHING = _env_float('EMOTION_STREAM_SMOOTHING', 0.5)
+EMOTION_STREAM_TRACK_MIN_SCORE = _env_float('EMOTION_STREAM_TRACK_MIN_SCORE', 0.6)
+EMOTION_STREAM_SESSION_TTL = _env_float('EMOTION_STREAM_SESSION_TTL', 60.0)
+EMOTION_STREAM_MAX_SESSIONS = _env_int('EMOTION_STREAM_MAX_SESSIONS', 1000)
+
+# Ollama LLM client
+OLLAMA_URL = _env_str('OLLAMA_URL', 'http://127.0.0.1:11434')
+OLLAMA_MODEL = _env_str('OLLAMA_MODEL', 'gemma:2b')
+OLLAMA_CONNECT_TIMEOUT = _env_float('OLLAMA_CONNECT_TIMEOUT', 3.05)
+OLLAMA_READ_TIMEOUT = _env_float('OLLAMA_READ_TIMEOUT', 120.0)
+OLLAMA_RETRIES = _env_int('OLLAMA_RETRIES', 2)
+OLLAMA_POOL_SIZE = _env_int('OLLAMA_POOL_SIZE', 16)
+
+# ASGI serving mode (asgi_app.py) executor sizes
+ASGI_CPU_WORKERS = _env_int('ASGI_CPU_WORKERS', os.cpu_count() or 4)
+ASGI_IO_WORKERS = _env_int('ASGI_IO_WORKERS', 32)
+
+# Chat conversation memory
+CONVERSATION_STORE = _env_str('CONVERSATION_STORE', 'memory')
+CONVERSATION_DB = _env_str('CONVERSATION_DB', 'conversations.sqlite3')
+CONVERSATION_MAX_TURNS = _env_int('CONVERSATION_MAX_TURNS', 12)
+CONVERSATION_MAX_SESSIONS = _env_int('CONVERSATION_MAX_SESSIONS', 10000)
+CONVERSATION_TOKEN_BUDGET = _env_int('CONVERSATION_TOKEN_BUDGET', 1024)
+CONVERSATION_SUMMARY_TOKENS = _env_int('CONVERSATION_SUMMARY_TOKENS', 128)
+CONVERSATION_CONTEXT_MAX_TOKENS = _env_int('CONVERSATION_CONTEXT_MAX_TOKENS', 1536)
+
+# Chatbot response cache
+RESPONSE_CACHE_ENABLED = _env_int('RESPONSE_CACHE_ENABLED', 1) == 1
+RESPONSE_CACHE_MAX_ENTRIES = _env_int('RESPONSE_CACHE_MAX_ENTRIES', 1024)
+RESPONSE_CACHE_TTL = _env_float('RESPONSE_CACHE_TTL', 3600.0)
+RESPONSE_CACHE_SEMANTIC = _env_int('RESPONSE_CACHE_SEMANTIC', 0) == 1
+RESPONSE_CACHE_EMBED_MODEL = _env_str('RESPONSE_CACHE_EMBED_MODEL', 'nomic-embed-text')
+RESPONSE_CACHE_SIMILARITY = _env_float('RESPONSE_CACHE_SIMILARITY', 0.92)
+
+# Flask threads used to run the frame and audio parts of /companion side by side
+COMPANION_WORKERS = _env_int('COMPANION_WORKERS', 8)
+
+# Speech recognition engine: google (remote), vosk or whisper (local, faster-whisper)
+ASR_ENGINE = _env_str('ASR_ENGINE', 'google')
+ASR_MODEL_PATH = _env_str('ASR_MODEL_PATH', None)
+ASR_COMPUTE_TYPE = _env_str('ASR_COMPUTE_TYPE', 'int8')
+ASR_THREADS = _env_int('ASR_THREADS', 0)
+ASR_LANGUAGE = _env_str('ASR_LANGUAGE', None)
+ASR_FALLBACK = _env_str('ASR_FALLBACK', 'google')
+# ASR_ENGINE=stub (load tests): fixed transcript after a delay
+ASR_STUB_TEXT = _env_str('ASR_STUB_TEXT', None)
+ASR_STUB_LATENCY = _env_float('ASR_STUB_LATENCY', 0.0)
+
+# Streaming transcription (VAD segmentation over /speech_stream)
+# Starting threshold; the adaptive VAD follows the background noise from there
+SPEECH_ENERGY_THRESHOLD = _env_float('SPEECH_ENERGY_THRESHOLD', 300.0)
+SPEECH_FRAME_MS = _env_int('SPEECH_FRAME_MS', 30)
+SPEECH_END_SILENCE = _env_float('SPEECH_END_SILENCE', 0.6)
+SPEECH_MIN_SEGMENT = _env_float('SPEECH_MIN_SEGMENT', 0.25)
+SPEECH_MAX_SEGMENT = _env_float('SPEECH_MAX_SEGMENT', 30.0)
+SPEECH_PARTIAL_INTERVAL = _env_float('SPEECH_PARTIAL_INTERVAL', 1.0)
+SPEECH_PAUSE_DURATION = _env_float('SPEECH_PAUSE_DURATION', 5.0)
+SPEECH_MAX_PAUSES = _env_int('SPEECH_MAX_PAUSES', 4)
+# speech_to_text.py: utterances recognized at once, utterances waiting, and seconds capture
+# waits for room before an utterance is dropped
+SPEECH_WORKERS = _env_int('SPEECH_WORKERS', 3)
+SPEECH_QUEUE_SIZE = _env_int('SPEECH_QUEUE_SIZE', 32)
+SPEECH_QUEUE_TIMEOUT = _env_float('SPEECH_QUEUE_TIMEOUT', 5.0)
+
+# Audio uploads: WAV/PCM are parsed in-process; other codecs go to PyAV decode worker processes
+AUDIO_DECODE_WORKERS = _env_int('AUDIO_DECODE_WORKERS', 1)
+
+# Local language ID in front of the translator (fastText lid.176 model, else the langid package)
+LANGID_MODEL_PATH = _env_str('LANGID_MODEL_PATH', None)
+LANGID_ENGLISH_THRESHOLD = _env_float('LANGID_ENGLISH_THRESHOLD', 0.8)
+LANGID_OTHER_THRESHOLD = _env_float('LANGID_OTHER_THRESHOLD', 0.9)
+LANGID_MIN_CHARS = _env_int('LANGID_MIN_CHARS', 3)
+
+# Translation provider (googletrans, cloud or stub) and its cache
+TRANSLATE_PROVIDER = _env_str('TRANSLATE_PROVIDER', 'googletrans')
+TRANSLATE_CREDENTIALS = _env_str('TRANSLATE_CREDENTIALS', None)
+TRANSLATE_CACHE_MAX_ENTRIES = _env_int('TRANSLATE_CACHE_MAX_ENTRIES', 4096)
+TRANSLATE_CACHE_TTL = _env_float('TRANSLATE_CACHE_TTL', 86400.0)
+TRANSLATE_BATCH_SIZE = _env_int('TRANSLATE_BATCH_SIZE', 0)
+TRANSLATE_STUB_LATENCY = _env_float('TRANSLATE_STUB_LATENCY', 0.0)
+
+# Transcript normalization: spelling (symspell, textblob or none) and LanguageTool grammar
+CORRECTION_SPELLING = _env_str('CORRECTION_SPELLING', 'symspell')
+CORRECTION_DICTIONARY = _env_str('CORRECTION_DICTIONARY', None)
+CORRECTION_INDEX_CACHE = _env_str('CORRECTION_INDEX_CACHE', 'symspell_index.pickle')
+CORRECTION_MAX_EDIT_DISTANCE = _env_int('CORRECTION_MAX_EDIT_DISTANCE', 2)
+CORRECTION_MIN_WORDS = _env_int('CORRECTION_MIN_WORDS', 3)
+CORRECTION_SKIP_CONFIDENCE = _env_float('CORRECTION_SKIP_CONFIDENCE', 0.9)
+CORRECTION_CACHE_SIZE = _env_int('CORRECTION_CACHE_SIZE', 4096)
+GRAMMAR_ENABLED = _env_int('GRAMMAR_ENABLED', 1) == 1
+GRAMMAR_SERVER_URL = _env_str('GRAMMAR_SERVER_URL', None)
+GRAMMAR_LANGUAGE = _env_str('GRAMMAR_LANGUAGE', 'en-US')
+GRAMMAR_TIMEOUT = _env_float('GRAMMAR_TIMEOUT', 5.0)
+GRAMMAR_POOL_SIZE = _env_int('GRAMMAR_POOL_SIZE', 8)
+
+# Subsystems this process serves (emotion, speech, text, chat) and when their engines load:
+# lazy (first use), background (warm-up thread while serving) or eager (before serving)
+SUBSYSTEMS = [name.strip() for name in _env_str('SUBSYSTEMS', 'emotion,speech,text,chat').split(',') if name.strip()]
+STARTUP_MODE = _env_str('STARTUP_MODE', 'background')
+
+# Multi-process serving (serve.py): sockets of the shared inference processes, and the
+# read-only engines loaded once in the master so forked workers share them copy-on-write
+EMOTION_INFERENCE_SOCKETS = [path for path in _env_str('EMOTION_INFERENCE_SOCKETS', '').split(',') if path]
+EMOTION_INFERENCE_AUTHKEY = _env_str('EMOTION_INFERENCE_AUTHKEY', '')
+PRELOAD_COMPONENTS = [name.strip() for name in
+                      _env_str('PRELOAD_COMPONENTS', 'face_detector,language_router,text_corrector').split(',')
+                      if name.strip()]
+
+# Requests slower than this are logged with their per-stage timings (see telemetry.py)
+SLOW_REQUEST_SECONDS = _env_float('SLOW_REQUEST_SECONDS', 2.0)
+
+# Admission control per route group: concurrent requests, queued requests, seconds a queued
+# request may wait, and maximum upload bytes (enforced while the body is read). Counted per
+# process; serve.py divides the concurrency, queue and rate limits between its workers
+ADMISSION_ENABLED = _env_int('ADMISSION_ENABLED', 1) == 1
+ADMISSION_GROUPS = {
+    'image': (_env_int('ADMISSION_IMAGE_CONCURRENCY', 16), _env_int('ADMISSION_IMAGE_QUEUE', 64),
+              _env_float('ADMISSION_IMAGE_MAX_WAIT', 2.0), _env_int('MAX_IMAGE_BYTES', 10 * 1024 * 1024)),
+    'audio': (_env_int('ADMISSION_AUDIO_CONCURRENCY', 8), _env_int('ADMISSION_AUDIO_QUEUE', 32),
+              _env_float('ADMISSION_AUDIO_MAX_WAIT', 5.0), _env_int('MAX_AUDIO_BYTES', 25 * 1024 * 1024)),
+    # Sized to what the Ollama instance can generate at once; /companion also uploads a frame and audio
+    'chat': (_env_int('ADMISSION_CHAT_CONCURRENCY', 4), _env_int('ADMISSION_CHAT_QUEUE', 32),
+             _env_float('ADMISSION_CHAT_MAX_WAIT', 10.0), _env_int('MAX_CHAT_BYTES', 36 * 1024 * 1024)),
+    # /speech_stream and /emotion_stream/ws websockets (ASGI): open connections, none waiting; the byte
+    # limit is per /speech_stream message (webcam frames use the image limit)
+    'stream': (_env_int('ADMISSION_STREAM_CONNECTIONS', 32), 0, 0.0,
+               _env_int('MAX_STREAM_MESSAGE_BYTES', 1024 * 1024)),
+}
+# Per-client token bucket (0 disables); behind a proxy, trust X-Forwarded-For to tell clients apart
+RATE_LIMIT_PER_SECOND = _env_float('RATE_LIMIT_PER_SECOND', 5.0)
+RATE_LIMIT_BURST = _env_int('RATE_LIMIT_BURST', 20)
+RATE_LIMIT_MAX_CLIENTS = _env_int('RATE_LIMIT_MAX_CLIENTS', 10000)
+RATE_LIMIT_TRUST_PROXY = _env_int('RATE_LIMIT_TRUST_PROXY', 0) == 1
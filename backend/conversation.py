@@ -0,0 +1,185 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token for English text)"""
+    return max(1, len(text) // 4) if text else 0
+
+
+class Conversation:
+    """Recent turns, rolling summary and Ollama's KV-cache context for one chat session"""
+
+    def __init__(self, session_id, max_turns, turns=(), summary='', context=None):
+        self.session_id = session_id
+        self.turns = deque(turns, maxlen=max_turns)
+        self.summary = summary
+        self.context = context
+
+    def to_dict(self):
+        return {'turns': list(self.turns), 'summary': self.summary, 'context': self.context}
+
+    @classmethod
+    def from_dict(cls, session_id, max_turns, data):
+        turns = [tuple(turn) for turn in data.get('turns', [])]
+        return cls(session_id, max_turns, turns, data.get('summary', ''), data.get('context'))
+
+
+class SessionBusy(RuntimeError):
+    """Another turn of the same session is still being answered"""
+
+
+class ActiveTurns:
+    """Sessions with a turn in flight; an overlapping turn is refused rather than interleaved"""
+
+    def __init__(self):
+        self._active = {}
+        self._lock = threading.Lock()
+
+    def begin(self, session_id):
+        """Returns a release() for this turn; raises SessionBusy while another turn is in flight"""
+        token = object()
+        with self._lock:
+            if session_id in self._active:
+                raise SessionBusy('This session is still answering the previous message')
+            self._active[session_id] = token
+
+        def release():
+            # Safe to call more than once; never releases a later turn of the session
+            with self._lock:
+                if self._active.get(session_id) is token:
+                    del self._active[session_id]
+        return release
+
+
+class MemoryConversationStore:
+    """In-process store; least recently used sessions are dropped past max_sessions"""
+
+    def __init__(self, max_turns=12, max_sessions=10000):
+        self.max_turns = max_turns
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.active_turns = ActiveTurns()
+
+    def load(self, session_id=None):
+        session_id = session_id or uuid.uuid4().hex
+        with self._lock:
+            conversation = self._sessions.get(session_id)
+            if conversation is None:
+                conversation = Conversation(session_id, self.max_turns)
+            else:
+                self._sessions.move_to_end(session_id)
+            return conversation
+
+    def save(self, conversation):
+        with self._lock:
+            self._sessions[conversation.session_id] = conversation
+            self._sessions.move_to_end(conversation.session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+
+class SqliteConversationStore:
+    """Persistent store (one JSON row per session) so history survives restarts"""
+
+    def __init__(self, path, max_turns=12):
+        self.max_turns = max_turns
+        self._lock = threading.Lock()
+        # Per process: workers sharing the database file do not see each other's turns
+        self.active_turns = ActiveTurns()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('CREATE TABLE IF NOT EXISTS conversations '
+                         '(session_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated REAL NOT NULL)')
+        self._db.commit()
+
+    def load(self, session_id=None):
+        if not session_id:
+            return Conversation(uuid.uuid4().hex, self.max_turns)
+        with self._lock:
+            row = self._db.execute('SELECT data FROM conversations WHERE session_id = ?',
+                                   (session_id,)).fetchone()
+        if row is None:
+            return Conversation(session_id, self.max_turns)
+        return Conversation.from_dict(session_id, self.max_turns, json.loads(row[0]))
+
+    def save(self, conversation):
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO conversations VALUES (?, ?, ?)',
+                             (conversation.session_id, json.dumps(conversation.to_dict()), time.time()))
+            self._db.commit()
+
+
+def create_conversation_store(name, max_turns, max_sessions, db_path):
+    if name == 'memory':
+        return MemoryConversationStore(max_turns=max_turns, max_sessions=max_sessions)
+    if name == 'sqlite':
+        return SqliteConversationStore(db_path, max_turns=max_turns)
+    raise ValueError(f"Unknown conversation store '{name}' (expected memory or sqlite)")
+
+
+def extractive_summary(summary, user_message, bot_reply, max_tokens):
+    """Fold an evicted turn into the summary, keeping only the most recent max_tokens"""
+    summary = f'{summary} The user said: "{user_message}"'.strip()
+    max_chars = max_tokens * 4
+    if len(summary) > max_chars:
+        summary = '...' + summary[-max_chars:]
+    return summary
+
+
+class ContextAssembler:
+    """Builds each turn's prompt within a token budget and reuses Ollama's KV-cache context.
+
+    While the session holds a `context` from the previous reply that is still under
+    `context_max_tokens`, only the new user line is sent alongside it. Otherwise the
+    prompt is rebuilt from the system prompt, rolling summary and as many recent
+    turns as fit in `token_budget`, and the context returned by Ollama is kept for
+    the next turn.
+    """
+
+    def __init__(self, system_prompt, token_budget=1024, summary_tokens=128, context_max_tokens=1536,
+                 summarize_fn=extractive_summary):
+        self.system_prompt = system_prompt
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        self.context_max_tokens = context_max_tokens
+        self.summarize_fn = summarize_fn
+
+    def build(self, conversation, message, emotion=None):
+        """Returns (prompt, context); context is None when the prompt carries the history"""
+        turn = f'User: {message}\nBot:'
+        if emotion:
+            turn = f'(The user\'s facial expression looks {emotion.lower()}.)\n{turn}'
+        if conversation.context and len(conversation.context) <= self.context_max_tokens:
+            return turn, conversation.context
+
+        remaining = self.token_budget - estimate_tokens(self.system_prompt) - estimate_tokens(turn)
+        header = self.system_prompt
+        if conversation.summary:
+            summary_line = f'Summary of the conversation so far: {conversation.summary}\n'
+            header += summary_line
+            remaining -= estimate_tokens(summary_line)
+
+        history = []
+        for user_message, bot_reply in reversed(conversation.turns):
+            line = f'User: {user_message}\nBot: {bot_reply}\n'
+            cost = estimate_tokens(line)
+            if cost > remaining:
+                break
+            history.append(line)
+            remaining -= cost
+        return header + ''.join(reversed(history)) + turn, None
+
+    def record(self, conversation, message, reply, context=None):
+        """Append the finished turn, folding the evicted turn (if any) into the summary"""
+        if len(conversation.turns) == conversation.turns.maxlen:
+            evicted_user, evicted_bot = conversation.turns[0]
+            conversation.summary = self.summarize_fn(conversation.summary, evicted_user, evicted_bot,
+                                                     self.summary_tokens)
+        conversation.turns.append((message, reply))
+        # Past the cap the context is dropped so the next prompt is rebuilt compactly
+        conversation.context = context if context and len(context) <= self.context_max_tokens else None
@@ -0,0 +1,148 @@
+"""Convert emotion_model.h5 to a TFLite or ONNX engine and check it against the Keras model.
+
+Example:
+    python convert_model.py --mode int8 --calibration-dir faces/train --eval-dir faces/test
+
+Image folders hold face crops; when their sub-folders are named after the emotion
+classes (Angry, Happy, ...) accuracy is reported for both models as well.
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from emotion import class_names, FACE_SIZE
+from inference_backends import create_backend
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def load_face_folder(folder, limit=None):
+    """Load face images as a (N, 48, 48, 1) batch plus labels taken from sub-folder names"""
+    faces, labels = [], []
+    for root, _, files in os.walk(folder):
+        label_name = os.path.basename(root).capitalize()
+        label = class_names.index(label_name) if label_name in class_names else -1
+        for name in sorted(files):
+            if not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            gray = cv2.imread(os.path.join(root, name), cv2.IMREAD_GRAYSCALE)
+            if gray is None:
+                continue
+            faces.append(cv2.resize(gray, (FACE_SIZE, FACE_SIZE)))
+            labels.append(label)
+            if limit and len(faces) >= limit:
+                break
+        if limit and len(faces) >= limit:
+            break
+    if not faces:
+        raise SystemExit(f'No images found in {folder}')
+    return np.stack(faces).astype(np.float32)[..., np.newaxis], np.array(labels)
+
+
+def convert_tflite(model, mode, calibration):
+    import tensorflow as tf
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if mode == 'fp16':
+        converter.target_spec.supported_types = [tf.float16]
+    elif mode == 'int8':
+        if calibration is None:
+            raise SystemExit('--calibration-dir is required for int8 conversion')
+
+        def representative_dataset():
+            for face in calibration:
+                yield [face[np.newaxis]]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+    return converter.convert()
+
+
+def convert_onnx(model, out_path):
+    import tensorflow as tf
+    import tf2onnx
+    spec = (tf.TensorSpec((None, FACE_SIZE, FACE_SIZE, 1), tf.float32, name='input'),)
+    tf2onnx.convert.from_keras(model, input_signature=spec, output_path=out_path)
+
+
+def _timed_predict(backend, batch, batch_size=32):
+    outputs = []
+    started = time.perf_counter()
+    for start in range(0, len(batch), batch_size):
+        outputs.append(backend.predict(batch[start:start + batch_size]))
+    elapsed = time.perf_counter() - started
+    return np.concatenate(outputs), elapsed * 1000.0 / len(batch)
+
+
+def check_parity(keras_path, engine, engine_path, eval_batch, labels):
+    reference = create_backend('keras', keras_path)
+    candidate = create_backend(engine, engine_path)
+    reference.warmup((32,))
+    candidate.warmup((32,))
+
+    expected, ref_ms = _timed_predict(reference, eval_batch)
+    actual, cand_ms = _timed_predict(candidate, eval_batch)
+
+    agreement = float(np.mean(np.argmax(expected, axis=1) == np.argmax(actual, axis=1)))
+    print(f'Images evaluated:      {len(eval_batch)}')
+    print(f'Top-1 agreement:       {agreement:.4f}')
+    print(f'Max |prob| difference: {float(np.max(np.abs(expected - actual))):.4f}')
+    print(f'{"Keras per face:":<23}{ref_ms:.3f} ms')
+    print(f'{engine + " per face:":<23}{cand_ms:.3f} ms')
+
+    labelled = labels >= 0
+    if labelled.any():
+        ref_acc = np.mean(np.argmax(expected[labelled], axis=1) == labels[labelled])
+        cand_acc = np.mean(np.argmax(actual[labelled], axis=1) == labels[labelled])
+        print(f'{"Keras accuracy:":<23}{ref_acc:.4f}')
+        print(f'{engine + " accuracy:":<23}{cand_acc:.4f}')
+    return agreement
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert the emotion model and verify accuracy parity')
+    parser.add_argument('--keras', default='../emotion_detection/emotion_model.h5', help='Source Keras model')
+    parser.add_argument('--mode', choices=['fp16', 'int8', 'dynamic', 'onnx'], default='fp16')
+    parser.add_argument('--out', help='Output path (defaults next to the Keras model)')
+    parser.add_argument('--calibration-dir', help='Face images used to calibrate INT8 ranges')
+    parser.add_argument('--calibration-limit', type=int, default=500)
+    parser.add_argument('--eval-dir', help='Held-out face images used for the parity check')
+    parser.add_argument('--min-agreement', type=float, default=0.98,
+                        help='Fail when top-1 agreement with the Keras model is below this')
+    args = parser.parse_args()
+
+    import tensorflow as tf
+    model = tf.keras.models.load_model(args.keras)
+    base = os.path.splitext(args.keras)[0]
+
+    if args.mode == 'onnx':
+        engine = 'onnx'
+        out_path = args.out or f'{base}.onnx'
+        convert_onnx(model, out_path)
+    else:
+        engine = 'tflite'
+        out_path = args.out or f'{base}_{args.mode}.tflite'
+        calibration = None
+        if args.calibration_dir:
+            calibration, _ = load_face_folder(args.calibration_dir, limit=args.calibration_limit)
+        with open(out_path, 'wb') as f:
+            f.write(convert_tflite(model, args.mode, calibration))
+    print(f'Wrote {out_path} ({os.path.getsize(out_path) / 1024:.1f} KiB)')
+
+    if args.eval_dir:
+        eval_batch, labels = load_face_folder(args.eval_dir)
+        agreement = check_parity(args.keras, engine, out_path, eval_batch, labels)
+        if agreement < args.min_agreement:
+            print(f'Parity check failed: agreement {agreement:.4f} < {args.min_agreement}')
+            sys.exit(1)
+        print('Parity check passed')
+
+
+if __name__ == '__main__':
+    main()
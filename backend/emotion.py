@@ -0,0 +1,63 @@
+import cv2
+import numpy as np
+
+class_names = ['Angry', 'Disgusted', 'Fear', 'Happy', 'Sad', 'Surprise', 'Neutral']
+FACE_SIZE = 48
+
+
+def decode_gray(img_bytes):
+    """Decode an uploaded image straight to a single-channel array (None if undecodable)"""
+    return cv2.imdecode(np.frombuffer(img_bytes, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+
+
+def downscale_for_detection(gray, max_side):
+    """Shrink large frames so the detector works at a bounded resolution; returns (image, scale)"""
+    height, width = gray.shape[:2]
+    if not max_side or max(height, width) <= max_side:
+        return gray, 1.0
+    scale = max(height, width) / float(max_side)
+    size = (max(1, int(round(width / scale))), max(1, int(round(height / scale))))
+    return cv2.resize(gray, size, interpolation=cv2.INTER_AREA), scale
+
+
+def rescale_boxes(faces, scale, shape):
+    """Map boxes found on a downscaled frame back onto the full-resolution frame"""
+    if scale == 1.0 or len(faces) == 0:
+        return faces
+    height, width = shape[:2]
+    boxes = np.rint(np.asarray(faces, dtype=np.float32) * scale).astype(np.int32)
+    boxes[:, 0] = np.clip(boxes[:, 0], 0, width - 1)
+    boxes[:, 1] = np.clip(boxes[:, 1], 0, height - 1)
+    boxes[:, 2] = np.minimum(boxes[:, 2], width - boxes[:, 0])
+    boxes[:, 3] = np.minimum(boxes[:, 3], height - boxes[:, 1])
+    return boxes
+
+
+def preprocess_faces(gray, faces):
+    """Crop every detected face from the grayscale frame into one (N, 48, 48, 1) float32 batch"""
+    batch = np.empty((len(faces), FACE_SIZE, FACE_SIZE, 1), dtype=np.float32)
+    scratch = np.empty((FACE_SIZE, FACE_SIZE), dtype=np.uint8)
+    for i, (x, y, w, h) in enumerate(faces):
+        cv2.resize(gray[y:y + h, x:x + w], (FACE_SIZE, FACE_SIZE), dst=scratch)
+        batch[i, :, :, 0] = scratch
+    return batch
+
+
+def predict_batch(model, batch):
+    """Run the whole batch through the model in a single call"""
+    if len(batch) == 0:
+        return np.empty((0, len(class_names)), dtype=np.float32)
+    # Calling the model directly skips the per-call setup that model.predict does
+    return np.asarray(model(batch, training=False))
+
+
+def describe_faces(faces, probabilities):
+    """Build the per-face JSON payload (label, probabilities and bounding box)"""
+    results = []
+    for (x, y, w, h), probs in zip(faces, probabilities):
+        results.append({
+            'label': class_names[int(np.argmax(probs))],
+            'probabilities': {name: float(p) for name, p in zip(class_names, probs)},
+            'box': [int(x), int(y), int(w), int(h)],
+        })
+    return results
@@ -0,0 +1,181 @@
+import itertools
+import threading
+import time
+import uuid
+
+import cv2
+import numpy as np
+
+from emotion import class_names, FACE_SIZE
+
+
+def _iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union else 0.0
+
+
+class FaceTrack:
+    """State kept for one face between frames"""
+
+    def __init__(self, track_id, box, template):
+        self.track_id = track_id
+        self.box = box
+        self.template = template
+        self.last_face = None
+        self.probabilities = None
+
+
+class EmotionStreamSession:
+    """Per-client frame stream with face tracking and smoothed emotion output.
+
+    The face detector only runs every `detect_every` frames or when a track is
+    lost; in between, faces are followed by template matching around their last
+    position. Inference is skipped for faces whose 48x48 crop barely changed, and
+    the reported distribution is an exponential moving average across frames.
+    """
+
+    def __init__(self, detect_fn, predict_fn, detect_every=5, roi_change_threshold=4.0,
+                 smoothing=0.5, min_track_score=0.6, search_margin=0.25):
+        self.detect_fn = detect_fn
+        self.predict_fn = predict_fn
+        self.detect_every = max(1, detect_every)
+        self.roi_change_threshold = roi_change_threshold
+        self.smoothing = smoothing
+        self.min_track_score = min_track_score
+        self.search_margin = search_margin
+        self.tracks = []
+        self.frame_count = 0
+        self.last_seen = time.monotonic()
+        self._track_ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def process(self, gray):
+        """Update the session with a grayscale frame and return per-face results"""
+        with self._lock:
+            self.last_seen = time.monotonic()
+            detected = self.frame_count % self.detect_every == 0 or not self.tracks
+            if not detected and not self._follow_tracks(gray):
+                detected = True
+            if detected:
+                self._redetect(gray)
+            self.frame_count += 1
+
+            inferred = self._update_emotions(gray)
+            return {
+                'detected': detected,
+                'faces': [self._describe(track, track in inferred) for track in self.tracks],
+            }
+
+    def _follow_tracks(self, gray):
+        """Move every track to its best template match; False if any track was lost"""
+        frame_h, frame_w = gray.shape[:2]
+        for track in self.tracks:
+            x, y, w, h = track.box
+            mx, my = int(w * self.search_margin), int(h * self.search_margin)
+            x0, y0 = max(0, x - mx), max(0, y - my)
+            x1, y1 = min(frame_w, x + w + mx), min(frame_h, y + h + my)
+            window = gray[y0:y1, x0:x1]
+            if window.shape[0] < h or window.shape[1] < w:
+                return False
+
+            scores = cv2.matchTemplate(window, track.template, cv2.TM_CCOEFF_NORMED)
+            _, score, _, (dx, dy) = cv2.minMaxLoc(scores)
+            if score < self.min_track_score:
+                return False
+            track.box = (x0 + dx, y0 + dy, w, h)
+        return True
+
+    def _redetect(self, gray):
+        """Run the detector and keep smoothing state for faces that overlap old tracks"""
+        tracks = []
+        unmatched = list(self.tracks)
+        for box in self.detect_fn(gray):
+            box = tuple(int(v) for v in box)
+            x, y, w, h = box
+            template = gray[y:y + h, x:x + w].copy()
+
+            best = max(unmatched, key=lambda t: _iou(t.box, box), default=None)
+            if best is not None and _iou(best.box, box) > 0.3:
+                unmatched.remove(best)
+                best.box, best.template = box, template
+                tracks.append(best)
+            else:
+                tracks.append(FaceTrack(next(self._track_ids), box, template))
+        self.tracks = tracks
+
+    def _update_emotions(self, gray):
+        """Infer only the faces whose crop changed and fold results into the moving average"""
+        changed = []
+        crops = []
+        for track in self.tracks:
+            x, y, w, h = track.box
+            face = cv2.resize(gray[y:y + h, x:x + w], (FACE_SIZE, FACE_SIZE))
+            if track.last_face is not None and track.probabilities is not None:
+                diff = cv2.absdiff(face, track.last_face).mean()
+                if diff < self.roi_change_threshold:
+                    continue
+            track.last_face = face
+            changed.append(track)
+            crops.append(face)
+
+        if not changed:
+            return changed
+
+        batch = np.stack(crops).astype(np.float32)[..., np.newaxis]
+        probabilities = self.predict_fn(batch)
+        for track, probs in zip(changed, probabilities):
+            probs = np.asarray(probs, dtype=np.float32)
+            if track.probabilities is None:
+                track.probabilities = probs
+            else:
+                track.probabilities = self.smoothing * probs + (1.0 - self.smoothing) * track.probabilities
+        return changed
+
+    def _describe(self, track, inferred):
+        probs = track.probabilities
+        return {
+            'track_id': track.track_id,
+            'box': [int(v) for v in track.box],
+            'label': class_names[int(np.argmax(probs))],
+            'probabilities': {name: float(p) for name, p in zip(class_names, probs)},
+            'inferred': inferred,
+        }
+
+
+class StreamSessionStore:
+    """Thread-safe registry of stream sessions with idle expiry"""
+
+    def __init__(self, session_factory, ttl=60.0, max_sessions=1000):
+        self.session_factory = session_factory
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def create(self):
+        with self._lock:
+            self._expire()
+            if len(self._sessions) >= self.max_sessions:
+                return None
+            session_id = uuid.uuid4().hex
+            self._sessions[session_id] = self.session_factory()
+            return session_id
+
+    def get(self, session_id):
+        with self._lock:
+            self._expire()
+            return self._sessions.get(session_id)
+
+    def close(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def _expire(self):
+        now = time.monotonic()
+        for session_id in [sid for sid, s in self._sessions.items() if now - s.last_seen > self.ttl]:
+            del self._sessions[session_id]
@@ -0,0 +1,100 @@
+import threading
+
+import cv2
+import numpy as np
+
+
+class HaarFaceDetector:
+    """OpenCV Haar cascade (the original detector)"""
+
+    name = 'haar'
+
+    def __init__(self, cascade_path=None, scale_factor=1.3, min_neighbors=5, min_size=30):
+        cascade_path = cascade_path or cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+        self.cascade = cv2.CascadeClassifier(cascade_path)
+        if self.cascade.empty():
+            raise ValueError(f'Could not load Haar cascade from {cascade_path}')
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = (min_size, min_size)
+
+    def detect(self, gray):
+        return self.cascade.detectMultiScale(gray, scaleFactor=self.scale_factor,
+                                             minNeighbors=self.min_neighbors, minSize=self.min_size)
+
+
+class YuNetFaceDetector:
+    """OpenCV's YuNet CNN detector (cv2.FaceDetectorYN, needs the face_detection_yunet .onnx file)"""
+
+    name = 'yunet'
+
+    def __init__(self, model_path, score_threshold=0.7, nms_threshold=0.3, min_size=30):
+        self.detector = cv2.FaceDetectorYN.create(model_path, '', (320, 320),
+                                                  score_threshold=score_threshold,
+                                                  nms_threshold=nms_threshold)
+        self.min_size = min_size
+        self._input_size = (320, 320)
+        self._lock = threading.Lock()
+
+    def detect(self, gray):
+        height, width = gray.shape[:2]
+        # YuNet expects a 3-channel image
+        bgr = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+        with self._lock:
+            if (width, height) != self._input_size:
+                self.detector.setInputSize((width, height))
+                self._input_size = (width, height)
+            _, faces = self.detector.detect(bgr)
+        if faces is None:
+            return np.empty((0, 4), dtype=np.int32)
+        return _clip_boxes(faces[:, :4], width, height, self.min_size)
+
+
+class SSDFaceDetector:
+    """res10 300x300 SSD face detector run through cv2.dnn on CPU"""
+
+    name = 'ssd'
+
+    def __init__(self, model_path, config_path, score_threshold=0.6, min_size=30):
+        self.net = cv2.dnn.readNetFromCaffe(config_path, model_path)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self.score_threshold = score_threshold
+        self.min_size = min_size
+        self._lock = threading.Lock()
+
+    def detect(self, gray):
+        height, width = gray.shape[:2]
+        blob = cv2.dnn.blobFromImage(cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR), 1.0, (300, 300),
+                                     (104.0, 177.0, 123.0))
+        with self._lock:
+            self.net.setInput(blob)
+            detections = self.net.forward()[0, 0]
+        detections = detections[detections[:, 2] >= self.score_threshold]
+        corners = detections[:, 3:7] * np.array([width, height, width, height], dtype=np.float32)
+        boxes = np.column_stack([corners[:, :2], corners[:, 2:] - corners[:, :2]])
+        return _clip_boxes(boxes, width, height, self.min_size)
+
+
+def _clip_boxes(boxes, width, height, min_size):
+    """Convert float (x, y, w, h) boxes to ints inside the frame and drop tiny ones"""
+    boxes = np.rint(boxes).astype(np.int32).reshape(-1, 4)
+    boxes[:, 0] = np.clip(boxes[:, 0], 0, width - 1)
+    boxes[:, 1] = np.clip(boxes[:, 1], 0, height - 1)
+    boxes[:, 2] = np.minimum(boxes[:, 2], width - boxes[:, 0])
+    boxes[:, 3] = np.minimum(boxes[:, 3], height - boxes[:, 1])
+    return boxes[(boxes[:, 2] >= min_size) & (boxes[:, 3] >= min_size)]
+
+
+def create_detector(name, settings):
+    """Build a detector from a settings object exposing the FACE_* values in config.py"""
+    if name == HaarFaceDetector.name:
+        return HaarFaceDetector(settings.FACE_HAAR_CASCADE, scale_factor=settings.FACE_SCALE_FACTOR,
+                                min_neighbors=settings.FACE_MIN_NEIGHBORS, min_size=settings.FACE_MIN_SIZE)
+    if name == YuNetFaceDetector.name:
+        return YuNetFaceDetector(settings.FACE_DNN_MODEL, score_threshold=settings.FACE_SCORE_THRESHOLD,
+                                 nms_threshold=settings.FACE_NMS_THRESHOLD, min_size=settings.FACE_MIN_SIZE)
+    if name == SSDFaceDetector.name:
+        return SSDFaceDetector(settings.FACE_DNN_MODEL, settings.FACE_DNN_CONFIG,
+                               score_threshold=settings.FACE_SCORE_THRESHOLD, min_size=settings.FACE_MIN_SIZE)
+    raise ValueError(f"Unknown face detector '{name}' (expected haar, yunet or ssd)")
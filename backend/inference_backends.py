@@ -0,0 +1,134 @@
+import threading
+
+import numpy as np
+
+from emotion import FACE_SIZE, predict_batch
+
+
+def _batch_bucket(size):
+    """Round a batch size up to the next power of two so engines see few distinct shapes"""
+    bucket = 1
+    while bucket < size:
+        bucket *= 2
+    return bucket
+
+
+def _pad_batch(batch, bucket):
+    if len(batch) == bucket:
+        return batch
+    padded = np.zeros((bucket,) + batch.shape[1:], dtype=batch.dtype)
+    padded[:len(batch)] = batch
+    return padded
+
+
+class KerasBackend:
+    """Full tensorflow.keras model, called directly instead of through model.predict"""
+
+    name = 'keras'
+
+    def __init__(self, model_path, num_threads=None):
+        import tensorflow as tf
+        if num_threads:
+            tf.config.threading.set_intra_op_parallelism_threads(num_threads)
+        self.model = tf.keras.models.load_model(model_path)
+
+    def predict(self, batch):
+        return predict_batch(self.model, batch)
+
+    def warmup(self, batch_sizes=(1,)):
+        for size in batch_sizes:
+            self.predict(np.zeros((size, FACE_SIZE, FACE_SIZE, 1), dtype=np.float32))
+
+
+class TFLiteBackend:
+    """Converted FP16/INT8 TensorFlow Lite model.
+
+    Uses tflite_runtime when installed so the worker never imports full TensorFlow.
+    One interpreter is kept per power-of-two batch size to avoid re-allocating
+    tensors whenever the batch size changes.
+    """
+
+    name = 'tflite'
+
+    def __init__(self, model_path, num_threads=None):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            from tensorflow.lite.python.interpreter import Interpreter
+        self._interpreter_cls = Interpreter
+        self.model_path = model_path
+        self.num_threads = num_threads
+        self._interpreters = {}
+        self._lock = threading.Lock()
+        # Load the bucket-1 interpreter now so a bad model path fails at startup
+        self._get_interpreter(1)
+
+    def _get_interpreter(self, bucket):
+        interpreter = self._interpreters.get(bucket)
+        if interpreter is None:
+            interpreter = self._interpreter_cls(model_path=self.model_path, num_threads=self.num_threads)
+            input_index = interpreter.get_input_details()[0]['index']
+            interpreter.resize_tensor_input(input_index, [bucket, FACE_SIZE, FACE_SIZE, 1])
+            interpreter.allocate_tensors()
+            self._interpreters[bucket] = interpreter
+        return interpreter
+
+    def predict(self, batch):
+        count = len(batch)
+        bucket = _batch_bucket(count)
+        with self._lock:
+            interpreter = self._get_interpreter(bucket)
+            input_details = interpreter.get_input_details()[0]
+            output_details = interpreter.get_output_details()[0]
+
+            x = _pad_batch(batch, bucket)
+            scale, zero_point = input_details['quantization']
+            if input_details['dtype'] != np.float32 and scale:
+                info = np.iinfo(input_details['dtype'])
+                x = np.clip(np.round(x / scale + zero_point), info.min, info.max)
+            interpreter.set_tensor(input_details['index'], x.astype(input_details['dtype']))
+            interpreter.invoke()
+            y = interpreter.get_tensor(output_details['index'])
+
+        scale, zero_point = output_details['quantization']
+        if output_details['dtype'] != np.float32 and scale:
+            y = (y.astype(np.float32) - zero_point) * scale
+        return y[:count]
+
+    def warmup(self, batch_sizes=(1,)):
+        for size in batch_sizes:
+            self.predict(np.zeros((size, FACE_SIZE, FACE_SIZE, 1), dtype=np.float32))
+
+
+class OnnxBackend:
+    """ONNX Runtime CPU session for a model exported with convert_model.py --mode onnx"""
+
+    name = 'onnx'
+
+    def __init__(self, model_path, num_threads=None):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch):
+        return self.session.run(None, {self.input_name: batch})[0]
+
+    def warmup(self, batch_sizes=(1,)):
+        for size in batch_sizes:
+            self.predict(np.zeros((size, FACE_SIZE, FACE_SIZE, 1), dtype=np.float32))
+
+
+BACKENDS = {
+    KerasBackend.name: KerasBackend,
+    TFLiteBackend.name: TFLiteBackend,
+    OnnxBackend.name: OnnxBackend,
+}
+
+
+def create_backend(name, model_path, num_threads=None):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}' (expected one of {', '.join(BACKENDS)})")
+    return BACKENDS[name](model_path, num_threads=num_threads)
@@ -0,0 +1,142 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class QueueFullError(Exception):
+    """Raised when the scheduler queue is at its configured depth"""
+
+
+class InferenceScheduler:
+    """Collects face batches from concurrent requests and runs them as one model call.
+
+    A batch is flushed as soon as `max_batch_size` faces are pending or the oldest
+    pending request has waited `max_wait_ms`, whichever comes first.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=32, max_wait_ms=5.0, max_queue_depth=256):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue_depth = max_queue_depth
+        self._queue = queue.Queue(maxsize=max_queue_depth)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {
+            'requests': 0,
+            'faces': 0,
+            'batches': 0,
+            'rejected': 0,
+            'errors': 0,
+            'flush_on_size': 0,
+            'flush_on_deadline': 0,
+            'last_batch_size': 0,
+            'queue_wait_ms_total': 0.0,
+            'inference_ms_total': 0.0,
+        }
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='inference-scheduler', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def submit(self, batch):
+        """Queue a (N, 48, 48, 1) batch and return a Future resolving to its probabilities"""
+        future = Future()
+        if len(batch) == 0:
+            future.set_result(np.empty((0, 0), dtype=np.float32))
+            return future
+        try:
+            self._queue.put_nowait((batch, future, time.perf_counter()))
+        except queue.Full:
+            with self._lock:
+                self._stats['rejected'] += 1
+            raise QueueFullError(f'Inference queue is full ({self.max_queue_depth} pending requests)')
+        return future
+
+    def predict(self, batch, timeout=None):
+        return self.submit(batch).result(timeout=timeout)
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+
+            pending = [first]
+            face_count = len(first[0])
+            deadline = first[2] + self.max_wait
+            stop_after_flush = False
+
+            while face_count < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop_after_flush = True
+                    break
+                pending.append(item)
+                face_count += len(item[0])
+
+            self._flush(pending, flushed_on_size=face_count >= self.max_batch_size)
+            if stop_after_flush:
+                break
+
+    def _flush(self, pending, flushed_on_size):
+        started = time.perf_counter()
+        queue_wait = sum(started - enqueued for _, _, enqueued in pending)
+        batch = pending[0][0] if len(pending) == 1 else np.concatenate([item[0] for item in pending])
+
+        try:
+            probabilities = self.predict_fn(batch)
+        except Exception as e:
+            for _, future, _ in pending:
+                future.set_exception(e)
+            with self._lock:
+                self._stats['errors'] += 1
+            return
+
+        offset = 0
+        for faces, future, _ in pending:
+            future.set_result(probabilities[offset:offset + len(faces)])
+            offset += len(faces)
+
+        with self._lock:
+            self._stats['requests'] += len(pending)
+            self._stats['faces'] += len(batch)
+            self._stats['batches'] += 1
+            self._stats['flush_on_size' if flushed_on_size else 'flush_on_deadline'] += 1
+            self._stats['last_batch_size'] = len(batch)
+            self._stats['queue_wait_ms_total'] += queue_wait * 1000.0
+            self._stats['inference_ms_total'] += (time.perf_counter() - started) * 1000.0
+
+    def metrics(self):
+        """Snapshot of scheduler configuration and counters"""
+        with self._lock:
+            stats = dict(self._stats)
+        batches = stats['batches'] or 1
+        requests = stats['requests'] or 1
+        stats.update({
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+            'max_queue_depth': self.max_queue_depth,
+            'queue_depth': self._queue.qsize(),
+            'avg_batch_size': stats['faces'] / batches,
+            'avg_queue_wait_ms': stats['queue_wait_ms_total'] / requests,
+            'avg_inference_ms': stats['inference_ms_total'] / batches,
+        })
+        return stats
@@ -0,0 +1,185 @@
+"""Model-owning inference processes shared by all web workers.
+
+Each process loads the emotion engine once and listens on a Unix socket. Workers
+write their face batch into a shared-memory block, send only the block name and
+shape, and read the probabilities back from the same block, so tensors are never
+pickled. Every process runs its own InferenceScheduler, which batches faces across
+all connected workers.
+"""
+import atexit
+import itertools
+import threading
+from multiprocessing import get_context
+from multiprocessing.connection import Client, Listener
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from emotion import class_names
+from inference_scheduler import QueueFullError
+
+
+def _attach(name):
+    """Open a block created by a worker without letting this process unlink it at exit"""
+    try:
+        return SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: undo the resource tracker registration by hand
+        from multiprocessing import resource_tracker
+        shm = SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+def _handle_connection(conn, scheduler, timeout):
+    shm = None
+    try:
+        while True:
+            name, shape = conn.recv()
+            if shm is None or shm.name != name:
+                # The worker grew its block; drop the old mapping
+                if shm is not None:
+                    shm.close()
+                shm = _attach(name)
+            # Copied out so no view into the block outlives this request
+            batch = np.ndarray(shape, dtype=np.float32, buffer=shm.buf).copy()
+            try:
+                probabilities = np.asarray(scheduler.predict(batch, timeout=timeout), dtype=np.float32)
+            except QueueFullError as e:
+                conn.send(('busy', str(e)))
+                continue
+            except Exception as e:
+                conn.send(('error', f'{type(e).__name__}: {e}'))
+                continue
+            out = np.ndarray(probabilities.shape, dtype=np.float32, buffer=shm.buf, offset=batch.nbytes)
+            out[:] = probabilities
+            del out
+            conn.send(('ok', probabilities.shape))
+    except (EOFError, OSError):
+        pass
+    finally:
+        if shm is not None:
+            shm.close()
+        conn.close()
+
+
+def serve(address, authkey, ready, settings):
+    """Process entry point: load and warm the engine, then answer workers until terminated"""
+    from inference_backends import create_backend
+    from inference_scheduler import InferenceScheduler
+
+    backend = create_backend(settings['backend'], settings['model_path'], num_threads=settings['threads'])
+    backend.warmup(settings['warmup_batch_sizes'])
+    scheduler = InferenceScheduler(
+        backend.predict,
+        max_batch_size=settings['batch_size'],
+        max_wait_ms=settings['batch_wait_ms'],
+        max_queue_depth=settings['queue_depth'],
+    ).start()
+
+    listener = Listener(address, family='AF_UNIX', authkey=authkey)
+    ready.set()
+    while True:
+        conn = listener.accept()
+        threading.Thread(target=_handle_connection, args=(conn, scheduler, settings['timeout']),
+                         daemon=True).start()
+
+
+def start_inference_processes(addresses, authkey, settings, startup_timeout=300.0):
+    """Start one model-owning process per socket address and wait until all are serving"""
+    context = get_context('spawn')
+    processes = []
+    for i, address in enumerate(addresses):
+        ready = context.Event()
+        process = context.Process(target=serve, args=(address, authkey, ready, settings),
+                                  name=f'inference-{i}', daemon=True)
+        process.start()
+        processes.append((process, ready))
+    for process, ready in processes:
+        if not ready.wait(startup_timeout) or not process.is_alive():
+            raise RuntimeError(f'{process.name} did not start')
+    return [process for process, _ in processes]
+
+
+class _Channel:
+    """One worker thread's connection and shared-memory block"""
+
+    def __init__(self, address, authkey):
+        self.conn = Client(address, family='AF_UNIX', authkey=authkey)
+        self.shm = None
+
+    def predict(self, batch):
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        needed = batch.nbytes + len(batch) * len(class_names) * 4
+        if self.shm is None or self.shm.size < needed:
+            self.close_block()
+            # Room for twice the batch so the block is not re-created on every larger frame
+            self.shm = SharedMemory(create=True, size=2 * needed)
+        np.ndarray(batch.shape, dtype=np.float32, buffer=self.shm.buf)[:] = batch
+        self.conn.send((self.shm.name, batch.shape))
+        status, payload = self.conn.recv()
+        if status == 'busy':
+            raise QueueFullError(payload)
+        if status != 'ok':
+            raise RuntimeError(f'Inference process failed: {payload}')
+        return np.ndarray(payload, dtype=np.float32, buffer=self.shm.buf, offset=batch.nbytes).copy()
+
+    def close_block(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def close(self):
+        self.close_block()
+        self.conn.close()
+
+
+class RemoteEmotionBackend:
+    """Emotion engine living in the inference processes; same predict/warmup as the local backends"""
+
+    name = 'remote'
+
+    def __init__(self, addresses, authkey):
+        self.addresses = list(addresses)
+        self.authkey = authkey
+        self._local = threading.local()
+        self._next = itertools.count()
+        self._channels = []
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def _channel(self):
+        channel = getattr(self._local, 'channel', None)
+        if channel is None:
+            # Threads are spread over the processes round-robin
+            address = self.addresses[next(self._next) % len(self.addresses)]
+            channel = self._local.channel = _Channel(address, self.authkey)
+            with self._lock:
+                self._channels.append(channel)
+        return channel
+
+    def predict(self, batch):
+        if len(batch) == 0:
+            return np.empty((0, len(class_names)), dtype=np.float32)
+        channel = self._channel()
+        try:
+            return channel.predict(batch)
+        except (EOFError, OSError):
+            # The inference process went away; reconnect on the next call
+            self._local.channel = None
+            channel.close()
+            raise
+
+    def warmup(self, batch_sizes=(1,)):
+        # The inference processes warm their engines before accepting connections
+        pass
+
+    def close(self):
+        with self._lock:
+            channels, self._channels = self._channels, []
+        for channel in channels:
+            try:
+                channel.close()
+            except OSError:
+                pass
@@ -0,0 +1,80 @@
+class LanguageIdentifier:
+    """Local character n-gram language ID, so most utterances skip the remote detect call.
+
+    Uses a fastText language-ID model (lid.176.ftz/bin) when `model_path` is set and the
+    fasttext package is installed, otherwise the langid package and its bundled model.
+    With neither available `identify` returns (None, 0.0) and callers fall back to the
+    remote translator.
+    """
+
+    def __init__(self, model_path=None):
+        self.name = 'none'
+        self._predict = None
+        if model_path:
+            try:
+                import fasttext
+                model = fasttext.load_model(model_path)
+                self._predict = lambda text: self._fasttext_predict(model, text)
+                self.name = 'fasttext'
+            except ImportError:
+                print("[langid] fasttext is not installed; trying langid")
+        if self._predict is None:
+            try:
+                from langid.langid import LanguageIdentifier as LangidModel, model
+                langid_model = LangidModel.from_modelstring(model, norm_probs=True)
+                self._predict = langid_model.classify
+                self.name = 'langid'
+            except ImportError:
+                print("[langid] No local language-ID model available; detection stays remote")
+
+    @staticmethod
+    def _fasttext_predict(model, text):
+        # fastText rejects newlines and returns labels like '__label__en'
+        labels, probabilities = model.predict(text.replace('\n', ' '), k=1)
+        return labels[0].replace('__label__', ''), float(probabilities[0])
+
+    @property
+    def available(self):
+        return self._predict is not None
+
+    def identify(self, text):
+        """(language code, confidence in [0, 1]) or (None, 0.0) when it cannot tell"""
+        text = text.strip()
+        if not text or self._predict is None:
+            return None, 0.0
+        lang, confidence = self._predict(text)
+        return lang, float(confidence)
+
+
+class LanguageRouter:
+    """Decides from the local language ID whether a text needs the remote translator.
+
+    route() returns one of
+      ('english', 'en')   confidently English: nothing to translate
+      ('known', code)     confidently another language: translate with src=code, no detect call
+      ('unknown', None)   not confident (or text shorter than min_chars): let the translator detect
+    """
+
+    def __init__(self, identifier, english_threshold=0.8, other_threshold=0.9, min_chars=3):
+        self.identifier = identifier
+        self.english_threshold = english_threshold
+        self.other_threshold = other_threshold
+        self.min_chars = min_chars
+
+    def route(self, text):
+        if len(text.strip()) < self.min_chars:
+            return 'unknown', None
+        lang, confidence = self.identifier.identify(text)
+        if lang == 'en' and confidence >= self.english_threshold:
+            return 'english', 'en'
+        if lang and lang != 'en' and confidence >= self.other_threshold:
+            return 'known', lang
+        return 'unknown', None
+
+
+# fastText/langid use bare ISO 639-1 codes where googletrans wants a regional or legacy one
+_GOOGLETRANS_CODES = {'zh': 'zh-cn', 'jv': 'jw'}
+
+
+def to_googletrans_code(code):
+    return _GOOGLETRANS_CODES.get(code, code)
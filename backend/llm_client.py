@@ -0,0 +1,181 @@
+import asyncio
+import json
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+SYSTEM_PROMPT = (
+    "You are a compassionate and empathetic AI trained to provide emotional and mental support."
+    "Reply to the user with compassion, warmth, and comfort in less than 100 characters.\n"
+)
+
+
+def build_prompt(message):
+    return f"{SYSTEM_PROMPT}User: {message}\nBot:"
+
+
+class LLMError(Exception):
+    """Raised when Ollama is unreachable or answers with an error status"""
+
+
+def _parse_json(text):
+    """Decoded JSON from Ollama; a truncated or non-JSON body raises LLMError"""
+    try:
+        return json.loads(text)
+    except ValueError as e:
+        raise LLMError(f'Ollama returned invalid JSON: {e}') from e
+
+
+class OllamaClient:
+    """Pooled, keep-alive client for Ollama's /api/generate.
+
+    Connection failures and 502/503/504 answers are retried with backoff; once
+    generation has started nothing is retried, so streamed tokens are never repeated.
+    """
+
+    def __init__(self, base_url='http://127.0.0.1:11434', model='gemma:2b', connect_timeout=3.05,
+                 read_timeout=120.0, retries=2, pool_size=16):
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.timeout = (connect_timeout, read_timeout)
+
+        retry = Retry(total=retries, connect=retries, read=0, status=retries, backoff_factor=0.2,
+                      status_forcelist=(502, 503, 504), allowed_methods=frozenset({'POST'}),
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _post(self, payload, stream):
+        try:
+            response = self.session.post(f'{self.base_url}/api/generate', json=payload,
+                                         timeout=self.timeout, stream=stream)
+        except requests.RequestException as e:
+            raise LLMError(f'Ollama request failed: {e}') from e
+        if response.status_code != 200:
+            raise LLMError(f'Ollama API error {response.status_code}: {response.text}')
+        return response
+
+    def generate(self, prompt, **options):
+        """Blocking generation; returns Ollama's JSON body ('response', 'context', timings)"""
+        payload = {'model': self.model, 'prompt': prompt, 'stream': False, **options}
+        return _parse_json(self._post(payload, stream=False).text)
+
+    def embed(self, text, model):
+        """Embedding vector for text from Ollama's /api/embeddings"""
+        try:
+            response = self.session.post(f'{self.base_url}/api/embeddings', json={'model': model, 'prompt': text},
+                                         timeout=self.timeout)
+        except requests.RequestException as e:
+            raise LLMError(f'Ollama request failed: {e}') from e
+        if response.status_code != 200:
+            raise LLMError(f'Ollama API error {response.status_code}: {response.text}')
+        body = _parse_json(response.text)
+        if not isinstance(body, dict) or 'embedding' not in body:
+            raise LLMError(f'Ollama returned no embedding: {response.text[:200]}')
+        return body['embedding']
+
+    def stream(self, prompt, **options):
+        """Yield Ollama's JSON chunks as they are generated; the last one has done=True"""
+        payload = {'model': self.model, 'prompt': prompt, 'stream': True, **options}
+        response = self._post(payload, stream=True)
+        try:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = _parse_json(line)
+                if 'error' in chunk:
+                    raise LLMError(f"Ollama API error: {chunk['error']}")
+                yield chunk
+                if chunk.get('done'):
+                    break
+        except requests.RequestException as e:
+            raise LLMError(f'Ollama stream interrupted: {e}') from e
+        finally:
+            response.close()
+
+
+class AsyncOllamaClient:
+    """asyncio counterpart of OllamaClient for the ASGI server (aiohttp connection pool).
+
+    The aiohttp session is created on first use so it binds to the serving event loop.
+    """
+
+    def __init__(self, base_url='http://127.0.0.1:11434', model='gemma:2b', connect_timeout=3.05,
+                 read_timeout=120.0, retries=2, pool_size=16):
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.pool_size = pool_size
+        self._session = None
+
+    def _get_session(self):
+        import aiohttp
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(sock_connect=self.connect_timeout, sock_read=self.read_timeout),
+            )
+        return self._session
+
+    async def _post(self, payload):
+        import aiohttp
+        session = self._get_session()
+        for attempt in range(self.retries + 1):
+            try:
+                response = await session.post(f'{self.base_url}/api/generate', json=payload)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt == self.retries:
+                    raise LLMError(f'Ollama request failed: {e}') from e
+            else:
+                if response.status == 200:
+                    return response
+                body = await response.text()
+                response.release()
+                if response.status not in (502, 503, 504) or attempt == self.retries:
+                    raise LLMError(f'Ollama API error {response.status}: {body}')
+            await asyncio.sleep(0.2 * (2 ** attempt))
+
+    async def generate(self, prompt, **options):
+        import aiohttp
+        payload = {'model': self.model, 'prompt': prompt, 'stream': False, **options}
+        response = await self._post(payload)
+        async with response:
+            try:
+                text = await response.text()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                raise LLMError(f'Ollama response interrupted: {e!r}') from e
+        return _parse_json(text)
+
+    async def stream(self, prompt, **options):
+        import aiohttp
+        payload = {'model': self.model, 'prompt': prompt, 'stream': True, **options}
+        response = await self._post(payload)
+        async with response:
+            try:
+                async for line in response.content:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    chunk = _parse_json(line)
+                    if 'error' in chunk:
+                        raise LLMError(f"Ollama API error: {chunk['error']}")
+                    yield chunk
+                    if chunk.get('done'):
+                        break
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                raise LLMError(f'Ollama stream interrupted: {e!r}') from e
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+
+def sse_event(data, event=None):
+    """Format one Server-Sent Events message"""
+    prefix = f'event: {event}\n' if event else ''
+    return f'{prefix}data: {json.dumps(data)}\n\n'
@@ -1,45 +1,116 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
-import cv2
-import numpy as np
-import tensorflow.keras.models
-from tensorflow.keras.preprocessing import image
-from PIL import Image
-import io
 import speech_recognition as sr
-from pydub import AudioSegment
-from googletrans import Translator, LANGUAGES
-import requests
-from textblob import TextBlob
-import language_tool_python
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import functools
+import time
+from llm_client import LLMError, sse_event
+from inference_scheduler import QueueFullError
+from audio_ingest import AudioDecodeError
+from components import SubsystemDisabled
+from conversation import SessionBusy
+from admission import Rejected, create_admission_controller
+from werkzeug.exceptions import RequestEntityTooLarge
+import config
+import services
+import telemetry
 
 app = Flask(__name__)
 CORS(app)
 
-# Load Emotion Detection Model
-model_best = tensorflow.keras.models.load_model('../emotion_detection/emotion_model.h5')
-class_names = ['Angry', 'Disgusted', 'Fear', 'Happy', 'Sad', 'Surprise', 'Neutral']
-face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-
-# Load Speech Recognition
-recognizer = sr.Recognizer()
-
-# Load Google Translator
-translator = Translator()
-
-# Grammar checker
-try:
-    grammar_tool = language_tool_python.LanguageTool('en-US')
-    grammar_enabled = True
-except Exception as e:
-    print(f"Grammar tool load failed: {e}")
-    grammar_enabled = False
+# Runs the frame and audio halves of a /companion request side by side
+companion_executor = ThreadPoolExecutor(max_workers=config.COMPANION_WORKERS)
+
+# Concurrency, queueing, rate and upload limits per route group (see admission.py)
+admission = create_admission_controller(config) if config.ADMISSION_ENABLED else None
+if admission is not None:
+    # Refused while the body is read, also for uploads sent without a Content-Length
+    app.config['MAX_CONTENT_LENGTH'] = max(limits[3] for limits in config.ADMISSION_GROUPS.values())
+
+def requires(*subsystems):
+    """503 when this process was started without a subsystem the route needs (see SUBSYSTEMS)"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            missing = services.registry.missing(subsystems)
+            if missing:
+                return jsonify({'error': f"Not served by this process: {', '.join(missing)}"}), 503
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def client_address():
+    return request.access_route[0] if config.RATE_LIMIT_TRUST_PROXY else request.remote_addr
+
+def rejected_response(e):
+    response = jsonify({'error': str(e)})
+    response.status_code = e.status
+    if e.retry_after:
+        response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+def admit(group, rate_limited=True):
+    """Rate limit, upload size and a concurrency slot of the route group before the view runs"""
+    def decorator(view):
+        if admission is None:
+            return view
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                limiter = admission.check(group, client_address(), request.content_length, rate_limited)
+                slot = limiter.acquire()
+            except Rejected as e:
+                return rejected_response(e)
+            try:
+                request.max_content_length = admission.max_bytes(group)
+            except AttributeError:
+                # Flask < 3.1: only the app-wide MAX_CONTENT_LENGTH is enforced while reading
+                pass
+            try:
+                response = app.make_response(view(*args, **kwargs))
+            except BaseException:
+                slot.release()
+                raise
+            # Released once the body is sent, so streamed replies hold their slot until done
+            response.call_on_close(slot.release)
+            return response
+        return wrapper
+    return decorator
+
+@app.before_request
+def start_trace():
+    # The URL rule, not the path, so session ids do not become label values
+    telemetry.begin_request(request.url_rule.rule if request.url_rule else 'unmatched', request.method)
+
+@app.after_request
+def finish_trace(response):
+    # Streamed replies end their trace when the last event is sent (see sse_response)
+    if not g.pop('trace_streamed', False):
+        telemetry.end_request(response.status_code)
+    return response
+
+@app.errorhandler(SubsystemDisabled)
+def subsystem_disabled(e):
+    return jsonify({'error': str(e)}), 503
+
+@app.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    return jsonify({'error': 'Upload too large'}), 413
 
 @app.route('/')
 def home():
     return 'Backend is working perfectly...'
 
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Which engines are loaded; 503 until every enabled one is"""
+    status = services.registry.status()
+    return jsonify(status), 200 if status['ready'] else 503
+
 @app.route('/predict_emotion', methods=['POST'])
+@requires('emotion')
+@admit('image')
 def predict_emotion():
     if 'image' not in request.files:
         return jsonify({'error': 'No image file provided'}), 400
@@ -50,36 +121,110 @@ def predict_emotion():
 
     try:
         img_bytes = file.read()
-        pil_image = Image.open(io.BytesIO(img_bytes)).convert('RGB')
-        frame = np.array(pil_image)
-        frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = face_cascade.detectMultiScale(gray, scaleFactor=1.3, minNeighbors=5, minSize=(30, 30))
-
-        predictions_list = []
-
-        for (x, y, w, h) in faces:
-            face_roi = frame[y:y + h, x:x + w]
-            face_image = cv2.resize(face_roi, (48, 48))
-            face_image = cv2.cvtColor(face_image, cv2.COLOR_BGR2GRAY)
-            face_image = image.img_to_array(face_image)
-            face_image = np.expand_dims(face_image, axis=0)
-            face_image = np.vstack([face_image])
-
-            predictions = model_best.predict(face_image)
-            emotion_label = class_names[np.argmax(predictions)]
-            predictions_list.append(emotion_label)
+        face_results = services.analyze_frame(img_bytes)
+        predictions_list = [face['label'] for face in face_results]
 
         if not predictions_list:
             return jsonify({'error': 'No face detected in image'}), 200
 
-        return jsonify({'predictions': predictions_list})
+        return jsonify({'predictions': predictions_list, 'faces': face_results})
 
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 503
+    except (TimeoutError, FutureTimeoutError):
+        # Results that do not come back in EMOTION_RESULT_TIMEOUT mean the model is overloaded
+        return jsonify({'error': 'Emotion inference timed out; try again shortly'}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/emotion_stream', methods=['POST'])
+@requires('emotion')
+def open_emotion_stream():
+    session_id = services.stream_sessions.create()
+    if session_id is None:
+        return jsonify({'error': 'Too many open stream sessions'}), 503
+    return jsonify({'session_id': session_id})
+
+@app.route('/emotion_stream/<session_id>/frame', methods=['POST'])
+@requires('emotion')
+# A webcam sends 15-30 frames a second; open sessions are capped by EMOTION_STREAM_MAX_SESSIONS instead
+@admit('image', rate_limited=False)
+def emotion_stream_frame(session_id):
+    session = services.stream_sessions.get(session_id)
+    if session is None:
+        return jsonify({'error': 'Unknown or expired session'}), 404
+
+    # Frames can come as a multipart 'image' field or as the raw request body
+    file = request.files.get('image')
+    img_bytes = file.read() if file is not None else request.get_data()
+    if not img_bytes:
+        return jsonify({'error': 'No frame provided'}), 400
+
+    try:
+        gray = services.decode_frame(img_bytes)
+        if gray is None:
+            return jsonify({'error': 'Could not decode frame'}), 400
+        result = session.process(gray)
+        result['predictions'] = [face['label'] for face in result['faces']]
+        return jsonify(result)
+
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 503
+    except (TimeoutError, FutureTimeoutError):
+        # Results that do not come back in EMOTION_RESULT_TIMEOUT mean the model is overloaded
+        return jsonify({'error': 'Emotion inference timed out; try again shortly'}), 503, {'Retry-After': '1'}
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/emotion_stream/<session_id>', methods=['DELETE'])
+@requires('emotion')
+def close_emotion_stream(session_id):
+    if not services.stream_sessions.close(session_id):
+        return jsonify({'error': 'Unknown or expired session'}), 404
+    return jsonify({'closed': session_id})
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Stage and request latency histograms in the Prometheus text format"""
+    body, content_type = telemetry.render()
+    return Response(body, content_type=content_type)
+
+def component_metrics(name):
+    """metrics() of a loaded engine; reporting never loads one"""
+    if not services.registry.loaded(name):
+        return jsonify({'loaded': False})
+    component = services.registry.get(name)
+    if component is None:
+        return jsonify({'enabled': False})
+    return jsonify(component.metrics())
+
+@app.route('/metrics/inference', methods=['GET'])
+def inference_metrics():
+    return component_metrics('emotion_scheduler')
+
+@app.route('/metrics/cache', methods=['GET'])
+def cache_metrics():
+    return component_metrics('response_cache')
+
+@app.route('/metrics/translation', methods=['GET'])
+def translation_metrics():
+    return component_metrics('translation_service')
+
+@app.route('/metrics/correction', methods=['GET'])
+def correction_metrics():
+    return component_metrics('text_corrector')
+
+@app.route('/metrics/admission', methods=['GET'])
+def admission_metrics():
+    if admission is None:
+        return jsonify({'enabled': False})
+    return jsonify(admission.metrics())
+
 @app.route('/translate', methods=['POST'])
+@requires('speech', 'text')
+@admit('audio')
 def transcribe():
     if 'audio' not in request.files:
         return jsonify({'error': 'No audio file provided'}), 400
@@ -88,43 +233,20 @@ def transcribe():
 
     try:
         audio_bytes = audio_file.read()
-        audio_segment = AudioSegment.from_file(io.BytesIO(audio_bytes))
-        audio_segment = audio_segment.set_channels(1).set_frame_rate(16000)
-
-        wav_buffer = io.BytesIO()
-        audio_segment.export(wav_buffer, format="wav")
-        wav_buffer.seek(0)
-
-        with sr.AudioFile(wav_buffer) as source:
-            audio_data = recognizer.record(source)
-            original_text = recognizer.recognize_google(audio_data)
-
+        audio_data = services.transcode_audio(audio_bytes, audio_file.mimetype)
+        original_text, confidence = services.recognize_speech_scored(audio_data)
         print(f"[Original] {original_text}")
 
-        # Detect language and translate using googletrans
-        detected_lang = translator.detect(original_text).lang
-        if detected_lang != 'en':
-            translated = translator.translate(original_text, src=detected_lang, dest='en')
-            translated_text = translated.text
-        else:
-            translated_text = original_text
-
+        translated_text = services.translate_to_english(original_text)
         print(f"[English] {translated_text}")
 
-        # Spell correction using TextBlob
-        corrected_text = str(TextBlob(translated_text).correct())
-
-        # Grammar correction using LanguageTool
-        if grammar_enabled:
-            matches = grammar_tool.check(corrected_text)
-            final_text = language_tool_python.utils.correct(corrected_text, matches)
-        else:
-            final_text = corrected_text
-
+        final_text = services.correct_transcript(original_text, translated_text, confidence)
         return jsonify({"english_text": final_text})
 
     except sr.UnknownValueError:
         return jsonify({"error": "Could not understand audio"}), 400
+    except AudioDecodeError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         import traceback
         print("[ERROR] Exception in /translate route:")
@@ -132,6 +254,8 @@ def transcribe():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/chatbot', methods=['POST'])
+@requires('chat')
+@admit('chat')
 def chat_with_bot():
     try:
         data = request.get_json()
@@ -139,29 +263,149 @@ def chat_with_bot():
         if not user_message.strip():
             return jsonify({"error": "Empty message provided"}), 400
 
-        prompt = (
-            "You are a compassionate and empathetic AI trained to provide emotional and mental support."
-            "Reply to the user with compassion, warmth, and comfort in less than 100 characters.\n"
-            f"User: {user_message}\n"
-            "Bot:"
-        )
-
-        payload = {
-            "model": "gemma:2b",
-            "prompt": prompt,
-            "stream": False
-        }
-        response = requests.post("http://127.0.0.1:11434/api/generate", json=payload)
-        if response.status_code == 200:
-            bot_response = response.json()["response"].strip()
-            return jsonify({"response": bot_response}) 
-        else:
-            return jsonify({"error": f"Ollama API error {response.status_code}: {response.text}"}), 500
+        wants_stream = data.get('stream') or 'text/event-stream' in request.headers.get('Accept', '')
+        return chat_response(data.get('session_id'), user_message, wants_stream)
+
+    except SessionBusy as e:
+        return jsonify({"error": str(e)}), 409
+    except LLMError as e:
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/companion', methods=['POST'])
+@requires('chat')
+@admit('chat')
+def companion():
+    """One round-trip per turn: optional frame, audio and text in, one (streamed) reply out"""
+    image = request.files.get('image')
+    audio = request.files.get('audio')
+    message = request.form.get('message', '').strip()
+    if image is None and audio is None and not message:
+        return jsonify({"error": "Provide an image, audio or message"}), 400
+    if audio is not None and services.registry.missing(('speech', 'text')):
+        return jsonify({"error": "Audio is not served by this process"}), 503
+    if not services.registry.enabled('emotion'):
+        # The frame only adds context to the reply
+        image = None
 
+    try:
+        # Face inference and speech transcription run concurrently
+        face_future = (companion_executor.submit(telemetry.bind(services.analyze_frame, image.read()))
+                       if image else None)
+        speech_future = (companion_executor.submit(
+            telemetry.bind(services.transcribe_to_english, audio.read(), audio.mimetype)) if audio else None)
+
+        face_results = []
+        if face_future is not None:
+            try:
+                face_results = face_future.result()
+            except (ValueError, QueueFullError, TimeoutError, FutureTimeoutError) as e:
+                # The reply does not depend on the emotion, so answer without it
+                print(f"[companion] emotion skipped: {e!r}")
+
+        english_text = None
+        if speech_future is not None:
+            try:
+                english_text = speech_future.result()
+            except sr.UnknownValueError:
+                english_text = None
+            except AudioDecodeError as e:
+                return jsonify({"error": str(e)}), 400
+
+        user_message = message or english_text
+        if not user_message:
+            return jsonify({"error": "Could not understand audio"}), 400
+
+        emotion = services.dominant_emotion(face_results)
+        extra = {"emotion": emotion, "faces": face_results, "english_text": english_text}
+        wants_stream = (request.form.get('stream', '').lower() in ('1', 'true')
+                        or 'text/event-stream' in request.headers.get('Accept', ''))
+        return chat_response(request.form.get('session_id'), user_message, wants_stream, emotion, extra)
+
+    except SessionBusy as e:
+        return jsonify({"error": str(e)}), 409
+    except LLMError as e:
+        return jsonify({"error": str(e)}), 500
     except Exception as e:
         import traceback
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+def chat_response(session_id, user_message, wants_stream, emotion=None, extra=None):
+    """Reply to one chat turn as JSON or Server-Sent Events; extra fields are sent along"""
+    extra = extra or {}
+    # Recent turns + rolling summary, or Ollama's cached context from the last reply
+    conversation, prompt, options, release = services.start_chat_turn(session_id, user_message, emotion)
+    try:
+        cached_reply, cache_probe = services.lookup_cached_reply(conversation, user_message, emotion)
+        if cached_reply is not None:
+            services.finish_chat_turn(conversation, user_message, cached_reply, None)
+            release()
+            if wants_stream:
+                return sse_response(cached_stream(conversation, cached_reply, extra))
+            return jsonify({**extra, "response": cached_reply, "session_id": conversation.session_id,
+                            "cached": True})
+
+        # Stream tokens as Server-Sent Events when the client asks for it; the session is held until it closes
+        if wants_stream:
+            return sse_response(stream_with_context(
+                stream_reply(conversation, user_message, prompt, options, cache_probe, extra)), on_close=release)
+
+        with telemetry.stage('llm_total'):
+            result = services.llm_client.generate(prompt, **options)
+        bot_response = result["response"].strip()
+        services.finish_chat_turn(conversation, user_message, bot_response, result.get("context"))
+    except BaseException:
+        release()
+        raise
+    release()
+    services.store_cached_reply(cache_probe, bot_response)
+    return jsonify({**extra, "response": bot_response, "session_id": conversation.session_id})
+
+def sse_response(events, on_close=None):
+    response = Response(events, mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    if on_close is not None:
+        response.call_on_close(on_close)
+    trace = telemetry.current_trace()
+    if trace is not None:
+        # Timed to the last event, so the LLM stages land in the request's trace
+        g.trace_streamed = True
+        response.call_on_close(functools.partial(telemetry.end_request, response.status_code, trace))
+    return response
+
+def cached_stream(conversation, reply, extra):
+    if extra:
+        yield sse_event(extra, event="context")
+    yield sse_event({"token": reply})
+    yield sse_event({"response": reply, "session_id": conversation.session_id, "cached": True}, event="done")
+
+def stream_reply(conversation, user_message, prompt, options, cache_probe, extra):
+    if extra:
+        yield sse_event(extra, event="context")
+    tokens = []
+    context = None
+    started = time.perf_counter()
+    try:
+        for chunk in services.llm_client.stream(prompt, **options):
+            token = chunk.get("response", "")
+            if token:
+                if not tokens:
+                    telemetry.record_stage('llm_first_token', time.perf_counter() - started)
+                tokens.append(token)
+                yield sse_event({"token": token})
+            if chunk.get("done"):
+                context = chunk.get("context")
+        telemetry.record_stage('llm_total', time.perf_counter() - started)
+        bot_response = "".join(tokens).strip()
+        services.finish_chat_turn(conversation, user_message, bot_response, context)
+        services.store_cached_reply(cache_probe, bot_response)
+        yield sse_event({"response": bot_response, "session_id": conversation.session_id}, event="done")
+    except LLMError as e:
+        yield sse_event({"error": str(e)}, event="error")
+
 if __name__ == '__main__':
     app.run(debug=True, host="localhost", port=5000)
@@ -0,0 +1,120 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+_WHITESPACE = re.compile(r'\s+')
+_TRAILING_PUNCTUATION = re.compile(r'[\s.!?,;:…]+$')
+
+
+def normalize_message(text):
+    """Case-fold, unify quotes/whitespace and drop trailing punctuation ("I feel sad!!" == "i feel sad")"""
+    text = text.replace('’', "'").replace('‘', "'").lower()
+    text = _WHITESPACE.sub(' ', text).strip()
+    return _TRAILING_PUNCTUATION.sub('', text)
+
+
+class CacheProbe:
+    """Result of a cache miss, carrying what store() needs to insert the reply"""
+
+    def __init__(self, key, namespace, embedding=None):
+        self.key = key
+        self.namespace = namespace
+        self.embedding = embedding
+
+
+class ResponseCache:
+    """LRU + TTL cache of chatbot replies keyed on normalized message, system prompt and model.
+
+    In semantic mode a miss on the exact key falls back to the cached message with the
+    highest cosine similarity (same system prompt and model) if it reaches
+    `similarity_threshold`; `embed_fn` turns text into a vector.
+    """
+
+    def __init__(self, max_entries=1024, ttl=3600.0, semantic=False, embed_fn=None, similarity_threshold=0.92):
+        if semantic and embed_fn is None:
+            raise ValueError('Semantic response cache needs an embed_fn')
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.semantic = semantic
+        self.embed_fn = embed_fn
+        self.similarity_threshold = similarity_threshold
+        self._entries = OrderedDict()  # key -> (reply, expires_at, namespace, unit embedding)
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'semantic_hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0,
+                       'embed_errors': 0}
+
+    def lookup(self, message, system_prompt, model):
+        """Returns (reply, None) on a hit or (None, probe) on a miss"""
+        normalized = normalize_message(message)
+        namespace = hashlib.sha1(f'{system_prompt}\0{model}'.encode('utf-8')).hexdigest()
+        key = hashlib.sha1(f'{namespace}\0{normalized}'.encode('utf-8')).hexdigest()
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return entry[0], None
+                del self._entries[key]
+                self._stats['expirations'] += 1
+
+        embedding = None
+        if self.semantic:
+            try:
+                embedding = np.asarray(self.embed_fn(normalized), dtype=np.float32)
+                embedding /= np.linalg.norm(embedding) or 1.0
+            except Exception:
+                embedding = None
+                with self._lock:
+                    self._stats['embed_errors'] += 1
+            if embedding is not None:
+                reply = self._nearest(namespace, embedding, now)
+                if reply is not None:
+                    return reply, None
+
+        with self._lock:
+            self._stats['misses'] += 1
+        return None, CacheProbe(key, namespace, embedding)
+
+    def _nearest(self, namespace, embedding, now):
+        with self._lock:
+            candidates = [(key, entry) for key, entry in self._entries.items()
+                          if entry[2] == namespace and entry[3] is not None and entry[1] > now]
+            if not candidates:
+                return None
+            matrix = np.stack([entry[3] for _, entry in candidates])
+            scores = matrix @ embedding
+            best = int(np.argmax(scores))
+            if scores[best] < self.similarity_threshold:
+                return None
+            key, entry = candidates[best]
+            self._entries.move_to_end(key)
+            self._stats['semantic_hits'] += 1
+            return entry[0]
+
+    def store(self, probe, reply):
+        with self._lock:
+            self._entries[probe.key] = (reply, time.monotonic() + self.ttl, probe.namespace, probe.embedding)
+            self._entries.move_to_end(probe.key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['semantic_hits'] + stats['misses']
+        stats.update({
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl,
+            'semantic': self.semantic,
+            'hit_ratio': (stats['hits'] + stats['semantic_hits']) / lookups if lookups else 0.0,
+        })
+        return stats
@@ -0,0 +1,135 @@
+"""Multi-process server: gunicorn workers forked from one preloaded master plus shared inference processes.
+
+The master imports the app and loads the read-only engines listed in PRELOAD_COMPONENTS
+(Haar cascade, language identifier, SymSpell index) before forking, so every worker
+shares those pages copy-on-write instead of holding its own copy. The emotion model is
+not forked: TensorFlow / ONNX Runtime keep thread pools that do not survive fork(), so
+it lives in --inference-processes spawned processes that all workers reach over Unix
+sockets (see inference_server.py). Speech and chat engines are loaded in each worker
+after the fork. Unix only.
+
+    python serve.py --workers 4 --threads 8 --inference-processes 1 --bind 0.0.0.0:5000
+"""
+import argparse
+import gc
+import os
+import secrets
+import sys
+import tempfile
+
+from gunicorn.app.base import BaseApplication
+
+
+class PreforkServer(BaseApplication):
+    def __init__(self, options, startup_mode, inference_processes):
+        self.options = options
+        self.startup_mode = startup_mode
+        self.inference_processes = inference_processes
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+        self.cfg.set('post_fork', self.post_fork)
+        self.cfg.set('child_exit', self.child_exit)
+        self.cfg.set('on_exit', self.on_exit)
+
+    def load(self):
+        import main
+        import services
+        import config
+
+        services.registry.preload(config.PRELOAD_COMPONENTS)
+        # Keep the preloaded objects out of the collector so its bookkeeping writes do not
+        # un-share their pages in the workers
+        gc.collect()
+        gc.freeze()
+        return main.app
+
+    def post_fork(self, server, worker):
+        import main
+        import services
+        if main.admission is not None:
+            # The configured limits are for the whole server, not for each worker
+            main.admission.split(server.cfg.workers)
+        if self.startup_mode == 'lazy':
+            return
+        # Threads started in the master do not survive fork(), so warm up here
+        thread = services.registry.warmup(background=True)
+        if self.startup_mode == 'eager':
+            # Accept requests only once every engine is loaded; keep the heartbeat going meanwhile
+            # so the arbiter does not kill a worker that loads for longer than --timeout
+            while thread.is_alive():
+                worker.notify()
+                thread.join(1.0)
+
+    def child_exit(self, server, worker):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
+
+    def on_exit(self, server):
+        for process in self.inference_processes:
+            process.terminate()
+            process.join(5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the backend with preforked workers and shared inference')
+    parser.add_argument('--bind', default='0.0.0.0:5000')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=8, help='Request threads per worker')
+    parser.add_argument('--inference-processes', type=int, default=1,
+                        help='Processes holding the emotion model; 0 loads it in every worker instead')
+    parser.add_argument('--startup-mode', choices=['lazy', 'background', 'eager'],
+                        default=os.environ.get('STARTUP_MODE', 'background'),
+                        help='When workers load the engines that were not preloaded')
+    parser.add_argument('--timeout', type=int, default=120)
+    args = parser.parse_args()
+
+    inference_processes = []
+    if args.inference_processes > 0:
+        socket_dir = tempfile.mkdtemp(prefix='emotion-inference-')
+        sockets = [os.path.join(socket_dir, f'inference-{i}.sock') for i in range(args.inference_processes)]
+        authkey = secrets.token_hex(16)
+        # Read by config when the app is imported
+        os.environ['EMOTION_INFERENCE_SOCKETS'] = ','.join(sockets)
+        os.environ['EMOTION_INFERENCE_AUTHKEY'] = authkey
+    # The master only preloads; workers warm up after the fork
+    os.environ['STARTUP_MODE'] = 'lazy'
+    # /metrics sums the histograms of every worker (see telemetry.render)
+    os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', tempfile.mkdtemp(prefix='prometheus-'))
+
+    import config
+    if args.inference_processes > 0 and 'emotion' in config.SUBSYSTEMS:
+        from inference_server import start_inference_processes
+        settings = {
+            'backend': config.EMOTION_BACKEND,
+            'model_path': config.EMOTION_MODEL_PATH,
+            'threads': config.EMOTION_INFERENCE_THREADS,
+            'warmup_batch_sizes': config.EMOTION_WARMUP_BATCH_SIZES,
+            'batch_size': config.EMOTION_BATCH_SIZE,
+            'batch_wait_ms': config.EMOTION_BATCH_WAIT_MS,
+            'queue_depth': config.EMOTION_QUEUE_DEPTH,
+            'timeout': config.EMOTION_RESULT_TIMEOUT,
+        }
+        print(f"[serve] starting {len(sockets)} inference process(es) in {socket_dir}")
+        inference_processes = start_inference_processes(sockets, authkey.encode(), settings)
+
+    options = {
+        'bind': args.bind,
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread',
+        'preload_app': True,
+        'timeout': args.timeout,
+    }
+    try:
+        PreforkServer(options, args.startup_mode, inference_processes).run()
+    finally:
+        for process in inference_processes:
+            process.terminate()
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    main()
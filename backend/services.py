@@ -0,0 +1,372 @@
+"""Engines and request pipelines shared by the Flask (main.py) and ASGI (asgi_app.py) servers.
+
+Each pipeline is split into stages so the ASGI server can await network-bound
+stages and push CPU-bound ones to its executors, while Flask simply calls them in order.
+"""
+import speech_recognition as sr
+
+import config
+import telemetry
+from components import ComponentRegistry
+from llm_client import SYSTEM_PROMPT
+
+# Engines are loaded on first use (or by the warm-up below) and only for the
+# subsystems this process serves: emotion, speech, text and chat
+registry = ComponentRegistry(config.SUBSYSTEMS)
+
+
+def __getattr__(name):
+    # services.emotion_scheduler, services.llm_client, ... resolve through the registry
+    if name in registry:
+        return registry.get(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+@registry.register('emotion_backend', 'emotion')
+def _load_emotion_backend():
+    if config.EMOTION_INFERENCE_SOCKETS:
+        # The model lives in the shared inference processes started by serve.py
+        from inference_server import RemoteEmotionBackend
+        return RemoteEmotionBackend(config.EMOTION_INFERENCE_SOCKETS, config.EMOTION_INFERENCE_AUTHKEY.encode())
+    # Load Emotion Detection Model (keras, tflite or onnx engine)
+    from inference_backends import create_backend
+    backend = create_backend(config.EMOTION_BACKEND, config.EMOTION_MODEL_PATH,
+                             num_threads=config.EMOTION_INFERENCE_THREADS)
+    # Pay graph tracing / tensor allocation now rather than on the first request
+    backend.warmup(config.EMOTION_WARMUP_BATCH_SIZES)
+    return backend
+
+
+@registry.register('emotion_scheduler', 'emotion')
+def _load_emotion_scheduler():
+    # All requests share one scheduler so concurrent faces are inferred together
+    from inference_scheduler import InferenceScheduler
+    backend = registry.get('emotion_backend')
+
+    def predict(batch):
+        # Runs on the scheduler thread: one observation per model call, not per request
+        telemetry.INFERENCE_BATCH_SIZE.observe(len(batch))
+        with telemetry.stage('emotion_inference_batch'):
+            return backend.predict(batch)
+
+    return InferenceScheduler(
+        predict,
+        max_batch_size=config.EMOTION_BATCH_SIZE,
+        max_wait_ms=config.EMOTION_BATCH_WAIT_MS,
+        max_queue_depth=config.EMOTION_QUEUE_DEPTH,
+    ).start()
+
+
+@registry.register('face_detector', 'emotion')
+def _load_face_detector():
+    from face_detectors import create_detector
+    return create_detector(config.FACE_DETECTOR, config)
+
+
+@registry.register('stream_sessions', 'emotion')
+def _load_stream_sessions():
+    # Webcam stream sessions (tracking + smoothing between frames)
+    from emotion_stream import EmotionStreamSession, StreamSessionStore
+    scheduler = registry.get('emotion_scheduler')
+    return StreamSessionStore(
+        lambda: EmotionStreamSession(
+            detect_faces,
+            lambda batch: scheduler.predict(batch, timeout=config.EMOTION_RESULT_TIMEOUT),
+            detect_every=config.EMOTION_STREAM_DETECT_EVERY,
+            roi_change_threshold=config.EMOTION_STREAM_ROI_THRESHOLD,
+            smoothing=config.EMOTION_STREAM_SMOOTHING,
+            min_track_score=config.EMOTION_STREAM_TRACK_MIN_SCORE,
+        ),
+        ttl=config.EMOTION_STREAM_SESSION_TTL,
+        max_sessions=config.EMOTION_STREAM_MAX_SESSIONS,
+    )
+
+
+@registry.register('recognizer', 'speech')
+def _load_recognizer():
+    return sr.Recognizer()
+
+
+@registry.register('asr_engine', 'speech')
+def _load_asr_engine():
+    # Load Speech Recognition (local engine with Google fallback, or Google only)
+    from asr_backends import create_asr_engine
+    return create_asr_engine(config.ASR_ENGINE, config.ASR_MODEL_PATH, compute_type=config.ASR_COMPUTE_TYPE,
+                             cpu_threads=config.ASR_THREADS, language=config.ASR_LANGUAGE,
+                             fallback=config.ASR_FALLBACK, recognizer=registry.get('recognizer'),
+                             stub_text=config.ASR_STUB_TEXT, stub_latency=config.ASR_STUB_LATENCY)
+
+
+@registry.register('audio_decoder', 'speech')
+def _load_audio_decoder():
+    # Long-lived decoder for uploads that are not WAV/PCM/FLAC/OGG/MP3 (e.g. WebM/Opus)
+    from audio_ingest import start_decode_pool
+    return start_decode_pool(config.AUDIO_DECODE_WORKERS)
+
+
+@registry.register('translation_service', 'text')
+def _load_translation_service():
+    # Shared translation service (googletrans, Cloud Translate or stub) with caching and coalescing
+    from translation import create_translation_service
+    return create_translation_service(
+        config.TRANSLATE_PROVIDER,
+        credentials_path=config.TRANSLATE_CREDENTIALS,
+        stub_latency=config.TRANSLATE_STUB_LATENCY,
+        max_entries=config.TRANSLATE_CACHE_MAX_ENTRIES,
+        ttl=config.TRANSLATE_CACHE_TTL,
+        batch_size=config.TRANSLATE_BATCH_SIZE,
+    )
+
+
+@registry.register('language_router', 'text')
+def _load_language_router():
+    # Local language ID decides when the translator needs to be called at all
+    from language_id import LanguageIdentifier, LanguageRouter
+    return LanguageRouter(
+        LanguageIdentifier(config.LANGID_MODEL_PATH),
+        english_threshold=config.LANGID_ENGLISH_THRESHOLD,
+        other_threshold=config.LANGID_OTHER_THRESHOLD,
+        min_chars=config.LANGID_MIN_CHARS,
+    )
+
+
+@registry.register('text_corrector', 'text')
+def _load_text_corrector():
+    # Spelling (SymSpell index) and grammar (shared LanguageTool server) normalization
+    from text_correction import create_text_corrector
+    return create_text_corrector(config)
+
+
+@registry.register('llm_client', 'chat')
+def _load_llm_client():
+    # Shared, pooled Ollama client
+    from llm_client import OllamaClient
+    return OllamaClient(
+        base_url=config.OLLAMA_URL,
+        model=config.OLLAMA_MODEL,
+        connect_timeout=config.OLLAMA_CONNECT_TIMEOUT,
+        read_timeout=config.OLLAMA_READ_TIMEOUT,
+        retries=config.OLLAMA_RETRIES,
+        pool_size=config.OLLAMA_POOL_SIZE,
+    )
+
+
+@registry.register('conversations', 'chat')
+def _load_conversations():
+    # Per-session chat history
+    from conversation import create_conversation_store
+    return create_conversation_store(config.CONVERSATION_STORE, config.CONVERSATION_MAX_TURNS,
+                                     config.CONVERSATION_MAX_SESSIONS, config.CONVERSATION_DB)
+
+
+@registry.register('context_assembler', 'chat')
+def _load_context_assembler():
+    # Token-budgeted prompt assembly
+    from conversation import ContextAssembler
+    return ContextAssembler(
+        SYSTEM_PROMPT,
+        token_budget=config.CONVERSATION_TOKEN_BUDGET,
+        summary_tokens=config.CONVERSATION_SUMMARY_TOKENS,
+        context_max_tokens=config.CONVERSATION_CONTEXT_MAX_TOKENS,
+    )
+
+
+@registry.register('response_cache', 'chat')
+def _load_response_cache():
+    # Cache of replies to repeated first messages ("I feel sad", "I can't sleep")
+    if not config.RESPONSE_CACHE_ENABLED:
+        return None
+    from response_cache import ResponseCache
+    return ResponseCache(
+        max_entries=config.RESPONSE_CACHE_MAX_ENTRIES,
+        ttl=config.RESPONSE_CACHE_TTL,
+        semantic=config.RESPONSE_CACHE_SEMANTIC,
+        embed_fn=lambda text: registry.get('llm_client').embed(text, config.RESPONSE_CACHE_EMBED_MODEL),
+        similarity_threshold=config.RESPONSE_CACHE_SIMILARITY,
+    )
+
+
+def detect_faces(gray):
+    # Detect on a bounded-resolution copy and map the boxes back to the full frame
+    from emotion import downscale_for_detection, rescale_boxes
+    small, scale = downscale_for_detection(gray, config.EMOTION_DETECT_MAX_SIDE)
+    with telemetry.stage('face_detect'):
+        faces = registry.get('face_detector').detect(small)
+    return rescale_boxes(faces, scale, gray.shape)
+
+
+def decode_frame(img_bytes):
+    """Grayscale frame from JPEG/PNG bytes, or None if undecodable"""
+    from emotion import decode_gray
+    with telemetry.stage('image_decode'):
+        return decode_gray(img_bytes)
+
+
+def prepare_frame(img_bytes):
+    """Decode, detect and crop; returns (faces, face_batch). Raises ValueError if undecodable"""
+    from emotion import preprocess_faces
+    gray = decode_frame(img_bytes)
+    if gray is None:
+        raise ValueError('Could not decode image')
+    faces = detect_faces(gray)
+    return faces, preprocess_faces(gray, faces)
+
+
+def analyze_frame(img_bytes):
+    """Per-face labels, probabilities and boxes for one image"""
+    faces, face_batch = prepare_frame(img_bytes)
+    # Faces from this frame are batched with those of other in-flight requests
+    with telemetry.stage('emotion_inference'):
+        probabilities = registry.get('emotion_scheduler').predict(face_batch, timeout=config.EMOTION_RESULT_TIMEOUT)
+    return describe_faces(faces, probabilities)
+
+
+def describe_faces(faces, probabilities):
+    from emotion import describe_faces as describe
+    return describe(faces, probabilities)
+
+
+def transcode_audio(audio_bytes, content_type=''):
+    """Uploaded audio -> 16 kHz mono sr.AudioData, decoded in-process where possible"""
+    from audio_ingest import ingest_audio
+    registry.get('audio_decoder')
+    with telemetry.stage('audio_transcode'):
+        pcm = ingest_audio(audio_bytes, content_type)
+    return sr.AudioData(pcm.tobytes(), 16000, 2)
+
+
+def recognize_speech(audio_data):
+    """Speech to text; raises sr.UnknownValueError when nothing was understood"""
+    with telemetry.stage('asr'):
+        return registry.get('asr_engine').transcribe(audio_data)
+
+
+def recognize_speech_scored(audio_data):
+    """(text, confidence or None); raises sr.UnknownValueError when nothing was understood"""
+    with telemetry.stage('asr'):
+        return registry.get('asr_engine').transcribe_scored(audio_data)
+
+
+def create_speech_segmenter(sample_rate):
+    """VAD segmenter for one streaming-transcription connection"""
+    from vad import AdaptiveVAD, SpeechSegmenter
+    # The adaptive VAD of the desktop scripts, starting at the configured threshold; its noise
+    # floor then follows the caller's room, so noisy connections still detect end of speech
+    ratio = 1.5
+    vad = AdaptiveVAD(sample_rate, frame_ms=config.SPEECH_FRAME_MS,
+                      noise_floor=config.SPEECH_ENERGY_THRESHOLD / ratio, ratio=ratio)
+    return SpeechSegmenter(
+        vad,
+        end_silence=config.SPEECH_END_SILENCE,
+        min_speech=config.SPEECH_MIN_SEGMENT,
+        max_segment=config.SPEECH_MAX_SEGMENT,
+        partial_interval=config.SPEECH_PARTIAL_INTERVAL,
+        pause_duration=config.SPEECH_PAUSE_DURATION,
+        max_pauses=config.SPEECH_MAX_PAUSES,
+    )
+
+
+def recognize_pcm(pcm, sample_rate):
+    """Speech to text for raw 16-bit mono PCM"""
+    return recognize_speech(sr.AudioData(pcm, sample_rate, 2))
+
+
+def dominant_emotion(face_results):
+    """Label of the largest face in the frame, or None"""
+    if not face_results:
+        return None
+    return max(face_results, key=lambda face: face['box'][2] * face['box'][3])['label']
+
+
+def translate_to_english(text):
+    with telemetry.stage('language_detect'):
+        route, lang = registry.get('language_router').route(text)
+    translation_service = registry.get('translation_service')
+    if route == 'english':
+        return text
+    with telemetry.stage('translate'):
+        if route == 'known':
+            return translation_service.translate(text, src=lang, dest='en').text
+        # Not sure locally: let the provider detect as part of the translate call itself
+        translated = translation_service.translate(text, src='auto', dest='en')
+    return text if translated.src == 'en' else translated.text
+
+
+def translate_all_to_english(texts):
+    """translate_to_english for many texts; misses of each source language go to the provider in list batches"""
+    results = list(texts)
+    groups = {}
+    with telemetry.stage('language_detect'):
+        for i, text in enumerate(texts):
+            route, lang = registry.get('language_router').route(text)
+            if route != 'english':
+                groups.setdefault(lang if route == 'known' else 'auto', []).append(i)
+    translation_service = registry.get('translation_service')
+    with telemetry.stage('translate'):
+        for src, indexes in groups.items():
+            translated = translation_service.translate_many([texts[i] for i in indexes], src=src, dest='en')
+            for i, result in zip(indexes, translated):
+                results[i] = texts[i] if src == 'auto' and result.src == 'en' else result.text
+    return results
+
+
+def correct_text(text, confidence=None):
+    """Spelling and grammar normalization; short or confidently recognized text is left as is"""
+    return registry.get('text_corrector').correct(text, confidence)
+
+
+def correct_transcript(original_text, english_text, confidence=None):
+    # ASR confidence only vouches for text that did not go through translation
+    return correct_text(english_text, confidence if english_text == original_text else None)
+
+
+def transcribe_to_english(audio_bytes, content_type=''):
+    """Full /translate pipeline: transcode, recognize, translate and correct"""
+    audio_data = transcode_audio(audio_bytes, content_type)
+    original_text, confidence = recognize_speech_scored(audio_data)
+    return correct_transcript(original_text, translate_to_english(original_text), confidence)
+
+
+def start_chat_turn(session_id, message, emotion=None):
+    """Load the session and assemble this turn's prompt; returns (conversation, prompt, options, release).
+
+    The session is held until release() is called, so two overlapping requests cannot interleave
+    their turns or overwrite each other's Ollama context; the second one raises SessionBusy.
+    """
+    conversations = registry.get('conversations')
+    conversation = conversations.load(session_id)
+    release = conversations.active_turns.begin(conversation.session_id)
+    try:
+        prompt, context = registry.get('context_assembler').build(conversation, message, emotion)
+    except BaseException:
+        release()
+        raise
+    options = {'context': context} if context else {}
+    return conversation, prompt, options, release
+
+
+def finish_chat_turn(conversation, message, reply, context):
+    registry.get('context_assembler').record(conversation, message, reply, context)
+    registry.get('conversations').save(conversation)
+
+
+def lookup_cached_reply(conversation, message, emotion=None):
+    """Returns (reply, probe); only sessions without history share replies"""
+    response_cache = registry.get('response_cache')
+    if response_cache is None or conversation.turns:
+        return None, None
+    # Replies written for a detected emotion are cached separately from plain ones
+    system_prompt = f'{SYSTEM_PROMPT}[emotion={emotion}]' if emotion else SYSTEM_PROMPT
+    return response_cache.lookup(message, system_prompt, config.OLLAMA_MODEL)
+
+
+def store_cached_reply(probe, reply):
+    if probe is not None and reply:
+        registry.get('response_cache').store(probe, reply)
+
+
+# lazy: load on first use; background: start serving while a thread loads everything; eager: load before serving
+if config.STARTUP_MODE == 'eager':
+    registry.warmup()
+elif config.STARTUP_MODE == 'background':
+    registry.warmup(background=True)
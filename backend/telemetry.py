@@ -0,0 +1,112 @@
+"""Per-stage latency histograms, request metrics and slow-request logs (Prometheus).
+
+`stage('asr')` times a block (or, as a decorator, a function) into the
+soulmate_stage_seconds histogram and adds it to the current request's trace. A request
+slower than SLOW_REQUEST_SECONDS is logged as one JSON line with that per-stage breakdown.
+Work handed to executors must run through `bind()` so it keeps the request's trace.
+"""
+import contextvars
+import functools
+import json
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest)
+
+import config
+
+_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_SECONDS = Histogram('soulmate_stage_seconds', 'Time spent in one pipeline stage', ['stage'],
+                          buckets=_BUCKETS)
+STAGE_ERRORS = Counter('soulmate_stage_errors_total', 'Pipeline stages that raised', ['stage', 'error'])
+REQUEST_SECONDS = Histogram('soulmate_request_seconds', 'Time until the response body is sent',
+                            ['route', 'method', 'status'], buckets=_BUCKETS)
+SLOW_REQUESTS = Counter('soulmate_slow_requests_total', 'Requests slower than SLOW_REQUEST_SECONDS', ['route'])
+ADMISSION_ACTIVE = Gauge('soulmate_admission_active', 'Requests running in a route group', ['group'],
+                         multiprocess_mode='livesum')
+ADMISSION_QUEUED = Gauge('soulmate_admission_queued', 'Requests waiting for a route group slot', ['group'],
+                         multiprocess_mode='livesum')
+ADMISSION_REJECTED = Counter('soulmate_admission_rejected_total', 'Requests turned away by admission control',
+                             ['group', 'reason'])
+ADMISSION_WAIT_SECONDS = Histogram('soulmate_admission_wait_seconds', 'Time queued before admission', ['group'],
+                                   buckets=_BUCKETS)
+INFERENCE_BATCH_SIZE = Histogram('soulmate_inference_batch_faces', 'Faces per emotion model call',
+                                 buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+
+_trace = contextvars.ContextVar('request_trace', default=None)
+
+
+class RequestTrace:
+    def __init__(self, route, method):
+        self.route = route
+        self.method = method
+        self.started = time.perf_counter()
+        self.stages = {}
+
+
+def begin_request(route, method):
+    _trace.set(RequestTrace(route, method))
+
+
+def current_trace():
+    return _trace.get()
+
+
+def end_request(status, trace=None):
+    """Observe the request; a streamed reply passes its trace here once the last event is sent"""
+    if trace is None:
+        trace = _trace.get()
+        if trace is None:
+            return
+    if _trace.get() is trace:
+        _trace.set(None)
+    seconds = time.perf_counter() - trace.started
+    REQUEST_SECONDS.labels(trace.route, trace.method, str(status)).observe(seconds)
+    if seconds >= config.SLOW_REQUEST_SECONDS:
+        SLOW_REQUESTS.labels(trace.route).inc()
+        print(json.dumps({
+            'event': 'slow_request',
+            'route': trace.route,
+            'method': trace.method,
+            'status': status,
+            'ms': round(seconds * 1000.0, 1),
+            'stages_ms': {name: round(value * 1000.0, 1) for name, value in trace.stages.items()},
+        }), flush=True)
+
+
+def record_stage(name, seconds):
+    STAGE_SECONDS.labels(name).observe(seconds)
+    trace = _trace.get()
+    if trace is not None:
+        trace.stages[name] = trace.stages.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name):
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        STAGE_ERRORS.labels(name, type(e).__name__).inc()
+        raise
+    finally:
+        record_stage(name, time.perf_counter() - started)
+
+
+def bind(fn, *args):
+    """fn(*args) bound to a copy of the caller's context, so stages timed in another thread reach its trace"""
+    return functools.partial(contextvars.copy_context().run, fn, *args)
+
+
+def render():
+    """(body, content type) of the Prometheus exposition; merges all workers under serve.py"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
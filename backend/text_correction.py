@@ -0,0 +1,190 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from telemetry import stage
+
+_WORD = re.compile(r"[A-Za-z]+(?:'[A-Za-z]+)?")
+
+
+class SymSpellCorrector:
+    """Word-level spelling fixes from a symmetric-delete index (symspellpy).
+
+    Building the delete index from the frequency dictionary takes a few seconds, so it
+    is pickled to `index_path` the first time and loaded from there afterwards.
+    """
+
+    name = 'symspell'
+
+    def __init__(self, dictionary_path=None, index_path=None, max_edit_distance=2):
+        from symspellpy import SymSpell, Verbosity
+        self.verbosity = Verbosity.TOP
+        self.max_edit_distance = max_edit_distance
+        self.sym_spell = SymSpell(max_dictionary_edit_distance=max_edit_distance, prefix_length=7)
+
+        if index_path and os.path.exists(index_path) and self.sym_spell.load_pickle(index_path):
+            return
+        if dictionary_path is None:
+            import importlib.resources
+            dictionary_path = str(importlib.resources.files('symspellpy') / 'frequency_dictionary_en_82_765.txt')
+        if not self.sym_spell.load_dictionary(dictionary_path, term_index=0, count_index=1):
+            raise ValueError(f'Could not load spelling dictionary {dictionary_path}')
+        if index_path:
+            self.sym_spell.save_pickle(index_path)
+
+    def correct(self, text):
+        def fix(match):
+            word = match.group(0)
+            # Contractions, acronyms and capitalized names are left alone
+            if "'" in word or (word[0].isupper() and match.start() > 0) or word.isupper():
+                return word
+            suggestions = self.sym_spell.lookup(word, self.verbosity, max_edit_distance=self.max_edit_distance,
+                                                include_unknown=True, transfer_casing=True)
+            return suggestions[0].term if suggestions else word
+        return _WORD.sub(fix, text)
+
+
+class TextBlobCorrector:
+    """The original pure-Python Norvig corrector; slow, kept for comparison"""
+
+    name = 'textblob'
+
+    def correct(self, text):
+        from textblob import TextBlob
+        return str(TextBlob(text).correct())
+
+
+class LanguageToolClient:
+    """Pooled HTTP client for a LanguageTool server shared by every process.
+
+    Start one server (java -cp languagetool-server.jar org.languagetool.server.HTTPServer
+    --port 8081) and point GRAMMAR_SERVER_URL at it.
+    """
+
+    def __init__(self, base_url, language='en-US', timeout=5.0, pool_size=8):
+        self.language = language
+        self.timeout = timeout
+        self.base_url = base_url.rstrip('/')
+        if not self.base_url.endswith('/v2'):
+            self.base_url += '/v2'
+
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def correct(self, text):
+        response = self.session.post(f'{self.base_url}/check', data={'language': self.language, 'text': text},
+                                     timeout=self.timeout)
+        response.raise_for_status()
+        matches = [m for m in response.json().get('matches', []) if m.get('replacements')]
+        # Apply from the end so earlier offsets stay valid
+        for match in sorted(matches, key=lambda m: m['offset'], reverse=True):
+            start, end = match['offset'], match['offset'] + match['length']
+            text = text[:start] + match['replacements'][0]['value'] + text[end:]
+        return text
+
+    def close(self):
+        self.session.close()
+
+
+class TextCorrector:
+    """Spelling + grammar normalization of transcripts with a skip rule and a result cache.
+
+    Texts under `min_words` words, or ASR output whose confidence reaches
+    `skip_confidence`, are returned unchanged.
+    """
+
+    def __init__(self, spelling=None, grammar=None, min_words=3, skip_confidence=0.9, cache_size=4096):
+        self.spelling = spelling
+        self.grammar = grammar
+        self.min_words = min_words
+        self.skip_confidence = skip_confidence
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'skipped': 0, 'grammar_errors': 0}
+
+    def correct(self, text, confidence=None):
+        if len(text.split()) < self.min_words or (confidence is not None and confidence >= self.skip_confidence):
+            with self._lock:
+                self._stats['skipped'] += 1
+            return text
+
+        with self._lock:
+            corrected = self._cache.get(text)
+            if corrected is not None:
+                self._cache.move_to_end(text)
+                self._stats['hits'] += 1
+                return corrected
+            self._stats['misses'] += 1
+
+        corrected = text
+        if self.spelling:
+            with stage('spell'):
+                corrected = self.spelling.correct(text)
+        if self.grammar:
+            try:
+                with stage('grammar'):
+                    corrected = self.grammar.correct(corrected)
+            except Exception as e:
+                print(f"[grammar] check failed: {e}")
+                with self._lock:
+                    self._stats['grammar_errors'] += 1
+
+        with self._lock:
+            self._cache[text] = corrected
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return corrected
+
+    def close(self):
+        if self.grammar:
+            self.grammar.close()
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._cache)
+        lookups = stats['hits'] + stats['misses']
+        stats.update({
+            'spelling': self.spelling.name if self.spelling else 'none',
+            'grammar': self.grammar.base_url if self.grammar else None,
+            'hit_ratio': stats['hits'] / lookups if lookups else 0.0,
+        })
+        return stats
+
+
+def create_text_corrector(settings):
+    """Build the corrector from config; a component that fails to load is disabled, not fatal"""
+    spelling = None
+    try:
+        if settings.CORRECTION_SPELLING == SymSpellCorrector.name:
+            spelling = SymSpellCorrector(settings.CORRECTION_DICTIONARY, settings.CORRECTION_INDEX_CACHE,
+                                         max_edit_distance=settings.CORRECTION_MAX_EDIT_DISTANCE)
+        elif settings.CORRECTION_SPELLING == TextBlobCorrector.name:
+            spelling = TextBlobCorrector()
+        elif settings.CORRECTION_SPELLING != 'none':
+            raise ValueError(f"Unknown speller '{settings.CORRECTION_SPELLING}' (expected symspell, textblob or none)")
+    except ImportError as e:
+        print(f"Spelling corrector unavailable ({e}); falling back to TextBlob")
+        spelling = TextBlobCorrector()
+
+    grammar = None
+    if settings.GRAMMAR_ENABLED and not settings.GRAMMAR_SERVER_URL:
+        # A local language_tool_python JVM per process (and per forked worker) is what this avoids
+        print("GRAMMAR_SERVER_URL is not set; continuing with spelling correction only")
+    elif settings.GRAMMAR_ENABLED:
+        try:
+            grammar = LanguageToolClient(settings.GRAMMAR_SERVER_URL, language=settings.GRAMMAR_LANGUAGE,
+                                         timeout=settings.GRAMMAR_TIMEOUT, pool_size=settings.GRAMMAR_POOL_SIZE)
+        except Exception as e:
+            print(f"Grammar tool load failed: {e}")
+
+    return TextCorrector(spelling, grammar, min_words=settings.CORRECTION_MIN_WORDS,
+                         skip_confidence=settings.CORRECTION_SKIP_CONFIDENCE,
+                         cache_size=settings.CORRECTION_CACHE_SIZE)
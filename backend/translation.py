@@ -0,0 +1,205 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future
+
+from language_id import to_googletrans_code
+
+TranslationResult = namedtuple('TranslationResult', ['text', 'src'])
+
+
+class GoogletransProvider:
+    """Unofficial Google Translate web client (googletrans); accepts lists"""
+
+    name = 'googletrans'
+    max_batch = 32
+
+    def __init__(self, translator=None):
+        from googletrans import Translator, LANGUAGES
+        self.translator = translator or Translator()
+        self.languages = LANGUAGES
+
+    def translate(self, texts, src, dest):
+        src = to_googletrans_code(src)
+        if src not in self.languages:
+            src = 'auto'
+        translated = self.translator.translate(list(texts), src=src, dest=dest)
+        return [TranslationResult(t.text, t.src) for t in translated]
+
+
+class CloudTranslateProvider:
+    """Google Cloud Translation v2; up to 128 segments per request"""
+
+    name = 'cloud'
+    max_batch = 128
+
+    def __init__(self, credentials_path=None):
+        from google.cloud import translate_v2 as translate
+        if credentials_path:
+            self.client = translate.Client.from_service_account_json(credentials_path)
+        else:
+            self.client = translate.Client()
+
+    def translate(self, texts, src, dest):
+        results = self.client.translate(list(texts), target_language=dest,
+                                        source_language=None if src == 'auto' else src, format_='text')
+        return [TranslationResult(r['translatedText'], r.get('detectedSourceLanguage', src)) for r in results]
+
+
+class StubProvider:
+    """Offline provider for tests and load tests: echoes the text after an optional delay"""
+
+    name = 'stub'
+    max_batch = 1024
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def translate(self, texts, src, dest):
+        if self.latency:
+            time.sleep(self.latency)
+        return [TranslationResult(text, dest if src == 'auto' else src) for text in texts]
+
+
+class TranslationService:
+    """Cached, coalescing and batching front for a translation provider.
+
+    Results are kept in an LRU + TTL cache keyed on (text, src, dest); an 'auto'
+    lookup is also stored under the language the provider detected. Concurrent
+    requests for a text that is already being translated wait for that call
+    instead of issuing their own, and misses are sent in batches of up to the
+    provider's `max_batch`.
+    """
+
+    def __init__(self, provider, max_entries=4096, ttl=86400.0, batch_size=None):
+        self.provider = provider
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.batch_size = max(1, min(batch_size or provider.max_batch, provider.max_batch))
+        self._entries = OrderedDict()  # (text, src, dest) -> (TranslationResult, expires_at)
+        self._inflight = {}  # (text, src, dest) -> Future
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0, 'expirations': 0,
+                       'provider_calls': 0, 'provider_texts': 0, 'provider_errors': 0,
+                       'provider_seconds': 0.0, 'provider_max_seconds': 0.0}
+
+    def translate(self, text, src='auto', dest='en'):
+        return self.translate_many([text], src, dest)[0]
+
+    def detect(self, text, dest='en'):
+        """Source language as reported by the provider; the translation is cached on the way"""
+        return self.translate(text, 'auto', dest).src
+
+    def translate_many(self, texts, src='auto', dest='en'):
+        results = [None] * len(texts)
+        owned = OrderedDict()  # key -> (Future, indexes) for texts this call translates
+        waiting = []  # (index, Future) for texts another caller is already translating
+        now = time.monotonic()
+
+        with self._lock:
+            for i, text in enumerate(texts):
+                key = (text, src, dest)
+                entry = self._entries.get(key)
+                if entry is not None:
+                    if entry[1] > now:
+                        self._entries.move_to_end(key)
+                        self._stats['hits'] += 1
+                        results[i] = entry[0]
+                        continue
+                    del self._entries[key]
+                    self._stats['expirations'] += 1
+                if key in owned:
+                    owned[key][1].append(i)
+                    self._stats['coalesced'] += 1
+                elif key in self._inflight:
+                    waiting.append((i, self._inflight[key]))
+                    self._stats['coalesced'] += 1
+                else:
+                    future = self._inflight[key] = Future()
+                    owned[key] = (future, [i])
+                    self._stats['misses'] += 1
+
+        if owned:
+            self._translate_owned(owned, src, dest, results)
+        for i, future in waiting:
+            results[i] = future.result()
+        return results
+
+    def _translate_owned(self, owned, src, dest, results):
+        keys = list(owned)
+        try:
+            for start in range(0, len(keys), self.batch_size):
+                chunk = keys[start:start + self.batch_size]
+                translated = self._call_provider([key[0] for key in chunk], src, dest)
+                with self._lock:
+                    for key, result in zip(chunk, translated):
+                        self._store(key, result)
+                        if src == 'auto' and result.src and result.src != 'auto':
+                            self._store((key[0], result.src, dest), result)
+                for key, result in zip(chunk, translated):
+                    future, indexes = owned[key]
+                    future.set_result(result)
+                    for i in indexes:
+                        results[i] = result
+        except Exception as e:
+            for future, _ in owned.values():
+                if not future.done():
+                    future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                for key in keys:
+                    self._inflight.pop(key, None)
+
+    def _call_provider(self, texts, src, dest):
+        started = time.perf_counter()
+        try:
+            return self.provider.translate(texts, src, dest)
+        except Exception:
+            with self._lock:
+                self._stats['provider_errors'] += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._stats['provider_calls'] += 1
+                self._stats['provider_texts'] += len(texts)
+                self._stats['provider_seconds'] += elapsed
+                self._stats['provider_max_seconds'] = max(self._stats['provider_max_seconds'], elapsed)
+
+    def _store(self, key, result):
+        self._entries[key] = (result, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['inflight'] = len(self._inflight)
+        lookups = stats['hits'] + stats['misses'] + stats['coalesced']
+        calls = stats['provider_calls']
+        stats.update({
+            'provider': self.provider.name,
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl,
+            'batch_size': self.batch_size,
+            'hit_ratio': (stats['hits'] + stats['coalesced']) / lookups if lookups else 0.0,
+            'provider_avg_ms': stats['provider_seconds'] * 1000.0 / calls if calls else 0.0,
+        })
+        return stats
+
+
+def create_translation_service(name, credentials_path=None, stub_latency=0.0, max_entries=4096, ttl=86400.0,
+                               batch_size=None):
+    if name == GoogletransProvider.name:
+        provider = GoogletransProvider()
+    elif name == CloudTranslateProvider.name:
+        provider = CloudTranslateProvider(credentials_path)
+    elif name == StubProvider.name:
+        provider = StubProvider(stub_latency)
+    else:
+        raise ValueError(f"Unknown translation provider '{name}' (expected googletrans, cloud or stub)")
+    return TranslationService(provider, max_entries=max_entries, ttl=ttl, batch_size=batch_size)
@@ -0,0 +1,183 @@
+from collections import deque
+
+import numpy as np
+
+
+class EnergyVAD:
+    """Frame-level voice activity from RMS energy.
+
+    `threshold` is on the same scale as speech_recognition's energy_threshold
+    (RMS of 16-bit samples), so the two can be tuned together.
+    """
+
+    def __init__(self, sample_rate=16000, frame_ms=30, threshold=300.0):
+        self.sample_rate = sample_rate
+        self.frame_length = int(sample_rate * frame_ms / 1000)
+        self.threshold = threshold
+
+    def is_speech(self, frames):
+        """Boolean speech flag for each row of a (n_frames, frame_length) int16 array"""
+        samples = frames.astype(np.float32)
+        rms = np.sqrt(np.mean(samples * samples, axis=1))
+        return rms > self.threshold
+
+
+class AdaptiveVAD(EnergyVAD):
+    """Energy + zero-crossing VAD whose threshold follows the background noise.
+
+    A frame is speech when its RMS is `ratio` times the noise floor and it either
+    crosses zero rarely (voiced) or is loud enough to be a fricative. The floor
+    tracks the frames judged to be noise: it falls quickly and rises slowly, so a
+    long utterance is not absorbed into it.
+    """
+
+    def __init__(self, sample_rate=16000, frame_ms=30, noise_floor=100.0, ratio=1.5, max_zcr=0.35,
+                 min_threshold=50.0, rise=0.02, fall=0.3):
+        self.noise_floor = noise_floor
+        self.ratio = ratio
+        self.max_zcr = max_zcr
+        self.min_threshold = min_threshold
+        self.rise = rise
+        self.fall = fall
+        super().__init__(sample_rate, frame_ms, threshold=max(min_threshold, noise_floor * ratio))
+
+    @classmethod
+    def from_recognizer(cls, recognizer, sample_rate, frame_ms=30):
+        """Seeded from a speech_recognition Recognizer after adjust_for_ambient_noise()"""
+        ratio = recognizer.dynamic_energy_ratio
+        return cls(sample_rate, frame_ms, noise_floor=recognizer.energy_threshold / ratio, ratio=ratio)
+
+    def is_speech(self, frames):
+        samples = frames.astype(np.float32)
+        rms = np.sqrt(np.mean(samples * samples, axis=1))
+        signs = np.signbit(frames)
+        zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+        speech = (rms > self.threshold) & ((zcr < self.max_zcr) | (rms > 2 * self.threshold))
+
+        noise = rms[~speech]
+        if len(noise):
+            # One update per call, as if each noise frame had moved the floor in turn
+            level = float(np.median(noise))
+            rate = self.fall if level < self.noise_floor else self.rise
+            rate = 1.0 - (1.0 - rate) ** len(noise)
+            self.noise_floor += rate * (level - self.noise_floor)
+            self.threshold = max(self.min_threshold, self.noise_floor * self.ratio)
+        return speech
+
+
+def microphone_events(source, segmenter, stopped):
+    """Segmenter events from an open sr.Microphone, driven by the audio as it is read.
+
+    Ends when the segmenter stops (max pauses) or stopped() is true; an utterance
+    still open at that point is flushed as a final event.
+    """
+    while not segmenter.stopped and not stopped():
+        for event in segmenter.feed(source.stream.read(source.CHUNK)):
+            yield event
+    for event in segmenter.flush():
+        yield event
+
+
+class SpeechSegmenter:
+    """Cuts a 16-bit mono PCM stream into utterances as it arrives.
+
+    feed() returns a list of events:
+      ('partial', pcm)  audio of the utterance so far, every `partial_interval` seconds of speech
+      ('final', pcm)    a finished utterance, after `end_silence` seconds of silence
+      ('pause', count)  `pause_duration` seconds without speech (same rule as VoiceToTextConverter)
+      ('stop', count)   `max_pauses` pauses reached
+    """
+
+    def __init__(self, vad, end_silence=0.6, min_speech=0.25, max_segment=30.0, partial_interval=1.0,
+                 pause_duration=5.0, max_pauses=4, pre_roll=0.2):
+        self.vad = vad
+        frame_seconds = vad.frame_length / float(vad.sample_rate)
+        self.frame_bytes = vad.frame_length * 2
+        self.end_silence_frames = max(1, int(round(end_silence / frame_seconds)))
+        self.min_speech_frames = max(1, int(round(min_speech / frame_seconds)))
+        self.max_segment_frames = max(1, int(round(max_segment / frame_seconds)))
+        self.partial_frames = max(1, int(round(partial_interval / frame_seconds))) if partial_interval else 0
+        self.pause_frames = max(1, int(round(pause_duration / frame_seconds)))
+        self.max_pauses = max_pauses
+
+        self._pending = b''
+        self._pre_roll = deque(maxlen=max(0, int(round(pre_roll / frame_seconds))))
+        self._segment = []
+        self._speech_frames = 0
+        self._silence_run = 0
+        self._since_partial = 0
+        self._idle_frames = 0
+        self.pause_count = 0
+        self.stopped = False
+
+    @property
+    def in_speech(self):
+        return bool(self._segment)
+
+    def feed(self, pcm):
+        events = []
+        if self.stopped:
+            return events
+        data = self._pending + pcm
+        usable = len(data) - len(data) % self.frame_bytes
+        self._pending = data[usable:]
+        if not usable:
+            return events
+
+        frames = np.frombuffer(data[:usable], dtype=np.int16).reshape(-1, self.vad.frame_length)
+        flags = self.vad.is_speech(frames)
+        for frame, speech in zip(frames, flags):
+            self._step(frame.tobytes(), bool(speech), events)
+            if self.stopped:
+                break
+        return events
+
+    def flush(self):
+        """End of stream: emit whatever utterance is still open"""
+        events = []
+        if self._segment:
+            self._finish(events)
+        return events
+
+    def _step(self, frame, speech, events):
+        if not self._segment:
+            if not speech:
+                self._pre_roll.append(frame)
+                self._idle_frames += 1
+                if self._idle_frames >= self.pause_frames:
+                    self._idle_frames = 0
+                    self.pause_count += 1
+                    events.append(('pause', self.pause_count))
+                    if self.pause_count >= self.max_pauses:
+                        self.stopped = True
+                        events.append(('stop', self.pause_count))
+                return
+            # Speech onset: keep a little audio from before it so the first word is not clipped
+            self._segment = list(self._pre_roll)
+            self._pre_roll.clear()
+            self._speech_frames = self._silence_run = self._since_partial = 0
+
+        self._segment.append(frame)
+        if speech:
+            self._speech_frames += 1
+            self._silence_run = 0
+            self._idle_frames = 0
+        else:
+            self._silence_run += 1
+
+        self._since_partial += 1
+        if self.partial_frames and self._since_partial >= self.partial_frames and self._silence_run == 0:
+            self._since_partial = 0
+            events.append(('partial', b''.join(self._segment)))
+
+        if self._silence_run >= self.end_silence_frames or len(self._segment) >= self.max_segment_frames:
+            self._finish(events)
+
+    def _finish(self, events):
+        if self._speech_frames >= self.min_speech_frames:
+            # Trailing silence adds nothing for the recognizer
+            end = len(self._segment) - self._silence_run
+            events.append(('final', b''.join(self._segment[:end])))
+        self._segment = []
+        self._idle_frames = self._silence_run
+        self._speech_frames = self._silence_run = self._since_partial = 0
@@ -0,0 +1,115 @@
+"""Report real-time factor and word error rate of the ASR engines on a folder of WAV clips.
+
+Each clip.wav may have a clip.txt next to it with the reference transcript; clips
+without one are timed but left out of the WER.
+
+    ASR_MODEL_PATH=models/vosk-model-small-en-us-0.15 python benchmarks/bench_asr.py clips --engines vosk
+    ASR_MODEL_PATH=base.en python benchmarks/bench_asr.py clips --engines whisper,google
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import time
+
+import speech_recognition as sr
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+
+import config  # noqa: E402
+from asr_backends import create_asr_engine  # noqa: E402
+
+
+def words(text):
+    return re.sub(r"[^\w\s']", ' ', text.lower()).split()
+
+
+def edit_distance(reference, hypothesis):
+    """Word-level Levenshtein distance"""
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hypothesis, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1]
+
+
+def load_clips(folder):
+    clips = []
+    recognizer = sr.Recognizer()
+    for path in sorted(glob.glob(os.path.join(folder, '*.wav'))):
+        with sr.AudioFile(path) as source:
+            audio = recognizer.record(source)
+            duration = source.DURATION
+        reference = None
+        text_path = os.path.splitext(path)[0] + '.txt'
+        if os.path.exists(text_path):
+            with open(text_path, encoding='utf-8') as f:
+                reference = f.read().strip()
+        clips.append((os.path.basename(path), audio, duration, reference))
+    if not clips:
+        raise SystemExit(f'No .wav files found in {folder}')
+    return clips
+
+
+def run(engine, clips):
+    processing, audio_seconds, errors, reference_words, failures = 0.0, 0.0, 0, 0, 0
+    for name, audio, duration, reference in clips:
+        started = time.perf_counter()
+        try:
+            hypothesis = engine.transcribe(audio)
+        except sr.UnknownValueError:
+            hypothesis = ''
+        except Exception as e:
+            print(f'  {name}: {e}')
+            hypothesis = ''
+            failures += 1
+        processing += time.perf_counter() - started
+        audio_seconds += duration
+        if reference is not None:
+            ref = words(reference)
+            errors += edit_distance(ref, words(hypothesis))
+            reference_words += len(ref)
+    return {
+        'clips': len(clips),
+        'audio_seconds': audio_seconds,
+        'processing_seconds': processing,
+        'rtf': processing / audio_seconds if audio_seconds else 0.0,
+        'wer': errors / reference_words if reference_words else None,
+        'failures': failures,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ASR real-time factor and WER on local WAV clips')
+    parser.add_argument('folder')
+    parser.add_argument('--engines', default=config.ASR_ENGINE, help='Comma-separated: google,vosk,whisper')
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    clips = load_clips(args.folder)
+    results = {}
+    print(f"{'engine':<10}{'clips':>6}{'audio s':>9}{'RTF':>8}{'WER':>8}")
+    for name in args.engines.split(','):
+        name = name.strip()
+        load_started = time.perf_counter()
+        # No fallback here: each engine is measured on its own
+        engine = create_asr_engine(name, config.ASR_MODEL_PATH, compute_type=config.ASR_COMPUTE_TYPE,
+                                   cpu_threads=config.ASR_THREADS, language=config.ASR_LANGUAGE, fallback='none')
+        load_seconds = time.perf_counter() - load_started
+        result = results[name] = run(engine, clips)
+        result['load_seconds'] = load_seconds
+        wer = f"{result['wer']:.3f}" if result['wer'] is not None else '-'
+        print(f"{name:<10}{result['clips']:>6}{result['audio_seconds']:>9.1f}{result['rtf']:>8.3f}{wer:>8}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Compare the old (pydub/ffmpeg) and new (in-process) audio ingest paths of /translate.
+
+Clips of 5 s, 30 s and 120 s are synthesized as 44.1 kHz stereo and 16 kHz mono WAV
+uploads. Both paths stop once the 16 kHz mono sr.AudioData is ready; recognition is
+excluded. Peak memory is the Python heap (tracemalloc); the old path also reports
+the largest ffmpeg child RSS, which tracemalloc cannot see.
+
+    python benchmarks/bench_audio_ingest.py --repeat 10
+"""
+import argparse
+import io
+import os
+import resource
+import sys
+import time
+import tracemalloc
+import wave
+
+import numpy as np
+import speech_recognition as sr
+from pydub import AudioSegment
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+
+from audio_ingest import ingest_audio  # noqa: E402
+
+DURATIONS = (5, 30, 120)
+FORMATS = {'44k-stereo': (44100, 2), '16k-mono': (16000, 1)}
+
+recognizer = sr.Recognizer()
+
+
+def build_clip(seconds, sample_rate, channels):
+    """Speech-band tones plus noise, WAV-encoded like a recorder upload"""
+    t = np.arange(int(seconds * sample_rate)) / float(sample_rate)
+    signal = 0.3 * np.sin(2 * np.pi * 220 * t) + 0.2 * np.sin(2 * np.pi * 1250 * t)
+    signal += 0.05 * np.random.default_rng(0).standard_normal(len(t))
+    samples = (np.clip(signal, -1, 1) * 32767).astype(np.int16)
+    samples = np.repeat(samples[:, np.newaxis], channels, axis=1)
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+def old_path(audio_bytes):
+    audio_segment = AudioSegment.from_file(io.BytesIO(audio_bytes))
+    audio_segment = audio_segment.set_channels(1).set_frame_rate(16000)
+    wav_buffer = io.BytesIO()
+    audio_segment.export(wav_buffer, format="wav")
+    wav_buffer.seek(0)
+    with sr.AudioFile(wav_buffer) as source:
+        return recognizer.record(source)
+
+
+def new_path(audio_bytes):
+    return sr.AudioData(ingest_audio(audio_bytes, 'audio/wav').tobytes(), 16000, 2)
+
+
+def measure(fn, audio_bytes, repeat):
+    fn(audio_bytes)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn(audio_bytes)
+    per_request_ms = (time.perf_counter() - started) * 1000.0 / repeat
+
+    tracemalloc.start()
+    result = fn(audio_bytes)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    seconds = len(result.frame_data) / (2.0 * result.sample_rate)
+    return per_request_ms, peak / (1024.0 * 1024.0), seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'clip':<16}{'path':<6}{'ms/request':>12}{'peak MiB':>10}{'audio s':>9}")
+    for seconds in DURATIONS:
+        for fmt, (sample_rate, channels) in FORMATS.items():
+            audio_bytes = build_clip(seconds, sample_rate, channels)
+            name = f'{seconds}s {fmt}'
+            for label, fn in (('old', old_path), ('new', new_path)):
+                ms, peak_mib, decoded = measure(fn, audio_bytes, args.repeat)
+                print(f'{name:<16}{label:<6}{ms:>12.1f}{peak_mib:>10.1f}{decoded:>9.1f}')
+
+    # ru_maxrss is KiB on Linux
+    child_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024.0
+    print(f'largest ffmpeg child RSS (old path only): {child_rss:.1f} MiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Benchmark face detectors for time and recall on a local labeled image folder.
+
+The folder holds images plus a labels.json mapping each file name to its face boxes:
+
+    {"group_01.jpg": [[x, y, w, h], ...], "single_02.jpg": [[x, y, w, h]]}
+
+Detector settings come from the same FACE_* environment variables as the backend,
+so a deployment's tuning can be checked before it is rolled out:
+
+    FACE_DNN_MODEL=face_detection_yunet_2023mar.onnx \\
+        python benchmarks/bench_detectors.py path/to/faces --detectors haar,yunet
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+
+import config  # noqa: E402
+from emotion import downscale_for_detection, rescale_boxes  # noqa: E402
+from face_detectors import create_detector  # noqa: E402
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union else 0.0
+
+
+def match(predicted, expected, threshold):
+    """Greedy one-to-one matching; returns the number of true positives"""
+    unmatched = list(expected)
+    hits = 0
+    for box in predicted:
+        best = max(unmatched, key=lambda e: iou(box, e), default=None)
+        if best is not None and iou(box, best) >= threshold:
+            unmatched.remove(best)
+            hits += 1
+    return hits
+
+
+def run(detector, images, labels, max_side, iou_threshold):
+    timings, hits, predicted_total, expected_total = [], 0, 0, 0
+    for name, gray in images:
+        started = time.perf_counter()
+        small, scale = downscale_for_detection(gray, max_side)
+        faces = rescale_boxes(detector.detect(small), scale, gray.shape)
+        timings.append((time.perf_counter() - started) * 1000.0)
+
+        predicted = [tuple(int(v) for v in box) for box in faces]
+        expected = labels[name]
+        hits += match(predicted, expected, iou_threshold)
+        predicted_total += len(predicted)
+        expected_total += len(expected)
+
+    return {
+        'mean_ms': float(np.mean(timings)),
+        'p95_ms': float(np.percentile(timings, 95)),
+        'recall': hits / expected_total if expected_total else 0.0,
+        'precision': hits / predicted_total if predicted_total else 0.0,
+        'faces': expected_total,
+        'detections': predicted_total,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark face detectors on a labeled folder')
+    parser.add_argument('folder', help='Folder with images and labels.json')
+    parser.add_argument('--detectors', default='haar', help='Comma-separated: haar,yunet,ssd')
+    parser.add_argument('--max-side', type=int, default=config.EMOTION_DETECT_MAX_SIDE)
+    parser.add_argument('--iou', type=float, default=0.5, help='IoU needed to count a face as found')
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    with open(os.path.join(args.folder, 'labels.json')) as f:
+        labels = json.load(f)
+    images = []
+    for name in sorted(labels):
+        gray = cv2.imread(os.path.join(args.folder, name), cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            print(f'Skipping unreadable image {name}')
+            continue
+        images.append((name, gray))
+
+    results = {}
+    print(f"{'detector':<10}{'mean ms':>9}{'p95 ms':>9}{'recall':>8}{'precision':>11}")
+    for name in args.detectors.split(','):
+        detector = create_detector(name.strip(), config)
+        detector.detect(images[0][1])
+        result = results[name] = run(detector, images, labels, args.max_side, args.iou)
+        print(f"{name:<10}{result['mean_ms']:>9.2f}{result['p95_ms']:>9.2f}"
+              f"{result['recall']:>8.3f}{result['precision']:>11.3f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,353 @@
+"""End-to-end load test of the backend against local stand-ins for Ollama, ASR and translation.
+
+A fake Ollama server (fake_ollama.py) runs in this process. The real backend runs in a
+child process (Flask, ASGI or serve.py) with ASR_ENGINE=stub and TRANSLATE_PROVIDER=stub,
+each with the configured latency. A weighted mix of image, audio and chat requests is
+then sent at a fixed concurrency. The report gives throughput and p50/p95/p99 per
+workload, and per stage from the /metrics histograms (bucket-interpolated).
+
+    python benchmarks/bench_e2e.py --concurrency 16 --duration 30 --json e2e.json
+    python benchmarks/bench_e2e.py --server prefork --workers 4 --compare e2e.json
+"""
+import argparse
+import glob
+import io
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+from array import array
+
+import requests
+from prometheus_client.parser import text_string_to_metric_families
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND = os.path.join(ROOT, 'backend')
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_ollama import start_fake_ollama  # noqa: E402
+
+MESSAGES = [
+    "I feel sad today",
+    "I can't sleep at night",
+    "Work has been really stressful lately",
+    "I had a good day with my friends",
+    "How can I stop overthinking?",
+    "I feel lonely after moving to a new city",
+]
+
+FLASK_SERVER = ("import sys, main; from werkzeug.serving import run_simple; "
+                "run_simple('127.0.0.1', int(sys.argv[1]), main.app, threaded=True)")
+
+
+def server_command(args):
+    if args.server == 'flask':
+        return [sys.executable, '-c', FLASK_SERVER, str(args.port)]
+    if args.server == 'asgi':
+        return [sys.executable, '-m', 'hypercorn', 'asgi_app:app', '--bind', f'127.0.0.1:{args.port}']
+    return [sys.executable, 'serve.py', '--bind', f'127.0.0.1:{args.port}', '--workers', str(args.workers)]
+
+
+def make_wav(seconds, sample_rate=16000):
+    """A quiet tone with noise, as 16-bit mono WAV bytes (the stub ASR ignores the content)"""
+    rng = random.Random(0)
+    samples = array('h', (int(3000 * math.sin(2 * math.pi * 220 * i / sample_rate) + rng.randint(-300, 300))
+                          for i in range(int(seconds * sample_rate))))
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+class Workloads:
+    """One request per workload name; each returns (status, first_token_ms or None)"""
+
+    def __init__(self, base_url, images, wav):
+        self.base_url = base_url
+        self.images = images
+        self.wav = wav
+
+    def image(self, session, rng):
+        name, data = rng.choice(self.images)
+        response = session.post(f'{self.base_url}/predict_emotion', files={'image': (name, data, 'image/jpeg')})
+        return response.status_code, None
+
+    def audio(self, session, rng):
+        response = session.post(f'{self.base_url}/translate', files={'audio': ('clip.wav', self.wav, 'audio/wav')})
+        return response.status_code, None
+
+    def chat(self, session, rng):
+        response = session.post(f'{self.base_url}/chatbot', json={'message': rng.choice(MESSAGES)})
+        return response.status_code, None
+
+    def chat_stream(self, session, rng):
+        started = time.perf_counter()
+        first_token = None
+        with session.post(f'{self.base_url}/chatbot', json={'message': rng.choice(MESSAGES), 'stream': True},
+                          stream=True) as response:
+            for line in response.iter_lines():
+                if first_token is None and line.startswith(b'data:') and b'"token"' in line:
+                    first_token = (time.perf_counter() - started) * 1000.0
+        return response.status_code, first_token
+
+
+def drive(workloads, mix, concurrency, duration, seed=0):
+    """Send the weighted mix from `concurrency` threads for `duration` seconds"""
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    deadline = time.perf_counter() + duration
+    records = []
+    lock = threading.Lock()
+
+    def run(worker):
+        rng = random.Random(seed + worker)
+        session = requests.Session()
+        local = []
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                status, first_token = getattr(workloads, name)(session, rng)
+            except requests.RequestException:
+                status, first_token = 'error', None
+            local.append((name, (time.perf_counter() - started) * 1000.0, status, first_token))
+        session.close()
+        with lock:
+            records.extend(local)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return records
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, math.ceil(q * len(values)) - 1))]
+
+
+def summarize_routes(records, duration):
+    routes = {}
+    for name in sorted({record[0] for record in records}):
+        rows = [record for record in records if record[0] == name]
+        latencies = [row[1] for row in rows]
+        statuses = {}
+        for row in rows:
+            statuses[str(row[2])] = statuses.get(str(row[2]), 0) + 1
+        summary = {
+            'requests': len(rows),
+            'throughput_rps': len(rows) / duration,
+            # 4xx too: a 429/503/413 from admission control is a rejection, not a fast success
+            'errors': sum(1 for row in rows if row[2] == 'error' or row[2] >= 400),
+            'statuses': statuses,
+            'p50_ms': percentile(latencies, 0.50),
+            'p95_ms': percentile(latencies, 0.95),
+            'p99_ms': percentile(latencies, 0.99),
+        }
+        first_tokens = [row[3] for row in rows if row[3] is not None]
+        if first_tokens:
+            summary.update({f'first_token_p{q}_ms': percentile(first_tokens, q / 100.0) for q in (50, 95, 99)})
+        routes[name] = summary
+    return routes
+
+
+def scrape_stages(base_url):
+    """{stage: {'count': n, 'sum': s, 'buckets': {le: cumulative count}}} from /metrics"""
+    stages = {}
+    text = requests.get(f'{base_url}/metrics', timeout=10).text
+    for family in text_string_to_metric_families(text):
+        if family.name != 'soulmate_stage_seconds':
+            continue
+        for sample in family.samples:
+            entry = stages.setdefault(sample.labels['stage'], {'count': 0.0, 'sum': 0.0, 'buckets': {}})
+            if sample.name.endswith('_bucket'):
+                entry['buckets'][float(sample.labels['le'])] = sample.value
+            elif sample.name.endswith('_count'):
+                entry['count'] = sample.value
+            elif sample.name.endswith('_sum'):
+                entry['sum'] = sample.value
+    return stages
+
+
+def histogram_quantile(buckets, count, q):
+    """Linear interpolation inside the bucket holding the q-th observation (like PromQL)"""
+    rank = q * count
+    previous_le, previous_count = 0.0, 0.0
+    for le, cumulative in sorted(buckets.items()):
+        if cumulative >= rank:
+            if math.isinf(le):
+                return previous_le
+            if cumulative == previous_count:
+                return le
+            return previous_le + (le - previous_le) * (rank - previous_count) / (cumulative - previous_count)
+        previous_le, previous_count = le, cumulative
+    return previous_le
+
+
+def summarize_stages(before, after):
+    stages = {}
+    for name, entry in sorted(after.items()):
+        base = before.get(name, {'count': 0.0, 'sum': 0.0, 'buckets': {}})
+        count = entry['count'] - base['count']
+        if count <= 0:
+            continue
+        buckets = {le: value - base['buckets'].get(le, 0.0) for le, value in entry['buckets'].items()}
+        stages[name] = {
+            'count': int(count),
+            'mean_ms': (entry['sum'] - base['sum']) * 1000.0 / count,
+            **{f'p{q}_ms': histogram_quantile(buckets, count, q / 100.0) * 1000.0 for q in (50, 95, 99)},
+        }
+    return stages
+
+
+def wait_ready(base_url, process, timeout):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'backend exited with code {process.returncode}')
+        try:
+            if requests.get(f'{base_url}/ready', timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f'backend not ready after {timeout:.0f}s')
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in ('image', 'audio', 'chat', 'chat_stream'):
+            raise argparse.ArgumentTypeError(f'unknown workload {name!r}')
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def print_table(title, rows, columns):
+    print(f"\n{title:<16}" + ''.join(f'{column:>12}' for column in columns))
+    for name, row in rows.items():
+        cells = ''.join(f"{row.get(column, float('nan')) or 0:>12.1f}" for column in columns)
+        print(f'{name:<16}{cells}')
+
+
+def print_comparison(baseline, results):
+    print(f"\n{'p95 change':<24}{'before ms':>12}{'after ms':>12}{'change':>10}")
+    for section in ('routes', 'stages'):
+        for name, row in results[section].items():
+            old = baseline.get(section, {}).get(name, {}).get('p95_ms')
+            new = row.get('p95_ms')
+            if old and new:
+                print(f"{section[:-1] + ' ' + name:<24}{old:>12.1f}{new:>12.1f}{(new - old) / old:>+10.1%}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--server', choices=['flask', 'asgi', 'prefork'], default='flask')
+    parser.add_argument('--workers', type=int, default=4, help='Worker processes for --server prefork')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30.0, help='Measured seconds')
+    parser.add_argument('--warmup', type=float, default=5.0, help='Unmeasured seconds before the run')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('image=2,audio=1,chat=1,chat_stream=1'),
+                        help='Workload weights, e.g. image=2,audio=1,chat=1,chat_stream=1')
+    parser.add_argument('--images', default=os.path.join(ROOT, 'emotion_detection', '*.jpg'),
+                        help='Glob of face images for /predict_emotion')
+    parser.add_argument('--audio-seconds', type=float, default=3.0)
+    parser.add_argument('--llm-first-token-ms', type=float, default=200.0)
+    parser.add_argument('--llm-token-ms', type=float, default=20.0)
+    parser.add_argument('--llm-tokens', type=int, default=32)
+    parser.add_argument('--asr-latency-ms', type=float, default=300.0)
+    parser.add_argument('--translate-latency-ms', type=float, default=100.0)
+    parser.add_argument('--grammar', action='store_true', help='Keep LanguageTool grammar checks on')
+    parser.add_argument('--ready-timeout', type=float, default=300.0)
+    parser.add_argument('--json', help='Write the results to this file')
+    parser.add_argument('--compare', help='Earlier --json results to compare p95 latencies against')
+    args = parser.parse_args()
+
+    images = [(os.path.basename(path), open(path, 'rb').read()) for path in sorted(glob.glob(args.images))]
+    if not images and 'image' in args.mix:
+        parser.error(f'no images match {args.images}')
+
+    ollama = start_fake_ollama(first_token_ms=args.llm_first_token_ms, token_ms=args.llm_token_ms,
+                               tokens=args.llm_tokens)
+    env = dict(
+        os.environ,
+        OLLAMA_URL=f'http://127.0.0.1:{ollama.server_port}',
+        ASR_ENGINE='stub',
+        ASR_STUB_LATENCY=str(args.asr_latency_ms / 1000.0),
+        TRANSLATE_PROVIDER='stub',
+        TRANSLATE_STUB_LATENCY=str(args.translate_latency_ms / 1000.0),
+        GRAMMAR_ENABLED='1' if args.grammar else '0',
+        # Every chat request should reach the (fake) model
+        RESPONSE_CACHE_ENABLED='0',
+        # All load comes from 127.0.0.1, so a per-client bucket would turn most of it into 429s
+        RATE_LIMIT_PER_SECOND='0',
+        STARTUP_MODE='background',
+    )
+    base_url = f'http://127.0.0.1:{args.port}'
+    log = tempfile.NamedTemporaryFile('w', prefix='bench-e2e-', suffix='.log', delete=False)
+    process = subprocess.Popen(server_command(args), cwd=BACKEND, env=env, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        wait_ready(base_url, process, args.ready_timeout)
+        workloads = Workloads(base_url, images, make_wav(args.audio_seconds))
+        if args.warmup > 0:
+            drive(workloads, args.mix, args.concurrency, args.warmup, seed=1000)
+        before = scrape_stages(base_url)
+        started = time.perf_counter()
+        records = drive(workloads, args.mix, args.concurrency, args.duration)
+        elapsed = time.perf_counter() - started
+        stages = summarize_stages(before, scrape_stages(base_url))
+    except Exception as e:
+        print(f'Benchmark failed: {e} (backend log: {log.name})')
+        raise SystemExit(1)
+    finally:
+        process.terminate()
+        process.wait(30)
+        ollama.shutdown()
+        log.close()
+
+    results = {
+        'commit': git_commit(),
+        'settings': {key: value for key, value in vars(args).items() if key not in ('json', 'compare')},
+        'elapsed_seconds': elapsed,
+        'throughput_rps': len(records) / elapsed,
+        'routes': summarize_routes(records, elapsed),
+        'stages': stages,
+    }
+    print(f"{len(records)} requests in {elapsed:.1f}s ({results['throughput_rps']:.1f} req/s), "
+          f"{args.server} server, concurrency {args.concurrency}")
+    print_table('workload', results['routes'], ['requests', 'throughput_rps', 'errors', 'p50_ms', 'p95_ms', 'p99_ms'])
+    print_table('stage', results['stages'], ['count', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms'])
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
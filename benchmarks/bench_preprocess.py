@@ -0,0 +1,101 @@
+"""Compare the old and new /predict_emotion preprocessing paths (decode, detect, crop).
+
+Frames are built from the sample photos in emotion_detection/ at 480p, 720p and 1080p
+and JPEG-encoded like a browser upload. Inference is excluded; both paths stop once
+the (N, 48, 48, 1) batch is ready.
+
+    python benchmarks/bench_preprocess.py --repeat 50
+"""
+import argparse
+import glob
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+
+from emotion import decode_gray, downscale_for_detection, rescale_boxes, preprocess_faces  # noqa: E402
+
+RESOLUTIONS = {'480p': (854, 480), '720p': (1280, 720), '1080p': (1920, 1080)}
+
+face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+
+
+def detect(gray):
+    return face_cascade.detectMultiScale(gray, scaleFactor=1.3, minNeighbors=5, minSize=(30, 30))
+
+
+def build_frame(size):
+    """Lay the sample photos side by side on a frame of the given size and JPEG-encode it"""
+    width, height = size
+    canvas = np.full((height, width, 3), 40, dtype=np.uint8)
+    photos = [cv2.imread(p) for p in sorted(glob.glob(os.path.join(ROOT, 'emotion_detection', '*.jpg')))]
+    tile = min(height, width // len(photos))
+    for i, photo in enumerate(photos):
+        canvas[(height - tile) // 2:(height + tile) // 2, i * tile:(i + 1) * tile] = cv2.resize(photo, (tile, tile))
+    ok, encoded = cv2.imencode('.jpg', canvas, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return encoded.tobytes()
+
+
+def old_pipeline(img_bytes):
+    pil_image = Image.open(io.BytesIO(img_bytes)).convert('RGB')
+    frame = np.array(pil_image)
+    frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    faces = detect(gray)
+    crops = []
+    for (x, y, w, h) in faces:
+        face_image = cv2.resize(frame[y:y + h, x:x + w], (48, 48))
+        face_image = cv2.cvtColor(face_image, cv2.COLOR_BGR2GRAY)
+        # keras.preprocessing.image.img_to_array is np.asarray(..., dtype=float32) plus a channel axis
+        face_image = np.asarray(face_image, dtype=np.float32)[..., np.newaxis]
+        face_image = np.expand_dims(face_image, axis=0)
+        crops.append(np.vstack([face_image]))
+    return crops
+
+
+def new_pipeline(img_bytes, max_side):
+    gray = decode_gray(img_bytes)
+    small, scale = downscale_for_detection(gray, max_side)
+    faces = rescale_boxes(detect(small), scale, gray.shape)
+    return [preprocess_faces(gray, faces)]
+
+
+def measure(fn, img_bytes, repeat):
+    fn(img_bytes)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn(img_bytes)
+    per_frame_ms = (time.perf_counter() - started) * 1000.0 / repeat
+
+    tracemalloc.start()
+    result = fn(img_bytes)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    faces = sum(len(batch) for batch in result)
+    return per_frame_ms, peak / 1024.0, faces
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--max-side', type=int, default=640, help='Detection resolution for the new path')
+    args = parser.parse_args()
+
+    print(f"{'input':<7}{'path':<6}{'ms/frame':>10}{'peak KiB':>11}{'faces':>7}")
+    for name, size in RESOLUTIONS.items():
+        img_bytes = build_frame(size)
+        for label, fn in (('old', old_pipeline), ('new', lambda b: new_pipeline(b, args.max_side))):
+            ms, peak_kib, faces = measure(fn, img_bytes, args.repeat)
+            print(f'{name:<7}{label:<6}{ms:>10.2f}{peak_kib:>11.0f}{faces:>7}')
+
+
+if __name__ == '__main__':
+    main()
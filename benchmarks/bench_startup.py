@@ -0,0 +1,96 @@
+"""Startup time and resident memory of the backend per SUBSYSTEMS / STARTUP_MODE configuration.
+
+Each configuration is measured in a fresh interpreter: time until main.py is imported
+(routes can be served), time until every enabled engine is loaded, and RSS at both
+points. In lazy mode "ready" is measured by calling the warm-up explicitly.
+
+    python benchmarks/bench_startup.py --json startup.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND = os.path.join(ROOT, 'backend')
+
+CONFIGURATIONS = [
+    ('all, eager', 'emotion,speech,text,chat', 'eager'),
+    ('all, background', 'emotion,speech,text,chat', 'background'),
+    ('all, lazy', 'emotion,speech,text,chat', 'lazy'),
+    ('emotion only', 'emotion', 'eager'),
+    ('speech+text only', 'speech,text', 'eager'),
+    ('chat only', 'chat', 'eager'),
+]
+
+CHILD = r'''
+import json, resource, sys, time
+
+def rss_mib():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+started = time.perf_counter()
+import main  # noqa: F401
+import services
+imported = time.perf_counter() - started
+imported_rss = rss_mib()
+
+if services.config.STARTUP_MODE == 'lazy':
+    services.registry.warmup()
+while not services.registry.status()['ready'] and time.perf_counter() - started < float(sys.argv[1]):
+    time.sleep(0.05)
+status = services.registry.status()
+print(json.dumps({
+    'import_seconds': imported,
+    'import_rss_mib': imported_rss,
+    'ready': status['ready'],
+    'ready_seconds': time.perf_counter() - started,
+    'ready_rss_mib': rss_mib(),
+    'components': {name: entry['load_seconds'] for name, entry in status['components'].items()},
+}))
+'''
+
+
+def measure(subsystems, mode, timeout):
+    env = dict(os.environ, SUBSYSTEMS=subsystems, STARTUP_MODE=mode)
+    output = subprocess.run([sys.executable, '-c', CHILD, str(timeout)], cwd=BACKEND, env=env,
+                            capture_output=True, text=True, timeout=timeout + 60)
+    if output.returncode != 0:
+        raise RuntimeError(output.stderr.strip().splitlines()[-1] if output.stderr else 'child failed')
+    # Engines print while loading; the report is the last line
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--timeout', type=float, default=300.0, help='Seconds to wait for readiness')
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'configuration':<20}{'import s':>10}{'RSS MiB':>9}{'ready s':>9}{'RSS MiB':>9}")
+    for label, subsystems, mode in CONFIGURATIONS:
+        try:
+            result = results[label] = measure(subsystems, mode, args.timeout)
+        except Exception as e:
+            print(f'{label:<20}failed: {e}')
+            continue
+        ready = f"{result['ready_seconds']:>9.2f}" if result['ready'] else f"{'timeout':>9}"
+        print(f"{label:<20}{result['import_seconds']:>10.2f}{result['import_rss_mib']:>9.0f}"
+              f"{ready}{result['ready_rss_mib']:>9.0f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Local stand-in for Ollama's /api/generate and /api/embeddings with configurable latency.
+
+Replies are streamed as NDJSON like the real server: the first token after
+--first-token-ms, then one token every --token-ms.
+
+    python benchmarks/fake_ollama.py --port 11435 --first-token-ms 300 --token-ms 20
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = ("I'm sorry you are feeling this way. It can help to take a slow breath and "
+         "name one small thing you can do right now. Would you like to talk about it?")
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, body, status=200):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        settings = self.server.settings
+        if self.path == '/api/embeddings':
+            time.sleep(settings['embed_ms'] / 1000.0)
+            # Deterministic vector so identical prompts hit the semantic cache
+            seed = sum(payload.get('prompt', '').encode()) or 1
+            self._send_json({'embedding': [((seed * (i + 1)) % 97) / 97.0 for i in range(64)]})
+            return
+        if self.path != '/api/generate':
+            self._send_json({'error': f'unknown endpoint {self.path}'}, status=404)
+            return
+
+        tokens = [word + ' ' for word in REPLY.split()][:settings['tokens']]
+        final = {'done': True, 'context': [1, 2, 3], 'eval_count': len(tokens)}
+        time.sleep(settings['first_token_ms'] / 1000.0)
+        if not payload.get('stream', True):
+            time.sleep(settings['token_ms'] * (len(tokens) - 1) / 1000.0)
+            self._send_json({**final, 'response': ''.join(tokens)})
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(settings['token_ms'] / 1000.0)
+            self._write_chunk({'response': token, 'done': False})
+        self._write_chunk({**final, 'response': ''})
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _write_chunk(self, body):
+        line = json.dumps(body).encode() + b'\n'
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(line), line))
+        self.wfile.flush()
+
+
+def start_fake_ollama(port=0, first_token_ms=200.0, token_ms=20.0, tokens=32, embed_ms=10.0):
+    """Serve on 127.0.0.1:port from a daemon thread; returns the server (server.server_port)"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), FakeOllamaHandler)
+    server.daemon_threads = True
+    server.settings = {'first_token_ms': first_token_ms, 'token_ms': token_ms, 'tokens': tokens,
+                       'embed_ms': embed_ms}
+    threading.Thread(target=server.serve_forever, name='fake-ollama', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=11435)
+    parser.add_argument('--first-token-ms', type=float, default=200.0)
+    parser.add_argument('--token-ms', type=float, default=20.0)
+    parser.add_argument('--tokens', type=int, default=32)
+    args = parser.parse_args()
+    server = start_fake_ollama(args.port, args.first_token_ms, args.token_ms, args.tokens)
+    print(f'Fake Ollama on http://127.0.0.1:{server.server_port}')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,27 +1,28 @@
-import requests
+import os
+import sys
+
+# Reuse the backend's pooled Ollama client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+import config
+from llm_client import OllamaClient, LLMError, build_prompt
+
+client = OllamaClient(
+    base_url=config.OLLAMA_URL,
+    model=config.OLLAMA_MODEL,
+    connect_timeout=config.OLLAMA_CONNECT_TIMEOUT,
+    read_timeout=config.OLLAMA_READ_TIMEOUT,
+    retries=config.OLLAMA_RETRIES,
+    pool_size=1,
+)
 
 def chat_with_bot(message):
-    url = "http://127.0.0.1:11434/api/generate"
-
-    prompt = (
-        "You are a compassionate and empathetic AI trained to provide emotional and mental support."
-        "Reply to the user with compassion, warmth, and comfort in less than 100 characters.\n"
-        f"User: {message}\n"
-        "Bot:"
-    )
-
-    payload = {
-        "model": "gemma:2b",
-        "prompt": prompt,
-        "stream": False
-    }
-
-    response = requests.post(url, json=payload)
-
-    if response.status_code == 200:
-        return response.json()["response"].strip()
-    else:
-        return f"Error {response.status_code}: {response.text}"
+    """Print the reply token by token as Ollama generates it"""
+    try:
+        for chunk in client.stream(build_prompt(message)):
+            print(chunk.get("response", ""), end="", flush=True)
+    except LLMError as e:
+        print(f"Error: {e}", end="")
+    print()
 
 
 print("Emotional Support Bot (type 'exit' to stop)")
@@ -30,5 +31,5 @@ while True:
     user_input = input("You: ")
     if user_input.lower() == "exit":
         break
-    bot_reply = chat_with_bot(user_input)
-    print(f"Bot: {bot_reply}")
+    print("Bot: ", end="", flush=True)
+    chat_with_bot(user_input)
@@ -1,14 +1,21 @@
+import os
+import sys
 import cv2
 import numpy as np
 import tensorflow.keras.models
 from tensorflow.keras.preprocessing import image
 
+# Share the backend's configurable face detector
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+import config
+from face_detectors import create_detector
+
 # Load the trained model
 model_best = tensorflow.keras.models.load_model('emotion_model.h5') 
 class_names = ['Angry', 'Disgusted', 'Fear', 'Happy', 'Sad', 'Surprise', 'Neutral']
 
-# Load the pre-trained face cascade
-face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+# Load the face detector selected by FACE_DETECTOR (Haar cascade by default)
+face_detector = create_detector(config.FACE_DETECTOR, config)
 
 # Open a connection to the webcam =
 cap = cv2.VideoCapture(0)
@@ -19,7 +26,7 @@ while True:
     gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
 
     # Detect faces in the frame
-    faces = face_cascade.detectMultiScale(gray, scaleFactor=1.3, minNeighbors=5, minSize=(30, 30))
+    faces = face_detector.detect(gray)
 
     # Process each detected face
     for (x, y, w, h) in faces:
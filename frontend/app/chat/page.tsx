@@ -38,6 +38,7 @@ export default function Chat() {
   const [transcribing, setTranscribing] = useState(false);
 
   const messagesEndRef = useRef<HTMLDivElement>(null);
+  const chatSessionId = useRef<string | null>(null);
 
   const scrollToBottom = () =>
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
@@ -56,20 +57,51 @@ export default function Chat() {
     setInputValue('');
     setIsTyping(true);
 
+    const aiId = (Date.now() + 1).toString();
     try {
-      const res = await axios.post(CHAT_URL!, { message: userMessage.content });
-      const aiMessage: Message = {
-        id: (Date.now() + 1).toString(),
-        content: res.data.response || 'Sorry! I did not understand that.',
-        sender: 'ai',
-        timestamp: new Date(),
-      };
-      setMessages((prev) => [...prev, aiMessage]);
+      // Ask the backend to stream the reply so tokens appear as they are generated
+      const res = await fetch(CHAT_URL!, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', Accept: 'text/event-stream' },
+        body: JSON.stringify({
+          message: userMessage.content,
+          session_id: chatSessionId.current,
+          stream: true,
+        }),
+      });
+      if (!res.ok || !res.body) throw new Error(`Chat request failed: ${res.status}`);
+
+      setMessages((prev) => [...prev, { id: aiId, content: '', sender: 'ai', timestamp: new Date() }]);
+      setIsTyping(false);
+
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let content = '';
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop() ?? '';
+        for (const event of events) {
+          const dataLine = event.split('\n').find((line) => line.startsWith('data: '));
+          if (!dataLine) continue;
+          const data = JSON.parse(dataLine.slice(6));
+          if (data.error) throw new Error(data.error);
+          if (data.token) content += data.token;
+          if (data.response !== undefined) content = data.response;
+          if (data.session_id) chatSessionId.current = data.session_id;
+          const text = content;
+          setMessages((prev) => prev.map((m) => (m.id === aiId ? { ...m, content: text } : m)));
+        }
+      }
+      if (!content) throw new Error('Empty reply');
     } catch {
       setMessages((prev) => [
-        ...prev,
+        ...prev.filter((m) => m.id !== aiId),
         {
-          id: (Date.now() + 1).toString(),
+          id: aiId,
           content: 'Sorry! I did not understand that.',
           sender: 'ai',
           timestamp: new Date(),
@@ -1,23 +1,27 @@
 import speech_recognition as sr
 import pyaudio
 import threading
-import time
-from google.cloud import translate_v2 as translate
 import queue
 import sys
+import os
+
+# Share the backend's cached translation service
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+from translation import create_translation_service
+from vad import AdaptiveVAD, SpeechSegmenter, microphone_events
 
 class VoiceToTextConverter:
     def __init__(self):
         self.recognizer = sr.Recognizer()
         self.microphone = sr.Microphone()
-        self.translator = translate.Client.from_service_account_json('C:\\Users\\R. Subrahmanyam\\OneDrive\\Desktop\\soulmate\\speech_text\\translation-bot-464508-d80ab12ef2d2.json')
+        self.translator = create_translation_service('cloud', credentials_path='C:\\Users\\R. Subrahmanyam\\OneDrive\\Desktop\\soulmate\\speech_text\\translation-bot-464508-d80ab12ef2d2.json')
+        # Utterances cut by the VAD wait here for the recognition thread
         self.audio_queue = queue.Queue()
-        self.is_listening = False
+        self.stop_event = threading.Event()
         self.pause_count = 0
         self.max_pauses = 4
         self.pause_duration = 5  # seconds
         self.collected_text = []
-        self.last_speech_time = time.time()
         
         # Adjust for ambient noise
         print("Adjusting for ambient noise... Please wait.")
@@ -28,22 +32,19 @@ class VoiceToTextConverter:
     def translate_to_english(self, text):
         """Translate text to English regardless of detected language"""
         try:
-            result = self.translator.translate(text, target_language='en')
-            return result['translatedText']
+            return self.translator.translate(text, src='auto', dest='en').text
         except Exception as e:
             print(f"Translation error: {e}")
             return text
 
     
-    def audio_callback(self, recognizer, audio):
-        """Callback function for continuous listening"""
+    def audio_callback(self, audio):
+        """Recognize and translate one utterance"""
         try:
             # Use Google's speech recognition
-            text = recognizer.recognize_google(audio)
+            text = self.recognizer.recognize_google(audio)
             
             if text.strip():
-                self.last_speech_time = time.time()
-                
                 print(f"\n[Original] {text}")
 
                 # Always translate
@@ -59,32 +60,36 @@ class VoiceToTextConverter:
             print(f"Could not request results; {e}")
 
     
-    def monitor_pauses(self):
-        """Monitor for pauses in speech"""
-        while self.is_listening:
-            current_time = time.time()
-            time_since_last_speech = current_time - self.last_speech_time
-            
-            if time_since_last_speech >= self.pause_duration:
-                self.pause_count += 1
-                print(f"\n--- Pause detected ({self.pause_count}/{self.max_pauses}) ---")
-                
-                if self.pause_count >= self.max_pauses:
-                    print("Maximum pauses reached. Stopping...")
-                    self.stop_listening()
-                    break
-                else:
-                    print("Continuing to listen...")
-                    self.last_speech_time = current_time  # Reset timer
-            
-            time.sleep(0.5)  # Check every 500ms
+    def process_queue(self):
+        """Recognition thread: utterances are handled in the order they were spoken"""
+        while True:
+            audio = self.audio_queue.get()
+            if audio is None:
+                break
+            self.audio_callback(audio)
+    
+    def capture(self, segmenter):
+        """Feed microphone audio to the VAD; utterances and pauses come out as events as it is read"""
+        try:
+            with self.microphone as source:
+                for kind, payload in microphone_events(source, segmenter, self.stop_event.is_set):
+                    if kind == 'final':
+                        self.audio_queue.put(sr.AudioData(payload, source.SAMPLE_RATE, source.SAMPLE_WIDTH))
+                    elif kind == 'pause':
+                        self.pause_count = payload
+                        print(f"\n--- Pause detected ({self.pause_count}/{self.max_pauses}) ---")
+                        if self.pause_count < self.max_pauses:
+                            print("Continuing to listen...")
+                    elif kind == 'stop':
+                        print("Maximum pauses reached. Stopping...")
+        finally:
+            self.stop_listening()
     
     def start_listening(self):
         """Start the voice recognition process"""
-        self.is_listening = True
+        self.stop_event.clear()
         self.pause_count = 0
         self.collected_text = []
-        self.last_speech_time = time.time()
         
         print("\n🎤 Starting voice recognition...")
         print(f"- Speak in any language (will be translated to English)")
@@ -92,36 +97,33 @@ class VoiceToTextConverter:
         print(f"- After {self.max_pauses} pauses, recording will stop")
         print("- Press Ctrl+C to stop manually\n")
         
-        # Start the pause monitoring thread
-        pause_thread = threading.Thread(target=self.monitor_pauses)
-        pause_thread.daemon = True
-        pause_thread.start()
+        worker = threading.Thread(target=self.process_queue, daemon=True)
+        worker.start()
         
-        # Start continuous listening
-        stop_listening = self.recognizer.listen_in_background(
-            self.microphone, 
-            self.audio_callback,
-            phrase_time_limit=30  # Maximum phrase length
-        )
+        # Utterances and pauses are cut from the audio stream by a VAD seeded from the
+        # ambient-noise calibration, so silence is never sent to Google
+        vad = AdaptiveVAD.from_recognizer(self.recognizer, self.microphone.SAMPLE_RATE)
+        segmenter = SpeechSegmenter(vad, partial_interval=0, pause_duration=self.pause_duration,
+                                    max_pauses=self.max_pauses)
+        capture_thread = threading.Thread(target=self.capture, args=(segmenter,), daemon=True)
+        capture_thread.start()
         
         try:
-            # Keep the main thread alive
-            while self.is_listening:
-                time.sleep(0.1)
+            # The timeout only lets Ctrl+C through on Windows
+            while not self.stop_event.wait(1.0):
+                pass
         except KeyboardInterrupt:
             print("\nStopping by user request...")
-            self.is_listening = False
-        
-        # Stop listening
-        stop_listening(wait_for_stop=False)
+            self.stop_listening()
         
-        # Wait for pause thread to finish
-        if pause_thread.is_alive():
-            pause_thread.join(timeout=1)
+        # Finish the utterances already captured
+        capture_thread.join()
+        self.audio_queue.put(None)
+        worker.join()
     
     def stop_listening(self):
         """Stop the listening process"""
-        self.is_listening = False
+        self.stop_event.set()
     
     def get_final_output(self):
         """Get the final concatenated output"""
@@ -1,36 +1,62 @@
 import speech_recognition as sr
 import pyaudio
 import threading
-import time
-from googletrans import Translator, LANGUAGES
+from googletrans import LANGUAGES
 import queue
 import sys
-from textblob import TextBlob
-import language_tool_python
+import os
+
+# Share the backend's speech recognition engines
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+import config
+from asr_backends import create_asr_engine
+from language_id import LanguageIdentifier, LanguageRouter, to_googletrans_code
+from translation import create_translation_service
+from text_correction import create_text_corrector
+from vad import AdaptiveVAD, SpeechSegmenter, microphone_events
 
 class VoiceToTextConverter:
     def __init__(self):
         self.recognizer = sr.Recognizer()
+        # Loaded once; a local engine avoids a remote round-trip per utterance
+        self.asr_engine = create_asr_engine(config.ASR_ENGINE, config.ASR_MODEL_PATH,
+                                            compute_type=config.ASR_COMPUTE_TYPE, cpu_threads=config.ASR_THREADS,
+                                            language=config.ASR_LANGUAGE, fallback=config.ASR_FALLBACK,
+                                            recognizer=self.recognizer)
         self.microphone = sr.Microphone()
-        self.translator = Translator()
-        self.audio_queue = queue.Queue()
-        self.is_listening = False
+        # Cached translation; repeated phrases do not go back to the provider
+        self.translation = create_translation_service(config.TRANSLATE_PROVIDER,
+                                                      credentials_path=config.TRANSLATE_CREDENTIALS,
+                                                      max_entries=config.TRANSLATE_CACHE_MAX_ENTRIES,
+                                                      ttl=config.TRANSLATE_CACHE_TTL)
+        # Local language ID; the remote detect call is only made when it is unsure
+        self.language_router = LanguageRouter(LanguageIdentifier(config.LANGID_MODEL_PATH),
+                                              english_threshold=config.LANGID_ENGLISH_THRESHOLD,
+                                              other_threshold=config.LANGID_OTHER_THRESHOLD,
+                                              min_chars=config.LANGID_MIN_CHARS)
+        # Capture only enqueues utterances; a worker pool recognizes, translates and corrects them
+        self.worker_count = config.SPEECH_WORKERS
+        self.audio_queue = queue.Queue(maxsize=config.SPEECH_QUEUE_SIZE)
+        self.dropped_utterances = 0
+        self.workers = []
+        self.next_sequence = 0
+        self.next_to_emit = 0
+        self.pending_results = {}
+        self.results_lock = threading.Lock()
+        self.stop_event = threading.Event()
         self.pause_count = 0
         self.max_pauses = 4
         self.pause_duration = 5 
         self.collected_text = []
-        self.last_speech_time = time.time()
         
-        # Initialize grammar checker
+        # Initialize spelling index and grammar checker (the shared LanguageTool server at GRAMMAR_SERVER_URL)
         print("Initializing grammar checker... Please wait.")
-        try:
-            self.grammar_tool = language_tool_python.LanguageTool('en-US')
-            self.grammar_enabled = True
+        self.text_corrector = create_text_corrector(config)
+        self.grammar_enabled = self.text_corrector.grammar is not None
+        if self.grammar_enabled:
             print("Grammar checker initialized successfully.")
-        except Exception as e:
-            print(f"Warning: Grammar checker initialization failed: {e}")
+        else:
             print("Continuing without grammar correction...")
-            self.grammar_enabled = False
         
         # Adjusting for ambient noise
         print("Adjusting for ambient noise... Please wait.")
@@ -40,35 +66,24 @@ class VoiceToTextConverter:
     
     def detect_language(self, text):
         """Detect the language of the input text"""
+        route, lang = self.language_router.route(text)
+        if route != 'unknown':
+            return to_googletrans_code(lang)
         try:
-            detected = self.translator.detect(text)
-            return detected.lang
+            # Also caches the translation under the detected language for translate_to_english
+            return to_googletrans_code(self.translation.detect(text))
         except Exception as e:
             print(f"Language detection error: {e}")
             return 'en'  
     
-    def correct_grammar_and_spelling(self, text):
+    def correct_grammar_and_spelling(self, text, confidence=None):
         """Correct grammar and spelling in the text"""
         try:
-            # First, use TextBlob for basic spelling correction
-            blob = TextBlob(text)
-            spell_corrected = str(blob.correct())
-            
-            # Then use LanguageTool for grammar correction if available
-            if self.grammar_enabled:
-                matches = self.grammar_tool.check(spell_corrected)
-                corrected_text = language_tool_python.utils.correct(spell_corrected, matches)
-                
-                # Show corrections if any were made
-                if corrected_text != text:
-                    print(f"[Corrected] {corrected_text}")
-                
-                return corrected_text
-            else:
-                # Only spelling correction available
-                if spell_corrected != text:
-                    print(f"[Spell-corrected] {spell_corrected}")
-                return spell_corrected
+            # Skipped for short or confidently recognized text; repeated phrases come from the cache
+            corrected_text = self.text_corrector.correct(text, confidence)
+            if corrected_text != text:
+                print(f"[Corrected] {corrected_text}")
+            return corrected_text
                 
         except Exception as e:
             print(f"Grammar/spelling correction error: {e}")
@@ -77,67 +92,106 @@ class VoiceToTextConverter:
         """Translate text to English if it's not already in English"""
         try:
             if source_lang != 'en':
-                translated = self.translator.translate(text, src=source_lang, dest='en')
-                return translated.text
+                return self.translation.translate(text, src=source_lang, dest='en').text
             return text
         except Exception as e:
             print(f"Translation error: {e}")
             return text
     
-    def audio_callback(self, recognizer, audio):
-        """Callback function for continuous listening"""
+    def queue_utterance(self, audio):
+        """Queue one utterance; when the workers are behind, capture waits up to SPEECH_QUEUE_TIMEOUT"""
+        with self.results_lock:
+            sequence = self.next_sequence
+            self.next_sequence += 1
         try:
-            # Use Google's speech recognition
-            text = recognizer.recognize_google(audio)
-            
-            if text.strip():
-                self.last_speech_time = time.time()
-                
-                # Detecting language
-                detected_lang = self.detect_language(text)
-                lang_name = LANGUAGES.get(detected_lang, 'Unknown')
-                
-                print(f"\n[Detected: {lang_name}] Original: {text}")
-                
-                # Translate to English if needed
-                english_text = self.translate_to_english(text, detected_lang)
-                print(f"[English] {english_text}")
-                
-                # Apply grammar and spelling correction
-                corrected_text = self.correct_grammar_and_spelling(english_text)
-                
-                self.collected_text.append(corrected_text)
-                
+            self.audio_queue.put((sequence, audio), timeout=config.SPEECH_QUEUE_TIMEOUT)
+        except queue.Full:
+            self.dropped_utterances += 1
+            print(f"\n[Warning] Processing is falling behind; dropped utterance {sequence} "
+                  f"({self.dropped_utterances} so far, raise SPEECH_WORKERS or SPEECH_QUEUE_SIZE)")
+            # Its empty result lets the later utterances through in order
+            self.emit_in_order(sequence, None)
+
+    def process_utterance(self, audio):
+        """Recognize, translate and correct one utterance; returns its result or None"""
+        try:
+            # Use the configured speech recognition engine
+            text, confidence = self.asr_engine.transcribe_scored(audio)
         except sr.UnknownValueError:
-            pass
+            return None
         except sr.RequestError as e:
             print(f"Could not request results; {e}")
+            return None
+        if not text.strip():
+            return None
+
+        # Detecting language
+        detected_lang = self.detect_language(text)
+
+        # Translate to English if needed
+        english_text = self.translate_to_english(text, detected_lang)
+
+        # Apply grammar and spelling correction
+        # ASR confidence only vouches for text that was not translated
+        corrected_text = self.correct_grammar_and_spelling(
+            english_text, confidence if english_text == text else None)
+        return {'text': text, 'lang_name': LANGUAGES.get(detected_lang, 'Unknown'),
+                'english_text': english_text, 'corrected_text': corrected_text}
+
+    def process_queue(self):
+        """Worker loop: utterances are processed in parallel and handed back by sequence number"""
+        while True:
+            item = self.audio_queue.get()
+            if item is None:
+                break
+            sequence, audio = item
+            try:
+                result = self.process_utterance(audio)
+            except Exception as e:
+                print(f"Processing error: {e}")
+                result = None
+            self.emit_in_order(sequence, result)
+
+    def emit_in_order(self, sequence, result):
+        """Hold results until every earlier utterance is done, so collected_text keeps speaking order"""
+        with self.results_lock:
+            self.pending_results[sequence] = result
+            while self.next_to_emit in self.pending_results:
+                result = self.pending_results.pop(self.next_to_emit)
+                self.next_to_emit += 1
+                if result is None:
+                    continue
+                print(f"\n[Detected: {result['lang_name']}] Original: {result['text']}")
+                print(f"[English] {result['english_text']}")
+                self.collected_text.append(result['corrected_text'])
     
-    def monitor_pauses(self):
-        """Monitor for pauses in speech"""
-        while self.is_listening:
-            current_time = time.time()
-            time_since_last_speech = current_time - self.last_speech_time
-            
-            if time_since_last_speech >= self.pause_duration:
-                self.pause_count += 1
-                print(f"\n--- Pause detected ({self.pause_count}/{self.max_pauses}) ---")
-                
-                if self.pause_count >= self.max_pauses:
-                    print("Maximum pauses reached. Stopping...")
-                    self.stop_listening()
-                    break
-                else:
-                    print("Continuing to listen...")
-                    self.last_speech_time = current_time  
-            time.sleep(0.5)  
+    def capture(self, segmenter):
+        """Feed microphone audio to the VAD; utterances and pauses come out as events as it is read"""
+        try:
+            with self.microphone as source:
+                for kind, payload in microphone_events(source, segmenter, self.stop_event.is_set):
+                    if kind == 'final':
+                        # Only detected speech, with the trailing silence cut, reaches the recognizer
+                        self.queue_utterance(sr.AudioData(payload, source.SAMPLE_RATE, source.SAMPLE_WIDTH))
+                    elif kind == 'pause':
+                        self.pause_count = payload
+                        print(f"\n--- Pause detected ({self.pause_count}/{self.max_pauses}) ---")
+                        if self.pause_count < self.max_pauses:
+                            print("Continuing to listen...")
+                    elif kind == 'stop':
+                        print("Maximum pauses reached. Stopping...")
+        finally:
+            self.stop_listening()
     
     def start_listening(self):
         """Start the voice recognition process"""
-        self.is_listening = True
+        self.stop_event.clear()
         self.pause_count = 0
         self.collected_text = []
-        self.last_speech_time = time.time()
+        self.next_sequence = 0
+        self.next_to_emit = 0
+        self.pending_results = {}
+        self.dropped_utterances = 0
         
         print("\n🎤 Starting voice recognition...")
         print(f"- Speak in any language (will be translated to English)")
@@ -146,42 +200,46 @@ class VoiceToTextConverter:
         print(f"- After {self.max_pauses} pauses, recording will stop")
         print("- Press Ctrl+C to stop manually\n")
         
-        # Start the pause monitoring thread
-        pause_thread = threading.Thread(target=self.monitor_pauses)
-        pause_thread.daemon = True
-        pause_thread.start()
+        # Start the processing workers
+        self.workers = [threading.Thread(target=self.process_queue, daemon=True) for _ in range(self.worker_count)]
+        for worker in self.workers:
+            worker.start()
         
-        # Starting continuous listening
-        stop_listening = self.recognizer.listen_in_background(
-            self.microphone, 
-            self.audio_callback,
-            phrase_time_limit=30  
-        )
+        # Segmentation and pause counting follow the audio itself; the noise floor
+        # starts from the ambient-noise calibration and keeps adapting
+        vad = AdaptiveVAD.from_recognizer(self.recognizer, self.microphone.SAMPLE_RATE, config.SPEECH_FRAME_MS)
+        segmenter = SpeechSegmenter(vad, end_silence=config.SPEECH_END_SILENCE, min_speech=config.SPEECH_MIN_SEGMENT,
+                                    max_segment=config.SPEECH_MAX_SEGMENT, partial_interval=0,
+                                    pause_duration=self.pause_duration, max_pauses=self.max_pauses)
+        capture_thread = threading.Thread(target=self.capture, args=(segmenter,), daemon=True)
+        capture_thread.start()
         
         try:
-            # Keep the main thread alive
-            while self.is_listening:
-                time.sleep(0.1)
+            # The timeout only lets Ctrl+C through on Windows
+            while not self.stop_event.wait(1.0):
+                pass
         except KeyboardInterrupt:
             print("\nStopping by user request...")
-            self.is_listening = False
+            self.stop_listening()
         
-        # Stop listening
-        stop_listening(wait_for_stop=False)
+        # The open utterance is flushed; nothing is queued after this returns
+        capture_thread.join()
         
-        # Wait for pause thread to finish
-        if pause_thread.is_alive():
-            pause_thread.join(timeout=1)
+        # Let the workers finish what is already queued
+        for _ in self.workers:
+            self.audio_queue.put(None)
+        for worker in self.workers:
+            worker.join()
     
     def stop_listening(self):
         """Stop the listening process"""
-        self.is_listening = False
+        self.stop_event.set()
     
     def __del__(self):
         """Cleanup resources"""
-        if hasattr(self, 'grammar_tool') and self.grammar_enabled:
+        if hasattr(self, 'text_corrector'):
             try:
-                self.grammar_tool.close()
+                self.text_corrector.close()
             except:
                 pass
     def get_final_output(self):
@@ -206,6 +264,8 @@ class VoiceToTextConverter:
                 print(final_output)
             else:
                 print("No speech was detected.")
+            if self.dropped_utterances:
+                print(f"[Warning] {self.dropped_utterances} utterance(s) were dropped because processing fell behind")
             print("="*60)
             
         except Exception as e: